@@ -0,0 +1,153 @@
+import argparse
+import io
+import mmap
+import os
+import struct
+import sys
+from collections.abc import Mapping
+
+import pygame
+
+# The game's images, packed into a single asset bundle so starting the game opens one file
+# (rather than a file per sprite, which is slow from a network home directory)
+#
+# Running this file packs every file under Resources/ into the bundle, stored as-is (PNGs are already compressed):
+#   BUNDLE_HEADER                   magic, version, number of index entries
+#   INDEX_ENTRY + name * entries    where each file's bytes start & how many, then its path (e.g. Sprites/Grid/flag.png)
+#   data                            the files' bytes, back to back
+# The game opens the bundle once: the index is read into a dictionary and the data is left in a memory map,
+# and each image is only decoded the first time it's drawn (see SpriteFolder).
+# The bundle is found next to this file, so the game can be started from any directory.
+#
+# Usage (from anywhere):
+#   python Minesweeper_py/Assets.py                     Rebuild the bundle after changing anything in Resources/
+#   python Minesweeper_py/Assets.py --list              Show what the bundle holds
+
+RESOURCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Resources")
+BUNDLE_NAME = "assets.bundle"
+BUNDLE_PATH = os.path.join(RESOURCE_DIR, BUNDLE_NAME)
+
+BUNDLE_MAGIC = b'MSAB'
+BUNDLE_VERSION = 1
+BUNDLE_HEADER = struct.Struct('!4sHI')      # magic, version, number of index entries
+INDEX_ENTRY = struct.Struct('!QIH')         # offset of the file's bytes, their length, length of the name that follows
+
+
+class AssetBundle:
+    # Read-only view of a bundle file
+    def __init__(self, path=BUNDLE_PATH):
+        self.path = path
+        self.index = {}         # path inside Resources/ (always '/'-separated) -> (offset, length)
+
+        try:
+            with open(path, "rb") as bundle_file:
+                self.map = mmap.mmap(bundle_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            raise FileNotFoundError("No asset bundle at {} (run Minesweeper_py/Assets.py to build it)".format(path))
+
+        magic, version, num_entries = BUNDLE_HEADER.unpack_from(self.map)
+        if magic != BUNDLE_MAGIC or version != BUNDLE_VERSION:
+            self.close()
+            raise ValueError("{} is not a version {} asset bundle".format(path, BUNDLE_VERSION))
+        position = BUNDLE_HEADER.size
+        for _ in range(num_entries):
+            offset, length, name_length = INDEX_ENTRY.unpack_from(self.map, position)
+            position += INDEX_ENTRY.size
+            name = self.map[position:position + name_length].decode()
+            position += name_length
+            self.index[name] = (offset, length)
+
+    def read(self, name):
+        offset, length = self.index[name]
+        return self.map[offset:offset + length]
+
+    def load_image(self, name):
+        # Decodes one image out of the memory map (the name tells pygame its format)
+        return pygame.image.load(io.BytesIO(self.read(name)), name)
+
+    def folder(self, folder):
+        # Every image directly inside a folder, e.g. folder('Sprites/Grid')['grid3'] is Sprites/Grid/grid3.png
+        return SpriteFolder(self, folder)
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+
+
+class SpriteFolder(Mapping):
+    # Dictionary-like set of sprites, keyed by file name without the extension
+    # Sprites are decoded the first time they're looked up, then kept
+    def __init__(self, bundle, folder):
+        self.bundle = bundle
+        self.names = {}         # sprite key -> path in the bundle
+        self.sprites = {}       # sprite key -> decoded Surface
+        prefix = folder.strip('/') + '/'
+        for name in bundle.index:
+            if name.startswith(prefix) and '/' not in name[len(prefix):]:
+                self.names[os.path.splitext(name[len(prefix):])[0]] = name
+
+    def __getitem__(self, key):
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            sprite = self.bundle.load_image(self.names[key])
+            self.sprites[key] = sprite
+        return sprite
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+
+def build_bundle(resource_dir=RESOURCE_DIR, path=BUNDLE_PATH):
+    # Packs every file under resource_dir (other than bundles) into one bundle file
+    # Returns the number of files packed
+    names = []
+    for folder, folder_names, file_names in os.walk(resource_dir):
+        folder_names.sort()
+        for file_name in sorted(file_names):
+            if file_name.endswith(".bundle"):
+                continue
+            names.append(os.path.relpath(os.path.join(folder, file_name), resource_dir).replace(os.sep, '/'))
+
+    contents = []
+    for name in names:
+        with open(os.path.join(resource_dir, name), "rb") as resource_file:
+            contents.append(resource_file.read())
+
+    encoded_names = [name.encode() for name in names]
+    offset = BUNDLE_HEADER.size + sum(INDEX_ENTRY.size + len(name) for name in encoded_names)
+    with open(path, "wb") as bundle_file:
+        bundle_file.write(BUNDLE_HEADER.pack(BUNDLE_MAGIC, BUNDLE_VERSION, len(names)))
+        for name, content in zip(encoded_names, contents):
+            bundle_file.write(INDEX_ENTRY.pack(offset, len(content), len(name)))
+            bundle_file.write(name)
+            offset += len(content)
+        for content in contents:
+            bundle_file.write(content)
+    return len(names)
+
+
+def __main__():
+    parser = argparse.ArgumentParser(description="Pack the game's resources into a single asset bundle")
+    parser.add_argument("--resources", default=RESOURCE_DIR, help="Folder to pack (default: Resources/)")
+    parser.add_argument("--output", default=BUNDLE_PATH, help="Bundle to write (default: Resources/{})".format(BUNDLE_NAME))
+    parser.add_argument("--list", action="store_true", help="List the bundle's contents instead of building it")
+    args = parser.parse_args()
+
+    if args.list:
+        bundle = AssetBundle(args.output)
+        for name, (offset, length) in bundle.index.items():
+            print("{:<40} {:>8} bytes   at {}".format(name, length, offset))
+        bundle.close()
+        return 0
+
+    num_files = build_bundle(args.resources, args.output)
+    print("Packed {} files into {} ({:.1f} KiB)".format(num_files, args.output, os.path.getsize(args.output) / 1024))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(__main__())
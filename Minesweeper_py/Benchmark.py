@@ -0,0 +1,237 @@
+import json
+import math
+import platform
+import sys
+import time
+import tracemalloc
+
+
+class BenchmarkSuite:
+    # Shared machinery for the benchmark scripts (EngineBenchmark, RenderBenchmark, ...)
+    # Each case is run as:
+    #   setup()     - builds fresh arguments for one run (not timed)
+    #   func(*args) - the operation being measured (timed)
+    # Runs repeat until min_time seconds of measured time (or max_runs) is reached.
+    # Peak memory is taken from a separate tracemalloc run, so tracing overhead
+    # never leaks into the timings.
+    def __init__(self, name, min_time=0.5, min_runs=1, max_runs=1000, measure_memory=True, case_filter=None):
+        self.name = name
+        self.case_filter = case_filter  # Optional list of case name prefixes to run (None runs everything)
+        self.min_time = min_time
+        self.min_runs = max(1, min_runs)
+        self.max_runs = max(self.min_runs, max_runs)
+        self.measure_memory = measure_memory
+        self.results = {}       # case name -> dictionary of measurements
+
+    def wants(self, case_name):
+        # Checks case_name against the case filter
+        if not self.case_filter:
+            return True
+        return any(case_name.startswith(prefix) for prefix in self.case_filter)
+
+    def run_case(self, case_name, func, setup=None, ops_per_run=1):
+        # Time func and store its results under case_name
+        # ops_per_run: number of operations a single call to func performs
+        # (e.g. a case that calls all_neighbors on 1000 squares has ops_per_run=1000)
+        if not self.wants(case_name):
+            return None
+        if setup is None:
+            setup = tuple
+
+        run_times = []
+        total_time = 0.0
+        while len(run_times) < self.min_runs or (total_time < self.min_time and len(run_times) < self.max_runs):
+            args = setup()
+            start = time.perf_counter()
+            func(*args)
+            elapsed = time.perf_counter() - start
+            run_times.append(elapsed)
+            total_time += elapsed
+
+        result = {
+            'runs': len(run_times),
+            'ops_per_run': ops_per_run,
+            'mean_s': total_time / len(run_times),
+            'min_s': min(run_times),
+            'ops_per_sec': (ops_per_run * len(run_times)) / total_time if total_time > 0 else float('inf'),
+            'best_ops_per_sec': ops_per_run / min(run_times) if min(run_times) > 0 else float('inf')
+        }
+
+        if self.measure_memory:
+            args = setup()
+            tracemalloc.start()
+            func(*args)
+            result['peak_memory_bytes'] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+        self.results[case_name] = result
+        self.print_result(case_name, result)
+        return result
+
+    def record(self, case_name, result):
+        # Store results measured outside of run_case (e.g. per-frame rendering measurements)
+        # result must contain 'ops_per_sec' (or, for memory measurements, 'bytes_per_item')
+        # so it can be compared against a baseline
+        if not self.wants(case_name):
+            return None
+        self.results[case_name] = result
+        self.print_result(case_name, result)
+        return result
+
+    @staticmethod
+    def print_result(case_name, result):
+        if 'frame_ms' in result:
+            frame_ms = result['frame_ms']
+            print("{:<40} p50 {:>8.3f} ms   p95 {:>8.3f} ms   p99 {:>8.3f} ms   ({} frames)".format(
+                case_name, frame_ms['p50'], frame_ms['p95'], frame_ms['p99'], result['frames']
+            ))
+            for metric in ('blits_per_frame', 'scales_per_frame', 'font_loads_per_frame', 'alloc_bytes_per_frame'):
+                if metric in result:
+                    print("{:<40}   {:<22} mean {:>10.1f}   p95 {:>10.1f}   max {:>10.1f}".format(
+                        "", metric, result[metric]['mean'], result[metric]['p95'], result[metric]['max']
+                    ))
+            if 'present_interval_ms' in result:
+                # Frame pacing: how evenly the loop's frames & the frames shown are spaced
+                for metric in ('frame_ms', 'present_interval_ms'):
+                    print("{:<40}   {:<22} mean {:>8.3f}   stdev {:>8.3f}   p95 {:>8.3f}   max {:>8.3f}".format(
+                        "", metric, result[metric]['mean'], result[metric]['stdev'], result[metric]['p95'],
+                        result[metric]['max']
+                    ))
+                print("{:<40}   {} frames shown".format("", result['presents']))
+            sys.stdout.flush()
+            return
+
+        if 'bytes_per_item' in result:
+            line = "{:<40} {:>14.1f} bytes/item".format(case_name, result['bytes_per_item'])
+            if 'blocks_per_item' in result:
+                line += "   {:>8.2f} blocks/item".format(result['blocks_per_item'])
+            print(line + "   ({} items)".format(result['items']))
+            sys.stdout.flush()
+            return
+
+        line = "{:<40} {:>14.1f} ops/s   mean {:>10.3f} ms   ({} runs)".format(
+            case_name, result['ops_per_sec'], 1000 * result['mean_s'], result['runs']
+        )
+        if 'peak_memory_bytes' in result:
+            line += "   peak {:>10.1f} KiB".format(result['peak_memory_bytes'] / 1024)
+        print(line)
+        sys.stdout.flush()
+
+    def to_dict(self):
+        return {
+            'suite': self.name,
+            'meta': {
+                'python': platform.python_version(),
+                'implementation': platform.python_implementation(),
+                'platform': platform.platform(),
+                'timestamp': time.time()
+            },
+            'results': self.results
+        }
+
+    def save(self, path):
+        with open(path, 'w') as out_file:
+            json.dump(self.to_dict(), out_file, indent=2, sort_keys=True)
+        print("Results saved to {}".format(path))
+
+    def compare(self, baseline_path, threshold=0.15):
+        # Compares ops/sec against a previously saved results file
+        # Best-run throughput is compared (it is far less sensitive to scheduler noise than the mean)
+        # Any case more than `threshold` (fractional) slower than baseline is flagged
+        # Memory measurements are compared by bytes per item instead: more than `threshold` bigger is flagged
+        # Returns the list of regressed case names
+        with open(baseline_path) as in_file:
+            baseline = json.load(in_file)['results']
+
+        regressions = []
+        print("\nComparison against {} (threshold {:.0f}%)".format(baseline_path, 100 * threshold))
+        for case_name, result in self.results.items():
+            if case_name not in baseline:
+                continue
+            if 'bytes_per_item' in result:
+                old_bytes = baseline[case_name]['bytes_per_item']
+                change = (result['bytes_per_item'] - old_bytes) / old_bytes if old_bytes > 0 else 0.0
+                if change > threshold:
+                    status = "REGRESSION"
+                    regressions.append(case_name)
+                elif change < -threshold:
+                    status = "smaller"
+                else:
+                    status = "ok"
+                print("{:<40} {:>+8.1f}%   {}".format(case_name, 100 * change, status))
+                continue
+            old_ops = baseline[case_name].get('best_ops_per_sec', baseline[case_name]['ops_per_sec'])
+            new_ops = result.get('best_ops_per_sec', result['ops_per_sec'])
+            change = (new_ops - old_ops) / old_ops if old_ops > 0 else 0.0
+
+            if change < -threshold:
+                status = "REGRESSION"
+                regressions.append(case_name)
+            elif change > threshold:
+                status = "faster"
+            else:
+                status = "ok"
+            print("{:<40} {:>+8.1f}%   {}".format(case_name, 100 * change, status))
+
+        if len(regressions) > 0:
+            print("\n{} regression(s) found".format(len(regressions)))
+        else:
+            print("\nNo regressions found")
+        return regressions
+
+
+def percentile(values, pct):
+    # Nearest-rank percentile of a list of numbers
+    if len(values) == 0:
+        return None
+    ordered = sorted(values)
+    rank = int(math.ceil(pct / 100 * len(ordered))) - 1
+    return ordered[max(0, min(len(ordered) - 1, rank))]
+
+
+def summarize(values):
+    # Percentile summary used for per-frame measurements
+    # (stdev is the spread of the values: for frame times, how unevenly paced the frames are)
+    mean = sum(values) / len(values)
+    return {
+        'mean': mean,
+        'stdev': math.sqrt(sum((value - mean) ** 2 for value in values) / len(values)),
+        'p50': percentile(values, 50),
+        'p95': percentile(values, 95),
+        'p99': percentile(values, 99),
+        'max': max(values)
+    }
+
+
+def parse_board(text):
+    # Board given on the command line as "COLUMNSxROWS:N" e.g. "30x16:99" -> (30, 16, 99)
+    # N is the number of mines (the tile size, for RenderBenchmark)
+    dimensions, number = text.split(":")
+    columns, rows = dimensions.lower().split("x")
+    return int(columns), int(rows), int(number)
+
+
+def add_common_arguments(parser, timed=True, optional_memory=True):
+    # Command-line options shared by every benchmark script
+    # timed: cases are repeated for --min-time (BenchmarkSuite.run), rather than run a fixed number of times
+    # optional_memory: peak memory measurement can be skipped with --no-memory
+    parser.add_argument("--output", "-o", help="Save results as JSON to this path")
+    parser.add_argument("--baseline", "-b", help="Compare results against this saved JSON file")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="Fractional slowdown vs. baseline counted as a regression (default 0.15)")
+    if timed:
+        parser.add_argument("--min-time", type=float, default=0.5,
+                            help="Minimum measured seconds per case (default 0.5)")
+    if optional_memory:
+        parser.add_argument("--no-memory", action="store_true", help="Skip peak memory measurement")
+    parser.add_argument("--cases", nargs="*", help="Only run cases whose name starts with one of these")
+
+
+def finish(suite, args):
+    # Save/compare results as requested on the command line and return an exit code
+    if args.output:
+        suite.save(args.output)
+    if args.baseline:
+        if len(suite.compare(args.baseline, args.threshold)) > 0:
+            return 1
+    return 0
@@ -0,0 +1,597 @@
+import random
+import time
+
+from Difficulty import layout_metrics
+from Topology import get_topology
+
+# MineField backend that keeps the board as bitboards instead of a FieldSquare per tile
+#
+# Each plane (mines, flags, revealed, committed mines, exploded mines) is one Python int holding a bit per tile.
+# Rows are stride = width + 1 bits apart: the extra bit at the end of each row is always clear,
+# so shifting a plane one column left or right can't carry a tile into the next row:
+#   bit = y * stride + x
+# Neighbor counts are four bit-sliced count planes (bit n of every tile's count), added up from the
+# eight shifted mine planes, and a flood fill grows the revealed area by whole-board dilations.
+# Everything is built in, so this needs no NumPy or other packages.
+# Shifts only describe the square neighborhood, so this backend only plays the square topology.
+#
+# The public interface is MineField's, so either can be used by the game, benchmarks & environments
+# (see create_mine_field in GameVariables). Squares (from field, get_square & take_changes) are light
+# views that read the planes, so no per-tile objects exist unless they're asked for.
+
+
+def popcount(plane):
+    return bin(plane).count("1")
+
+
+def set_bits(plane):
+    # Bit numbers of every set bit, lowest first
+    # (reading the binary string is much quicker than shifting a large int once per bit)
+    digits = bin(plane)
+    top = len(digits) - 1
+    to_return = []
+    position = digits.rfind("1", 2)
+    while position >= 2:
+        to_return.append(top - position)
+        position = digits.rfind("1", 2, position)
+    return to_return
+
+
+class BitboardMineField:
+    def __init__(self, width, height=0, rng=None, topology=None):
+        if height <= 0:
+            height = width
+        self.size = (width, height)
+        self.stride = width + 1
+        self.rng = rng if rng is not None else random    # Source of mine positions (e.g. a seeded random.Random)
+        self.topology = get_topology(topology, width, height)
+        if self.topology.name != 'square':
+            raise ValueError("The bitboard backend only plays square boards, not {}".format(self.topology.name))
+
+        # Every on-board bit set (padding bits clear), built by doubling up the rows
+        self.board_mask = (1 << width) - 1
+        num_rows = 1
+        while num_rows < height:
+            self.board_mask |= self.board_mask << (num_rows * self.stride)
+            num_rows *= 2
+        self.board_mask &= (1 << (height * self.stride)) - 1
+
+        self.time_sliced = False    # If True, the front-end runs flood fills with advance_spread
+        self.views = None           # Cached field of square views (they hold no state, so they outlive resets)
+        self.profiler = None        # Optional FrameProfiler that engine timings are reported to
+        self.listeners = []         # Functions called as listener(old_state, new_state) on state changes
+
+        self.reset_state()
+
+    def reset_state(self):
+        # Everything about the game in progress
+        self.mines = 0              # Mines still on the board
+        self.removed = 0            # Committed (removed) mines
+        self.flags = 0
+        self.revealed = 0
+        self.exploded_mines = 0     # Mines that were dug (FieldSquare.source_explosion)
+        self.count_planes = None    # Cached (bit 0, bit 1, bit 2, bit 3) planes of every tile's neighbor count
+        self.decoded = None         # Cached bytes of every plane, for reading single tiles (see square views)
+
+        self.num_committed_mines = 0        # Tracks number of successfully committed mines
+        self.num_revealed = 0               # Number of tiles successfully revealed
+        self.num_clicks = 0                 # Number of digs, chords & flag toggles performed
+        self.num_commits = 0                # Number of times commit_mines has been run
+        self.exploded = False
+
+        self.state = 0                                      # Cached game_state() code
+        self.num_safe_remaining = self.size[0] * self.size[1]   # Safe tiles still to be revealed
+        self.num_mines_left = 0                             # Mines minus flags (what the mine counter shows)
+        self.metrics = None                                 # Difficulty metrics of the layout (see get_metrics)
+
+        self.changed = 0            # Change set, as a plane (take_changes returns it as squares)
+
+        # Time-sliced flood fill in progress (see spread & advance_spread)
+        self.frontier = 0           # Revealed blanks the flood fill still has to spread from, as a plane
+        self.spreading = None       # spread_waves generator working through frontier, if any
+
+    def reset(self, num_mines=-1):
+        # Resets grid, spawns new mines based on # mines in current minefield state
+        if num_mines < 1:
+            num_mines = popcount(self.mines) + self.num_committed_mines
+
+        # Attachments (profiler, listeners, square views) outlive the reset, a flood fill in progress doesn't
+        previous_state = self.state
+        self.reset_state()
+        self.populate_mines(num_mines)
+
+        # Let listeners know if the reset took the game out of a won/lost state
+        self.state = previous_state
+        self.update_state()
+
+    def add_listener(self, listener):
+        # listener(old_state, new_state) is called whenever game_state() changes
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        self.listeners.remove(listener)
+
+    def update_state(self):
+        # Recalculates the cached game state from the counters & notifies listeners of any change
+        if self.exploded:
+            new_state = -1
+        elif self.num_safe_remaining <= 0:
+            new_state = 1
+        else:
+            new_state = 0
+
+        if new_state != self.state:
+            old_state = self.state
+            self.state = new_state
+            for listener in list(self.listeners):
+                listener(old_state, new_state)
+
+    def game_state(self):
+        return self.state
+
+    ### WHOLE-BOARD OPERATIONS ###
+
+    def dilate(self, plane):
+        # Every tile in plane, and every tile next to one
+        stride = self.stride
+        across = plane | (plane << 1) | (plane >> 1)
+        return (across | (across << stride) | (across >> stride)) & self.board_mask
+
+    def adjacent(self, plane):
+        # Every tile next to a tile in plane (tiles of plane only if they're next to another one)
+        stride = self.stride
+        across = plane | (plane << 1) | (plane >> 1)
+        return ((plane << 1) | (plane >> 1) | (across << stride) | (across >> stride)) & self.board_mask
+
+    def get_count_planes(self):
+        # Neighbor counts of every tile as four bit planes, added up from the eight shifted mine planes
+        if self.count_planes is None:
+            mines = self.mines
+            stride = self.stride
+            bit0 = bit1 = bit2 = bit3 = 0
+            for shifted in (
+                    mines << 1, mines >> 1,
+                    mines << stride, mines >> stride,
+                    mines << (stride + 1), mines >> (stride + 1),
+                    mines << (stride - 1), mines >> (stride - 1)
+            ):
+                # Ripple-carry add of one bit into every tile's count at once
+                carry = bit0 & shifted
+                bit0 ^= shifted
+                carry, bit1 = bit1 & carry, bit1 ^ carry
+                carry, bit2 = bit2 & carry, bit2 ^ carry
+                bit3 |= carry
+            mask = self.board_mask
+            self.count_planes = (bit0 & mask, bit1 & mask, bit2 & mask, bit3 & mask)
+        return self.count_planes
+
+    def blanks(self):
+        # Safe tiles with no neighboring mines (committed tiles included)
+        bit0, bit1, bit2, bit3 = self.get_count_planes()
+        return self.board_mask & ~(self.mines | bit0 | bit1 | bit2 | bit3)
+
+    def clickable(self):
+        return self.board_mask & ~(self.revealed | self.flags | self.removed)
+
+    def changed_planes(self):
+        # Something has changed: the cached tile bytes are out of date
+        self.decoded = None
+
+    ### SINGLE TILES ###
+
+    def out_of_bounds(self, pos_x, pos_y):
+        return not (0 <= pos_x < self.size[0] and 0 <= pos_y < self.size[1])
+
+    def bit(self, pos_x, pos_y):
+        return 1 << (pos_y * self.stride + pos_x)
+
+    def get_square(self, pos_x, pos_y):
+        if self.out_of_bounds(pos_x, pos_y):
+            return None
+        return BitboardSquare(self, pos_x, pos_y)
+
+    @property
+    def field(self):
+        # field[x][y] views, like MineField.field
+        if self.views is None:
+            self.views = [[BitboardSquare(self, x, y) for y in range(self.size[1])] for x in range(self.size[0])]
+        return self.views
+
+    def squares_in(self, plane):
+        stride = self.stride
+        return [BitboardSquare(self, bit % stride, bit // stride) for bit in set_bits(plane)]
+
+    def positions_in(self, plane):
+        stride = self.stride
+        return {(bit % stride, bit // stride) for bit in set_bits(plane)}
+
+    @property
+    def mine_squares(self):
+        return self.positions_in(self.mines)
+
+    @property
+    def flag_squares(self):
+        return self.positions_in(self.flags)
+
+    def take_changes(self):
+        # Returns the change set (as squares) and starts a new one
+        changed = self.changed
+        self.changed = 0
+        return self.squares_in(changed)
+
+    def all_neighbors(self, square_x=-1, square_y=-1, by_square=None):
+        if by_square is not None:
+            square_x, square_y = by_square.pos
+        return [
+            BitboardSquare(self, square_x + delta_x, square_y + delta_y)
+            for delta_x in range(-1, 2) for delta_y in range(-1, 2)
+            if (delta_x != 0 or delta_y != 0) and not self.out_of_bounds(square_x + delta_x, square_y + delta_y)
+        ]
+
+    ### MINES ###
+
+    def set_mine(self, pos_x=-1, pos_y=-1, by_square=None):
+        # Attempts to set a mine at the target coordinates, and returns
+        # a boolean indicating if it was successful
+        if by_square is not None:
+            pos_x, pos_y = by_square.pos
+        if self.out_of_bounds(pos_x, pos_y):
+            return False
+        bit = self.bit(pos_x, pos_y)
+        if not (self.clickable() & bit) or self.mines & bit:
+            return False
+        self.add_mines(bit, 1)
+        return True
+
+    def add_mines(self, plane, num_mines):
+        self.mines |= plane
+        self.num_safe_remaining -= num_mines
+        self.num_mines_left += num_mines
+        self.count_planes = None
+        self.metrics = None
+        self.changed_planes()
+
+    def populate_mines(self, num_mines=1):
+        # Same positions as MineField.populate_mines would pick with the same rng,
+        # but set into the mine plane all at once
+        num_mines = min(
+            max(num_mines, 1),
+            self.num_safe_tiles() - 1
+        )
+        stride = self.stride
+        # Tiles set_mine would refuse: mines, and anything revealed, flagged or committed
+        blocked = ((self.mines | ~self.clickable()) & self.board_mask).to_bytes(
+            (self.size[1] * stride + 7) // 8, 'little'
+        )
+        chosen = set()
+        for i in range(num_mines):
+            location_found = False
+            while not location_found:
+                x_to_mine = self.rng.randint(0, self.size[0] - 1)
+                y_to_mine = self.rng.randint(0, self.size[1] - 1)
+                bit_number = y_to_mine * stride + x_to_mine
+                if bit_number not in chosen and not blocked[bit_number >> 3] >> (bit_number & 7) & 1:
+                    chosen.add(bit_number)
+                    location_found = True
+        self.add_mines(self.plane_of(chosen), len(chosen))
+
+    def plane_of(self, bit_numbers):
+        # Plane with the given bits set, built as bytes (far quicker than or-ing in one bit at a time)
+        plane_bytes = bytearray((self.size[1] * self.stride + 7) // 8)
+        for bit_number in bit_numbers:
+            plane_bytes[bit_number >> 3] |= 1 << (bit_number & 7)
+        return int.from_bytes(plane_bytes, 'little')
+
+    def num_safe_tiles(self):
+        return self.size[0] * self.size[1] - popcount(self.mines)
+
+    def reveal_mines(self):
+        # Force-reveals any mine tiles (and wrongly flagged tiles, to show the X'ed mines)
+        wrong_flags = self.flags & ~self.mines
+        self.revealed |= self.mines | wrong_flags
+        self.flags &= ~self.mines
+        self.changed |= self.mines | wrong_flags
+        self.changed_planes()
+
+    def commit_mines(self):
+        # Removes all successfully flagged mines from map & adjusts neighbor counts
+        # Explodes if a non-mined tile is flagged
+        self.num_commits += 1
+        if self.flags & ~self.mines:
+            self.exploded = True
+            self.reveal_mines()
+            self.update_state()
+            return
+        self.remove_mines(self.flags, commit=True)
+
+    def remove_mine(self, x_pos=-1, y_pos=-1, by_square=None, commit=True):
+        if by_square is None:
+            squares = [(x_pos, y_pos)]
+        else:
+            try:
+                squares = [square.pos for square in by_square]
+            except TypeError:
+                squares = [by_square.pos]
+        self.remove_mines(
+            self.plane_of([pos_y * self.stride + pos_x for pos_x, pos_y in squares
+                           if not self.out_of_bounds(pos_x, pos_y)]),
+            commit
+        )
+
+    def remove_mines(self, plane, commit=True):
+        removed = plane & self.mines
+        num_removed = popcount(removed)
+        if num_removed > 0:
+            self.mines &= ~removed
+            self.count_planes = None
+            self.changed |= removed
+            if commit:
+                flagged = removed & self.flags
+                self.flags &= ~flagged
+                self.num_mines_left += popcount(flagged)
+                self.num_committed_mines += num_removed
+                # Anything dealt with (and thus non-interactable) is considered "Revealed"
+                self.removed |= removed
+                self.revealed |= removed
+                self.num_revealed += num_removed
+            else:
+                # The layout itself changed (first move protection)
+                self.num_safe_remaining += num_removed
+                self.metrics = None
+            self.num_mines_left -= num_removed
+            self.changed_planes()
+
+        # Revealed numbers around the removed mines have changed, and any that are now blank spread
+        # (as MineField.remove_mine: committed tiles included)
+        around = self.adjacent(removed) & self.revealed
+        self.changed |= around
+        self.spread(around & self.blanks())
+        self.update_state()
+
+    ### MOVES ###
+
+    def dig(self, x_pos=-1, y_pos=-1, by_square=None):
+        if by_square is not None:
+            x_pos, y_pos = by_square.pos
+        if self.out_of_bounds(x_pos, y_pos):
+            return
+        bit = self.bit(x_pos, y_pos)
+        if not self.clickable() & bit:
+            return
+
+        if self.mines & bit and self.num_revealed == 0:
+            # FIRST MOVE PROTECTION: move the mine elsewhere, then dig
+            self.populate_mines(1)
+            self.remove_mines(bit, commit=False)
+            self.dig(x_pos, y_pos)
+            return
+
+        self.num_clicks += 1
+        self.num_revealed += 1
+        self.num_safe_remaining -= 1
+        self.revealed |= bit
+        self.changed |= bit
+        self.changed_planes()
+        if self.mines & bit:
+            self.exploded = True
+            self.exploded_mines |= bit
+            self.reveal_mines()
+            self.update_state()
+        else:
+            self.spread(bit & self.blanks())
+
+    def chord(self, x_pos=-1, y_pos=-1, by_square=None):
+        # Digs every other neighbor of a revealed number with exactly that many flags around it
+        # Returns True if anything was dug
+        if by_square is not None:
+            x_pos, y_pos = by_square.pos
+        if self.out_of_bounds(x_pos, y_pos) or self.state != 0:
+            return False
+        bit = self.bit(x_pos, y_pos)
+        square = BitboardSquare(self, x_pos, y_pos)
+        if not self.revealed & bit or self.mines & bit or self.removed & bit or square.neighboring_mines == 0:
+            return False
+
+        neighbors = self.dilate(bit) & ~bit
+        if popcount(neighbors & self.flags) != square.neighboring_mines:
+            return False
+        to_dig = neighbors & self.clickable()
+        if not to_dig:
+            return False
+
+        num_dug = popcount(to_dig)
+        self.num_clicks += 1
+        self.num_revealed += num_dug
+        self.num_safe_remaining -= num_dug
+        self.revealed |= to_dig
+        self.changed |= to_dig
+        self.changed_planes()
+        if to_dig & self.mines:
+            # A misplaced flag: every other neighbor is still dug, as in classic minesweeper
+            self.exploded = True
+            self.exploded_mines |= to_dig & self.mines
+            self.reveal_mines()
+            self.update_state()
+        else:
+            self.spread(to_dig & self.blanks())
+        return True
+
+    def spread(self, frontier):
+        # Flood fill out from the blank tiles in frontier (which are already revealed)
+        # Each pass reveals every clickable neighbor of the frontier at once; the blanks among them
+        # are the next frontier
+        # With time_sliced set, the frontier is only queued, for advance_spread to work through
+        if self.time_sliced:
+            self.frontier |= frontier
+            if self.spreading is None:
+                self.spreading = self.spread_waves()
+            self.update_state()
+            return
+
+        if self.profiler is not None:
+            start = time.perf_counter()
+
+        # A lost game doesn't spread (as spread_waves)
+        if frontier and not self.exploded:
+            blanks = self.blanks()
+            clickable = self.clickable()
+            newly_revealed = 0
+            while frontier:
+                grown = self.dilate(frontier) & clickable
+                clickable &= ~grown
+                newly_revealed |= grown
+                frontier = grown & blanks
+
+            num_revealed = popcount(newly_revealed)
+            self.revealed |= newly_revealed
+            self.changed |= newly_revealed
+            self.num_revealed += num_revealed
+            self.num_safe_remaining -= num_revealed
+            self.changed_planes()
+
+        if self.profiler is not None:
+            self.profiler.add('spread_blanks', time.perf_counter() - start)
+        self.update_state()
+
+    def spread_waves(self):
+        # Generator for time-sliced flood fills: one pass (wave) per step, yielding True after each
+        # Each wave is added to the planes & counters as soon as it's found (see MineField.spread_waves)
+        while self.frontier and not self.exploded:
+            grown = self.dilate(self.frontier) & self.clickable()
+            self.frontier = grown & self.blanks()
+            if grown:
+                num_revealed = popcount(grown)
+                self.revealed |= grown
+                self.changed |= grown
+                self.num_revealed += num_revealed
+                self.num_safe_remaining -= num_revealed
+                self.changed_planes()
+            self.update_state()
+            yield True
+
+        # A lost game doesn't keep spreading
+        self.frontier = 0
+
+    def advance_spread(self, budget=None, max_waves=None):
+        # Runs the flood fill in progress (see MineField.advance_spread)
+        if self.spreading is None:
+            return True
+
+        start = time.perf_counter()
+        num_waves = 0
+        for wave_done in self.spreading:
+            num_waves += wave_done
+            if max_waves is not None and num_waves >= max_waves:
+                break
+            if budget is not None and time.perf_counter() - start >= budget:
+                break
+        else:
+            self.spreading = None
+
+        if self.profiler is not None:
+            self.profiler.add('spread_blanks', time.perf_counter() - start)
+        return self.spreading is None
+
+    def toggle_flag(self, x_pos=-1, y_pos=-1, by_square=None):
+        if by_square is not None:
+            x_pos, y_pos = by_square.pos
+        if self.out_of_bounds(x_pos, y_pos):
+            return
+        bit = self.bit(x_pos, y_pos)
+        if self.revealed & bit:
+            return
+        self.num_clicks += 1
+        self.flags ^= bit
+        self.changed |= bit
+        self.changed_planes()
+        self.num_mines_left += -1 if self.flags & bit else 1
+
+    def get_metrics(self):
+        # Difficulty metrics of the mine layout (see MineField.get_metrics)
+        if self.metrics is None:
+            self.metrics = layout_metrics(
+                self.size[0], self.size[1], self.positions_in(self.mines | self.removed), self.topology
+            )
+        return self.metrics
+
+    def get_decoded(self):
+        # Every plane as bytes, so single tiles can be read without shifting whole-board ints
+        if self.decoded is None:
+            num_bytes = (self.size[1] * self.stride + 7) // 8
+            self.decoded = tuple(plane.to_bytes(num_bytes, 'little') for plane in (
+                self.mines, self.removed, self.flags, self.revealed, self.exploded_mines
+            ) + self.get_count_planes())
+        return self.decoded
+
+    def print_minefield(self, cushion=5):
+        # Prints the status of each mine tile to console (see MineField.print_minefield)
+        texts = [[self.field[x][y].get_display_text() for x in range(self.size[0])] for y in range(self.size[1])]
+        max_elem_len = max(len(text) for row in texts for text in row)
+        for row in texts:
+            print("".join(text + " " * (cushion + max_elem_len - len(text)) for text in row))
+
+
+class BitboardSquare:
+    # Read-only view of one tile of a BitboardMineField, with FieldSquare's attributes
+    __slots__ = ('mine_field', 'pos', 'byte', 'mask')
+
+    def __init__(self, mine_field, pos_x, pos_y):
+        self.mine_field = mine_field
+        self.pos = (pos_x, pos_y)
+        bit_number = pos_y * mine_field.stride + pos_x
+        self.byte = bit_number >> 3
+        self.mask = 1 << (bit_number & 7)
+
+    def plane_bit(self, plane_index):
+        return bool(self.mine_field.get_decoded()[plane_index][self.byte] & self.mask)
+
+    @property
+    def has_mine(self):
+        return self.plane_bit(0)
+
+    @property
+    def mine_removed(self):
+        return self.plane_bit(1)
+
+    @property
+    def has_flag(self):
+        return self.plane_bit(2)
+
+    @property
+    def is_revealed(self):
+        return self.plane_bit(3)
+
+    @property
+    def source_explosion(self):
+        return self.plane_bit(4)
+
+    @property
+    def neighboring_mines(self):
+        decoded = self.mine_field.get_decoded()
+        count = 0
+        for bit_index in range(4):
+            if decoded[5 + bit_index][self.byte] & self.mask:
+                count += 1 << bit_index
+        return count
+
+    def is_clickable(self):
+        return not (self.is_revealed or self.has_flag or self.mine_removed)
+
+    def get_display_text(self):
+        if self.mine_removed:
+            to_return = "C"
+        elif self.has_flag:
+            to_return = "F"
+        elif self.has_mine:
+            to_return = "M"
+        else:
+            to_return = str(self.neighboring_mines)
+        if not self.is_revealed:
+            to_return = "[" + to_return + "]"
+        return to_return
+
+    def __eq__(self, other):
+        return isinstance(other, BitboardSquare) and other.mine_field is self.mine_field and other.pos == self.pos
+
+    def __hash__(self):
+        return hash(self.pos)
@@ -0,0 +1,270 @@
+import argparse
+import datetime
+import hashlib
+import mmap
+import multiprocessing
+import os
+import random
+import struct
+import sys
+import time
+
+from Benchmark import parse_board
+from Difficulty import layout_metrics, random_layout
+from GameVariables import create_mine_field
+from Statistics import default_stats_path
+
+# Library of pre-scored boards, so the game can hand out a "hard 30x16" or the daily board
+# without dealing & rating boards while the player waits
+#
+# Running this file generates boards: many seeded boards per configuration are dealt and scored
+# (see Difficulty.py) across a pool of worker processes, ranked by difficulty, and split into
+# NUM_BUCKETS equal-sized difficulty buckets. They're written to a single file:
+#   LIBRARY_HEADER                  magic, version, number of index entries
+#   INDEX_ENTRY * entries           (rows, columns, mines, bucket) -> where its records start & how many
+#   records                         RECORD_HEADER then a bitmap of the mines (bit x * rows + y), per board
+# Records in a group are all the same size, so finding board n of a group is just arithmetic.
+# The game opens the file once: the index is read into a dictionary and records are read straight out of
+# a memory map as they're asked for, so fetching a board takes microseconds.
+#
+# Usage (from the repository root):
+#   python Minesweeper_py/BoardLibrary.py --board 30x16:99 16x16:40 9x9:10 --boards 4000
+#   python Minesweeper_py/BoardLibrary.py --board 30x16:99 --boards 20000 --workers 4 --output boards.lib
+
+LIBRARY_MAGIC = b'MSBL'
+LIBRARY_VERSION = 1
+LIBRARY_HEADER = struct.Struct('!4sHI')     # magic, version, number of index entries
+INDEX_ENTRY = struct.Struct('!HHIBQI')      # rows, columns, mines, bucket, offset of first record, records
+RECORD_HEADER = struct.Struct('!QHHHH')     # seed, 3bv, openings, islands, guesses
+
+DIFFICULTY_NAMES = ['easy', 'medium', 'hard', 'evil']   # Bucket names, easiest first
+NUM_BUCKETS = len(DIFFICULTY_NAMES)
+DEFAULT_BOARDS = [(30, 16, 99), (16, 16, 40), (9, 9, 10)]   # (columns, rows, mines)
+CHUNK_SIZE = 500                            # Boards per task handed to a worker
+
+
+def default_library_path():
+    # Next to the stats database
+    return os.path.join(os.path.dirname(default_stats_path()), "boards.lib")
+
+
+def record_size(columns, rows):
+    return RECORD_HEADER.size + (columns * rows + 7) // 8
+
+
+def difficulty_score(metrics):
+    # Boards are ranked by how often they force a guess, then by how many clicks they take
+    return metrics['guesses'], metrics['3bv']
+
+
+class LibraryBoard:
+    # One board from the library
+    def __init__(self, columns, rows, mines, bucket, seed, mine_positions, metrics):
+        self.config = (columns, rows, mines)
+        self.bucket = bucket
+        self.seed = seed                        # Seed the board was dealt from (see deal_board)
+        self.mine_positions = mine_positions    # List of (x, y)
+        self.metrics = metrics                  # As returned by MineField.get_metrics
+
+    def create_field(self, backend='objects'):
+        # A fresh MineField (of the given backend) with this board's mines
+        # (first move protection may still move a mine, as for any other board)
+        mine_field = create_mine_field(self.config[0], self.config[1], backend=backend)
+        for pos_x, pos_y in self.mine_positions:
+            mine_field.set_mine(pos_x, pos_y)
+        mine_field.metrics = dict(self.metrics)
+        return mine_field
+
+
+class BoardLibrary:
+    # Read-only view of a library file (an empty library if it doesn't exist yet)
+    def __init__(self, path=None):
+        if path is None:
+            path = default_library_path()
+        self.path = path
+        self.index = {}         # (rows, columns, mines, bucket) -> (offset, number of records)
+        self.map = None
+
+        if not os.path.exists(path) or os.path.getsize(path) < LIBRARY_HEADER.size:
+            return
+        with open(path, "rb") as library_file:
+            self.map = mmap.mmap(library_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, num_entries = LIBRARY_HEADER.unpack_from(self.map)
+        if magic != LIBRARY_MAGIC or version != LIBRARY_VERSION:
+            print("Ignoring board library {}: not a version {} library".format(path, LIBRARY_VERSION))
+            self.close()
+            return
+        for entry_index in range(num_entries):
+            rows, columns, mines, bucket, offset, count = INDEX_ENTRY.unpack_from(
+                self.map, LIBRARY_HEADER.size + entry_index * INDEX_ENTRY.size
+            )
+            self.index[(rows, columns, mines, bucket)] = (offset, count)
+
+    def count(self, columns, rows, mines, bucket):
+        # Number of boards in one difficulty bucket
+        return self.index.get((rows, columns, mines, bucket), (0, 0))[1]
+
+    def get_board(self, columns, rows, mines, bucket, number):
+        # Board number (wrapping around) of a difficulty bucket, or None if the bucket is empty
+        offset, count = self.index.get((rows, columns, mines, bucket), (0, 0))
+        if count == 0:
+            return None
+        size = record_size(columns, rows)
+        start = offset + (number % count) * size
+        seed, bbbv, openings, islands, guesses = RECORD_HEADER.unpack_from(self.map, start)
+        bitmap = int.from_bytes(self.map[start + RECORD_HEADER.size:start + size], 'little')
+
+        mine_positions = []
+        while bitmap:
+            lowest_bit = bitmap & -bitmap
+            mine_positions.append(divmod(lowest_bit.bit_length() - 1, rows))
+            bitmap ^= lowest_bit
+        metrics = {
+            '3bv': bbbv,
+            'openings': openings,
+            'isolated_numbers': bbbv - openings,
+            'islands': islands,
+            'guesses': guesses
+        }
+        return LibraryBoard(columns, rows, mines, bucket, seed, mine_positions, metrics)
+
+    def random_board(self, columns, rows, mines, bucket, rng=random):
+        return self.get_board(columns, rows, mines, bucket, rng.randrange(1 << 30))
+
+    def daily_board(self, columns, rows, mines, bucket=1, date=None):
+        # The same board for everyone (with the same library) all day
+        # Without library boards for the configuration, a board is dealt from the date instead
+        if date is None:
+            date = datetime.date.today()
+        day_key = "{}-{}x{}-{}".format(date.isoformat(), columns, rows, mines)
+        day_number = int.from_bytes(hashlib.sha256(day_key.encode()).digest()[:8], 'big')
+
+        board = self.get_board(columns, rows, mines, bucket, day_number)
+        if board is None:
+            mine_positions = deal_board(columns, rows, mines, day_number >> 1)
+            board = LibraryBoard(columns, rows, mines, bucket, day_number >> 1, mine_positions,
+                                 layout_metrics(columns, rows, mine_positions))
+        return board
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        self.index = {}
+
+
+def deal_board(columns, rows, mines, seed):
+    # The board a seed stands for (so any library board can be dealt again from its seed)
+    return random_layout(columns, rows, mines, random.Random(seed))
+
+
+def generate_chunk(task):
+    # Deals & scores count boards, returning [(score, record bytes)]
+    (columns, rows, mines), first_seed, count = task
+    scored = []
+    for seed in range(first_seed, first_seed + count):
+        mine_positions = deal_board(columns, rows, mines, seed)
+        metrics = layout_metrics(columns, rows, mine_positions)
+        bitmap = 0
+        for pos_x, pos_y in mine_positions:
+            bitmap |= 1 << (pos_x * rows + pos_y)
+        record = RECORD_HEADER.pack(
+            seed, metrics['3bv'], metrics['openings'], metrics['islands'], metrics['guesses']
+        ) + bitmap.to_bytes((columns * rows + 7) // 8, 'little')
+        scored.append((difficulty_score(metrics), record))
+    return scored
+
+
+def generate(board, num_boards, seed=0, num_workers=None, chunk_size=CHUNK_SIZE):
+    # Returns {bucket: [record bytes]} for num_boards boards of one configuration, easiest first
+    if num_workers is None:
+        num_workers = os.cpu_count() or 1
+
+    # Seed for board n of a run: the run's seed in the top half, n in the bottom
+    tasks = [(board, (seed << 32) + start, min(chunk_size, num_boards - start))
+             for start in range(0, num_boards, chunk_size)]
+    scored = []
+    if num_workers <= 1:
+        for task in tasks:
+            scored.extend(generate_chunk(task))
+    else:
+        with multiprocessing.Pool(num_workers) as pool:
+            for chunk in pool.imap_unordered(generate_chunk, tasks):
+                scored.extend(chunk)
+
+    # Equal-sized buckets by rank (seeds break ties, so the same run always makes the same library)
+    scored.sort()
+    buckets = {}
+    for rank, (score, record) in enumerate(scored):
+        buckets.setdefault(rank * NUM_BUCKETS // len(scored), []).append(record)
+    return buckets
+
+
+def write_library(path, groups):
+    # groups: {(rows, columns, mines, bucket): [record bytes]}
+    # Written to a temporary file first, so a running game never sees half a library
+    keys = sorted(groups)
+    offset = LIBRARY_HEADER.size + len(keys) * INDEX_ENTRY.size
+    parts = [LIBRARY_HEADER.pack(LIBRARY_MAGIC, LIBRARY_VERSION, len(keys))]
+    for key in keys:
+        parts.append(INDEX_ENTRY.pack(*key, offset, len(groups[key])))
+        offset += sum(len(record) for record in groups[key])
+    for key in keys:
+        parts.extend(groups[key])
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "wb") as library_file:
+        library_file.write(b"".join(parts))
+    os.replace(temporary_path, path)
+
+
+def read_groups(library):
+    # Every record in a library, as write_library's groups
+    groups = {}
+    for (rows, columns, mines, bucket), (offset, count) in library.index.items():
+        size = record_size(columns, rows)
+        groups[(rows, columns, mines, bucket)] = [
+            library.map[offset + number * size:offset + (number + 1) * size] for number in range(count)
+        ]
+    return groups
+
+
+def __main__():
+    parser = argparse.ArgumentParser(description="Generate boards for the board library")
+    parser.add_argument("--board", type=parse_board, nargs="+", default=DEFAULT_BOARDS,
+                        help="Configurations as COLUMNSxROWS:MINES (default: 30x16:99 16x16:40 9x9:10)")
+    parser.add_argument("--boards", type=int, default=4000, help="Boards per configuration (default 4000)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes (default: one per core; 1 runs everything in this process)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the run (default 0)")
+    parser.add_argument("--output", default=None,
+                        help="Library file (default: {})".format(default_library_path()))
+    args = parser.parse_args()
+    path = args.output if args.output is not None else default_library_path()
+
+    # Configurations not being regenerated are kept
+    existing = BoardLibrary(path)
+    groups = read_groups(existing)
+    existing.close()
+
+    for columns, rows, mines in args.board:
+        start = time.perf_counter()
+        buckets = generate((columns, rows, mines), args.boards, args.seed, args.workers)
+        # populate_mines' limits, as applied when dealing
+        mines = min(max(mines, 1), columns * rows - 1)
+        for key in [key for key in groups if key[:3] == (rows, columns, mines)]:
+            del groups[key]
+        for bucket, records in buckets.items():
+            groups[(rows, columns, mines, bucket)] = records
+        print("{}x{} with {} mines: {} boards in {:.1f}s".format(
+            columns, rows, mines, args.boards, time.perf_counter() - start))
+
+    write_library(path, groups)
+    print("Wrote {} boards to {}".format(sum(len(records) for records in groups.values()), path))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(__main__())
@@ -0,0 +1,325 @@
+import argparse
+import asyncio
+import queue
+import random
+import resource
+import sys
+import threading
+import time
+
+from Benchmark import parse_board, summarize
+from Race import create_race_field, parse_seed_string
+from Server import (
+    CHORD, COMMIT, DIFF, DIFF_CELL, DIFF_HEADER, DIG, END, ERROR, ERROR_MESSAGE, FLAG, FLAG_CELL, HEADER, HOST,
+    JOIN, JOINED, JOINED_MESSAGE, MINE, MINE_EXPLODED, MINE_REMOVED, MOVE_PAYLOAD, NEW, NEW_PAYLOAD, PORT,
+    RESULT, RESULT_MESSAGE, UNREVEALED, WRONG_FLAG, GameServer
+)
+
+# Client for the game server (Server.py), plus a load generator built on it
+#
+# Load generator usage (from the repository root):
+#   python Minesweeper_py/Client.py --boards 2000 --clients 8 --rounds 100
+#       starts a server in this process on a free loopback port and plays against it
+#   python Minesweeper_py/Client.py --connect 127.0.0.1:8765 --boards 2000
+#       plays against an already running server
+
+
+class Reply:
+    # A decoded server message
+    # For race messages (PROGRESS, RESULT) game_id holds the player number instead
+    def __init__(self, opcode, game_id, state=0, mines_left=0, cells=(), error=0, place=0, seconds=0.0):
+        self.opcode = opcode
+        self.game_id = game_id
+        self.state = state              # Game state after the request (see MineField.game_state)
+        self.mines_left = mines_left
+        self.cells = cells              # List of (x, y, value) for every cell the request changed
+        self.error = error              # Error code (ERROR replies only)
+        self.place = place              # Race place, or player number for JOINED (race replies only)
+        self.seconds = seconds          # Race time (RESULT only)
+
+
+class GameClient:
+    # One connection to the server, which may host any number of games
+    # The send_* methods only queue a request, so many can be pipelined before reading
+    # their replies with read_reply (replies come back in request order).
+    # The request_* coroutines send one request and wait for its reply.
+    def __init__(self):
+        self.reader = None
+        self.writer = None
+
+    async def connect(self, host=HOST, port=PORT):
+        self.reader, self.writer = await asyncio.open_connection(host, port)
+        return self
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+    def send_new(self, game_id, columns, rows, mines, seed=-1):
+        self.writer.write(HEADER.pack(NEW, game_id) + NEW_PAYLOAD.pack(columns, rows, mines, seed))
+
+    def send_move(self, opcode, game_id, pos_x, pos_y):
+        # opcode: DIG, FLAG or CHORD
+        self.writer.write(HEADER.pack(opcode, game_id) + MOVE_PAYLOAD.pack(pos_x, pos_y))
+
+    def send_commit(self, game_id):
+        self.writer.write(HEADER.pack(COMMIT, game_id))
+
+    def send_end(self, game_id):
+        self.writer.write(HEADER.pack(END, game_id))
+
+    def send_join(self, game_id, columns, rows, mines, seed):
+        self.writer.write(HEADER.pack(JOIN, game_id) + NEW_PAYLOAD.pack(columns, rows, mines, seed))
+
+    async def read_reply(self):
+        # Reads the next message, whether it's a reply or race news (PROGRESS, RESULT)
+        opcode = (await self.reader.readexactly(1))[0]
+        if opcode == ERROR:
+            data = bytes([opcode]) + await self.reader.readexactly(ERROR_MESSAGE.size - 1)
+            opcode, game_id, error = ERROR_MESSAGE.unpack(data)
+            return Reply(opcode, game_id, error=error)
+        elif opcode == JOINED:
+            data = bytes([opcode]) + await self.reader.readexactly(JOINED_MESSAGE.size - 1)
+            opcode, game_id, player_index = JOINED_MESSAGE.unpack(data)
+            return Reply(opcode, game_id, place=player_index)
+        elif opcode == RESULT:
+            data = bytes([opcode]) + await self.reader.readexactly(RESULT_MESSAGE.size - 1)
+            opcode, player_index, place, outcome, seconds = RESULT_MESSAGE.unpack(data)
+            return Reply(opcode, player_index, state=outcome, place=place, seconds=seconds)
+
+        data = bytes([opcode]) + await self.reader.readexactly(DIFF_HEADER.size - 1)
+        opcode, game_id, state, mines_left, num_cells = DIFF_HEADER.unpack(data)
+        cells = []
+        if num_cells > 0:
+            cells = list(DIFF_CELL.iter_unpack(await self.reader.readexactly(num_cells * DIFF_CELL.size)))
+        return Reply(opcode, game_id, state, mines_left, cells)
+
+    async def request_new(self, game_id, columns, rows, mines, seed=-1):
+        self.send_new(game_id, columns, rows, mines, seed)
+        return await self.read_reply()
+
+    async def request_dig(self, game_id, pos_x, pos_y):
+        self.send_move(DIG, game_id, pos_x, pos_y)
+        return await self.read_reply()
+
+    async def request_flag(self, game_id, pos_x, pos_y):
+        self.send_move(FLAG, game_id, pos_x, pos_y)
+        return await self.read_reply()
+
+    async def request_chord(self, game_id, pos_x, pos_y):
+        self.send_move(CHORD, game_id, pos_x, pos_y)
+        return await self.read_reply()
+
+    async def request_commit(self, game_id):
+        self.send_commit(game_id)
+        return await self.read_reply()
+
+    async def request_end(self, game_id):
+        self.send_end(game_id)
+        return await self.read_reply()
+
+
+def apply_cells(mine_field, cells):
+    # Makes a MineField mirror another player's board (one made from the same seed) from diff cells
+    # Only what is drawn is updated; the changed squares go into the mirror's change set
+    for pos_x, pos_y, value in cells:
+        square = mine_field.field[pos_x][pos_y]
+        square.has_flag = value in (FLAG_CELL, WRONG_FLAG)
+        square.is_revealed = value not in (UNREVEALED, FLAG_CELL)
+        if value == MINE_REMOVED:
+            square.has_mine = False
+            square.mine_removed = True
+        elif value in (MINE, MINE_EXPLODED):
+            square.source_explosion = value == MINE_EXPLODED
+        elif value >= 0:
+            square.neighboring_mines = value
+        mine_field.changed.add(square)
+
+
+class RaceConnection:
+    # Race client for the pygame front-end
+    # The connection runs on its own thread & event loop, so the game loop never waits on the network:
+    # moves are queued with send_move/send_commit, and poll() hands back whatever has arrived since
+    RACE_GAME_ID = 0
+    MOVE_OPCODES = {'dig': DIG, 'flag': FLAG, 'chord': CHORD}     # MineSweeperGrid move names
+
+    def __init__(self, host, port, seed_string, timeout=5.0):
+        self.seed_string = seed_string
+        self.config = parse_seed_string(seed_string)    # (columns, rows, mines, seed)
+        self.replies = queue.Queue()
+        self.closed = False
+
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+        self.client = asyncio.run_coroutine_threadsafe(GameClient().connect(host, port), self.loop).result(timeout)
+        self.client.send_join(self.RACE_GAME_ID, *self.config)
+        asyncio.run_coroutine_threadsafe(self.read_loop(), self.loop)
+
+    def create_field(self):
+        # A fresh copy of the race board
+        return create_race_field(*self.config)
+
+    async def read_loop(self):
+        try:
+            while True:
+                self.replies.put(await self.client.read_reply())
+        except (asyncio.IncompleteReadError, ConnectionError):
+            # None marks the connection as lost
+            self.replies.put(None)
+
+    def send_move(self, move, pos_x, pos_y):
+        # move: 'dig', 'flag' or 'chord' (as reported by MineSweeperGrid's move_listener)
+        opcode = self.MOVE_OPCODES[move]
+        self.loop.call_soon_threadsafe(self.client.send_move, opcode, self.RACE_GAME_ID, pos_x, pos_y)
+
+    def send_commit(self):
+        self.loop.call_soon_threadsafe(self.client.send_commit, self.RACE_GAME_ID)
+
+    def poll(self):
+        # Every message received since the last poll
+        messages = []
+        while True:
+            try:
+                messages.append(self.replies.get_nowait())
+            except queue.Empty:
+                return messages
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.loop.call_soon_threadsafe(self.client.writer.close)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(1.0)
+
+
+class GameView:
+    # A client's copy of one board, kept up to date from the server's diffs
+    def __init__(self, columns, rows):
+        self.size = (columns, rows)
+        self.cells = [UNREVEALED] * (columns * rows)    # Cell values, row by row
+        self.state = 0
+
+    def apply(self, reply):
+        self.state = reply.state
+        for pos_x, pos_y, value in reply.cells:
+            self.cells[pos_y * self.size[0] + pos_x] = value
+
+    def random_unrevealed(self, rng, tries=8):
+        # A random unrevealed cell (or just a random cell, if none turn up in a few tries)
+        for i in range(tries):
+            index = rng.randrange(len(self.cells))
+            if self.cells[index] == UNREVEALED:
+                break
+        return index % self.size[0], index // self.size[0]
+
+
+async def play_client(host, port, num_boards, first_game_id, board, num_rounds, rng, latencies, totals):
+    # One load generator connection: every round sends one move to each of its boards
+    # (pipelined), then reads all the replies. Finished games are restarted.
+    columns, rows, mines = board
+    client = await GameClient().connect(host, port)
+    game_ids = range(first_game_id, first_game_id + num_boards)
+    views = {}
+
+    for game_id in game_ids:
+        client.send_new(game_id, columns, rows, mines)
+        views[game_id] = GameView(columns, rows)
+    for game_id in game_ids:
+        await client.read_reply()
+
+    for round_index in range(num_rounds):
+        start = time.perf_counter()
+        for game_id in game_ids:
+            view = views[game_id]
+            if view.state != 0:
+                client.send_new(game_id, columns, rows, mines)
+                views[game_id] = GameView(columns, rows)
+                totals['games'] += 1
+                continue
+            pos_x, pos_y = view.random_unrevealed(rng)
+            client.send_move(FLAG if rng.random() < 0.1 else DIG, game_id, pos_x, pos_y)
+
+        for game_id in game_ids:
+            reply = await client.read_reply()
+            if reply.opcode == DIFF:
+                views[reply.game_id].apply(reply)
+                totals['cells'] += len(reply.cells)
+            else:
+                totals['errors'] += 1
+        totals['requests'] += num_boards
+        latencies.append(1000 * (time.perf_counter() - start))
+
+    await client.close()
+
+
+async def run_load(host, port, num_boards, num_clients, board, num_rounds, seed):
+    # Runs the load generator, starting a server in-process if no host/port is given
+    server = None
+    if port is None:
+        server = await GameServer(port=0).start()
+        host, port = server.host, server.port
+
+    rng = random.Random(seed)
+    latencies = []
+    totals = {'requests': 0, 'games': 0, 'cells': 0, 'errors': 0}
+    boards_per_client = [num_boards // num_clients + (1 if client < num_boards % num_clients else 0)
+                         for client in range(num_clients)]
+
+    start = time.perf_counter()
+    tasks = []
+    first_game_id = 0
+    for client_boards in boards_per_client:
+        tasks.append(play_client(
+            host, port, client_boards, first_game_id, board, num_rounds,
+            random.Random(rng.random()), latencies, totals
+        ))
+        first_game_id += client_boards
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+
+    round_ms = summarize(latencies)
+    print("{} boards over {} connections, {} rounds".format(num_boards, num_clients, num_rounds))
+    print("requests      {:>12}   ({:.0f}/s)".format(totals['requests'], totals['requests'] / elapsed))
+    print("games ended   {:>12}".format(totals['games']))
+    print("cells sent    {:>12}".format(totals['cells']))
+    print("errors        {:>12}".format(totals['errors']))
+    print("round time    p50 {:.2f} ms   p95 {:.2f} ms   p99 {:.2f} ms   max {:.2f} ms".format(
+        round_ms['p50'], round_ms['p95'], round_ms['p99'], round_ms['max']
+    ))
+    if server is not None:
+        store = server.store
+        print("server games  {:>12} at peak   ({} packs, packed games peaked at {:.1f} KiB)".format(
+            store.peak_games, store.num_packs, store.peak_packed_bytes / 1024
+        ))
+        # ru_maxrss is in KiB on Linux
+        print("peak RSS      {:>12.1f} MiB".format(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024))
+        await server.close()
+    return totals['errors'] == 0
+
+
+def __main__():
+    parser = argparse.ArgumentParser(description="Load generator for the minesweeper game server")
+    parser.add_argument("--connect", metavar="HOST:PORT",
+                        help="Server to play against (default: start one in this process)")
+    parser.add_argument("--boards", type=int, default=2000, help="Concurrent boards (default 2000)")
+    parser.add_argument("--clients", type=int, default=8, help="Connections the boards are split over (default 8)")
+    parser.add_argument("--board", type=parse_board, default=(16, 16, 40),
+                        help="Board as COLUMNSxROWS:MINES (default: 16x16:40)")
+    parser.add_argument("--rounds", type=int, default=100, help="Moves sent to every board (default 100)")
+    parser.add_argument("--seed", type=int, default=1234, help="Seed for the generated moves")
+    args = parser.parse_args()
+
+    host, port = HOST, None
+    if args.connect:
+        host, port = args.connect.rsplit(":", 1)
+        port = int(port)
+
+    ok = asyncio.run(run_load(host, port, args.boards, max(1, args.clients), args.board, args.rounds, args.seed))
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(__main__())
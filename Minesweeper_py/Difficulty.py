@@ -0,0 +1,165 @@
+from Topology import get_topology
+
+# Difficulty metrics of a mine layout
+#   3bv                 Minimum number of clicks to clear the board (without flags or chords):
+#                       one per opening, plus one per numbered tile that no opening reveals
+#   openings            Connected areas of blank tiles, each cleared by a single click
+#   isolated_numbers    Numbered tiles that no opening reveals (each needs a click of its own)
+#   islands             Connected groups of isolated numbers
+#   guesses             Times a solver runs out of certain moves after the first click (see count_guesses)
+#
+# Everything is worked out from the mine positions alone, in a few passes over flat arrays of the board,
+# so the cost grows linearly with the number of tiles. No FieldSquares are needed, which keeps it quick
+# enough to run on millions of boards (see Simulator.py).
+#
+# The arrays are indexed like the board's topology (see Topology.py), column by column:
+#   index = x * height + y
+# and neighbors come from the topology's adjacency table, so every topology is rated the same way.
+
+
+def layout_metrics(width, height, mine_positions, topology=None):
+    # Returns a dictionary of every metric for the board with mines at mine_positions ((x, y) pairs)
+    # topology: as for MineField (a name, a Topology, or None for the square board)
+    topology = get_topology(topology, width, height)
+    # Lists slice quicker than arrays, and converting the tables once is cheap next to everything below
+    starts = topology.starts.tolist()
+    neighbors = topology.neighbors.tolist()
+    size = width * height
+
+    mines = bytearray(size)
+    counts = bytearray(size)
+    for x, y in mine_positions:
+        index = x * height + y
+        mines[index] = 1
+        for neighbor in neighbors[starts[index]:starts[index + 1]]:
+            counts[neighbor] += 1
+
+    safe_tiles = [index for index in range(size) if not mines[index]]
+    blanks = [index for index in safe_tiles if counts[index] == 0]
+
+    # Openings: label connected blanks, marking every tile an opening reveals
+    revealed_by_opening = bytearray(size)
+    num_openings = 0
+    for start in blanks:
+        if revealed_by_opening[start]:
+            continue
+        num_openings += 1
+        revealed_by_opening[start] = 1
+        to_visit = [start]
+        while len(to_visit) > 0:
+            index = to_visit.pop()
+            for neighbor in neighbors[starts[index]:starts[index + 1]]:
+                if not revealed_by_opening[neighbor]:
+                    revealed_by_opening[neighbor] = 1
+                    if counts[neighbor] == 0:
+                        to_visit.append(neighbor)
+
+    # Isolated numbers, and the islands they form
+    isolated = bytearray(size)
+    num_isolated = 0
+    for index in safe_tiles:
+        if not revealed_by_opening[index]:
+            isolated[index] = 1
+            num_isolated += 1
+
+    num_islands = 0
+    if num_isolated > 0:
+        for start in safe_tiles:
+            if isolated[start] != 1:
+                continue
+            num_islands += 1
+            isolated[start] = 2
+            to_visit = [start]
+            while len(to_visit) > 0:
+                index = to_visit.pop()
+                for neighbor in neighbors[starts[index]:starts[index + 1]]:
+                    if isolated[neighbor] == 1:
+                        isolated[neighbor] = 2
+                        to_visit.append(neighbor)
+
+    return {
+        '3bv': num_openings + num_isolated,
+        'openings': num_openings,
+        'isolated_numbers': num_isolated,
+        'islands': num_islands,
+        'guesses': count_guesses(starts, neighbors, counts, safe_tiles, blanks)
+    }
+
+
+def count_guesses(starts, neighbors, counts, safe_tiles, blanks):
+    # Plays the board with a solver that only makes the two single-tile deductions:
+    #   a number with all its mines marked     -> every other unknown neighbor is safe
+    #   a number with as many unknown neighbors as unmarked mines -> they are all mines
+    # and counts how often it gets stuck. A stuck solver "guesses" right every time, picking the next
+    # unknown blank if there is one (an opening), else the next unknown safe tile.
+    # The first click is free and goes to a blank where possible (as first move protection intends).
+    #
+    # Each tile is revealed or marked once, and each change only queues its revealed neighbors
+    # to be looked at again, so this is linear in the number of tiles too.
+    # starts & neighbors: the topology's adjacency table (see Topology.py)
+    known = bytearray(len(counts))  # 0 unknown, 1 revealed, 2 marked as a mine
+    to_check = []
+    num_safe_left = len(safe_tiles)
+    guesses = -1    # The first click isn't a guess
+
+    def reveal(index):
+        known[index] = 1
+        to_check.append(index)
+        for neighbor in neighbors[starts[index]:starts[index + 1]]:
+            if known[neighbor] == 1:
+                to_check.append(neighbor)
+
+    def mark(index):
+        known[index] = 2
+        for neighbor in neighbors[starts[index]:starts[index + 1]]:
+            if known[neighbor] == 1:
+                to_check.append(neighbor)
+
+    # Where the next guess goes: unknown blanks first, then any other unknown safe tile
+    guess_order = blanks + safe_tiles
+    next_guess = 0
+
+    while num_safe_left > 0:
+        if len(to_check) == 0:
+            while known[guess_order[next_guess]] != 0:
+                next_guess += 1
+            guesses += 1
+            reveal(guess_order[next_guess])
+            num_safe_left -= 1
+            continue
+
+        index = to_check.pop()
+        around = neighbors[starts[index]:starts[index + 1]]
+        unknown = [neighbor for neighbor in around if known[neighbor] == 0]
+        if len(unknown) == 0:
+            continue
+        num_marked = sum(1 for neighbor in around if known[neighbor] == 2)
+
+        if num_marked == counts[index]:
+            for neighbor in unknown:
+                reveal(neighbor)
+                num_safe_left -= 1
+        elif num_marked + len(unknown) == counts[index]:
+            for neighbor in unknown:
+                mark(neighbor)
+
+    return max(guesses, 0)
+
+
+def random_layout(columns, rows, mines, rng):
+    # Mine positions for a uniformly random board, like MineField.populate_mines deals
+    # (with the same limits on the number of mines), from a random.Random
+    mines = min(max(mines, 1), columns * rows - 1)
+    return [divmod(tile, rows) for tile in rng.sample(range(columns * rows), mines)]
+
+
+def board_metrics(mine_field):
+    # layout_metrics for a MineField, counting committed mines as mines
+    # (so the figures describe the board as it was dealt, however far the game has got)
+    mine_positions = set(mine_field.mine_squares)
+    if mine_field.num_committed_mines > 0:
+        for column in mine_field.field:
+            for square in column:
+                if square.mine_removed:
+                    mine_positions.add(square.pos)
+    return layout_metrics(mine_field.size[0], mine_field.size[1], mine_positions, mine_field.topology)
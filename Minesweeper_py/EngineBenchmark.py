@@ -0,0 +1,195 @@
+import argparse
+import random
+import sys
+
+from Benchmark import BenchmarkSuite, add_common_arguments, finish
+from GameVariables import MINE_FIELD_BACKENDS, MineField, create_mine_field
+from Topology import TOPOLOGIES
+
+# Benchmarks for the MineField engine
+# Only GameVariables is imported, so this runs headless (pygame is never initialized)
+# Each backend gets the same cases; backends other than the default one have their name as a prefix
+# (e.g. bitboard/dig_opening/100x100), so their results sit side by side with the default's.
+# Board topologies other than square are prefixed the same way (e.g. hex/chord/300x300).
+#
+# Usage (from the repository root):
+#   python Minesweeper_py/EngineBenchmark.py --output engine.json
+#   python Minesweeper_py/EngineBenchmark.py --baseline engine.json
+#   python Minesweeper_py/EngineBenchmark.py --backends objects bitboard --sizes 30 100 300
+#   python Minesweeper_py/EngineBenchmark.py --topologies square torus hex --sizes 30 100 300
+
+DEFAULT_SIZES = [9, 30, 100, 300, 1000]     # Square board dimensions to benchmark
+DENSITIES = [0.05, 0.12, 0.2]               # Mine densities for populate_mines
+COMMIT_DENSITY = 0.12                       # Mine density for boards used by commit & reset cases
+NEIGHBOR_SAMPLES = 1000                     # Squares sampled per all_neighbors run
+SEED = 1234
+
+
+def mine_count(size, density):
+    return max(1, int(size * size * density))
+
+
+def populated_field(size, density, backend, topology):
+    random.seed(SEED)
+    mine_field = create_mine_field(size, size, backend=backend, topology=topology)
+    mine_field.populate_mines(mine_count(size, density))
+    return mine_field
+
+
+def find_opening(mine_field):
+    # Returns a safe square with no neighboring mines (a dig there spreads into an opening)
+    for pos_x in range(mine_field.size[0]):
+        for pos_y in range(mine_field.size[1]):
+            square = mine_field.get_square(pos_x, pos_y)
+            if not square.has_mine and square.neighboring_mines == 0:
+                return square
+    return None
+
+
+def setup_dig(size, backend, topology):
+    # Sparse board, so the dig spreads into a large opening
+    mine_field = populated_field(size, DENSITIES[0], backend, topology)
+    return mine_field, find_opening(mine_field)
+
+
+def setup_spread(size, topology):
+    # Mine-free board with one revealed corner: spread_blanks floods the entire field
+    mine_field = MineField(size, size, topology=topology)
+    corner = mine_field.get_square(0, 0)
+    corner.dig()
+    mine_field.num_revealed += 1
+    mine_field.num_safe_remaining -= 1
+    return mine_field, corner
+
+
+def setup_flood(size, backend, topology):
+    # Mine-free board: digging the corner floods the entire field
+    # (the same flood as setup_spread, for backends without FieldSquares to set up by hand)
+    return create_mine_field(size, size, backend=backend, topology=topology), (0, 0)
+
+
+def setup_chord(size, backend, topology):
+    # One flagged mine (the corner, on a square board) next to a revealed 1: chording the 1 digs
+    # a blank neighbor, and the single flood fill that follows clears the whole board
+    mine_field = create_mine_field(size, size, backend=backend, topology=topology)
+    mine_pos = mine_field.all_neighbors(1, 1)[0].pos
+    mine_field.set_mine(*mine_pos)
+    mine_field.dig(1, 1)
+    mine_field.toggle_flag(*mine_pos)
+    return mine_field, mine_field.get_square(1, 1)
+
+
+def setup_commit(size, backend, topology):
+    # Every mine flagged correctly, so commit_mines removes all of them
+    mine_field = populated_field(size, COMMIT_DENSITY, backend, topology)
+    for mine_pos in list(mine_field.mine_squares):
+        mine_field.toggle_flag(mine_pos[0], mine_pos[1])
+    return (mine_field,)
+
+
+def setup_neighbors(size, backend, topology):
+    mine_field = create_mine_field(size, size, backend=backend, topology=topology)
+    rng = random.Random(SEED)
+    sample = [(rng.randrange(size), rng.randrange(size)) for i in range(NEIGHBOR_SAMPLES)]
+    return mine_field, sample
+
+
+def run_all_neighbors(mine_field, sample):
+    for square_x, square_y in sample:
+        mine_field.all_neighbors(square_x, square_y)
+
+
+def run_suite(suite, sizes, backend='objects', topology='square'):
+    prefix = "" if backend == 'objects' else backend + "/"
+    if topology != 'square':
+        prefix += topology + "/"
+    for size in sizes:
+        label = "{0}x{0}".format(size)
+
+        suite.run_case(
+            prefix + "init/" + label,
+            lambda: create_mine_field(size, size, backend=backend, topology=topology)
+        )
+
+        for density in DENSITIES:
+            suite.run_case(
+                prefix + "populate_mines/{}/{:.0f}%".format(label, 100 * density),
+                lambda mine_field, num_mines: mine_field.populate_mines(num_mines),
+                setup=lambda: (
+                    create_mine_field(size, size, backend=backend, topology=topology), mine_count(size, density)
+                )
+            )
+
+        suite.run_case(
+            prefix + "dig_opening/" + label,
+            lambda mine_field, square: mine_field.dig(by_square=square),
+            setup=lambda: setup_dig(size, backend, topology)
+        )
+
+        if backend == 'objects':
+            suite.run_case(
+                prefix + "spread_blanks/" + label,
+                lambda mine_field, square: mine_field.spread_blanks(by_square=square),
+                setup=lambda: setup_spread(size, topology)
+            )
+        else:
+            suite.run_case(
+                prefix + "flood/" + label,
+                lambda mine_field, pos: mine_field.dig(*pos),
+                setup=lambda: setup_flood(size, backend, topology)
+            )
+
+        suite.run_case(
+            prefix + "chord/" + label,
+            lambda mine_field, square: mine_field.chord(by_square=square),
+            setup=lambda: setup_chord(size, backend, topology)
+        )
+
+        suite.run_case(
+            prefix + "commit_mines/" + label,
+            lambda mine_field: mine_field.commit_mines(),
+            setup=lambda: setup_commit(size, backend, topology)
+        )
+
+        suite.run_case(
+            prefix + "reset/" + label,
+            lambda mine_field: mine_field.reset(),
+            setup=lambda: (populated_field(size, COMMIT_DENSITY, backend, topology),)
+        )
+
+        suite.run_case(
+            prefix + "all_neighbors/" + label,
+            run_all_neighbors,
+            setup=lambda: setup_neighbors(size, backend, topology),
+            ops_per_run=NEIGHBOR_SAMPLES
+        )
+
+
+def __main__():
+    parser = argparse.ArgumentParser(description="Benchmark the MineField engine")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="Square board sizes to benchmark (default: {})".format(DEFAULT_SIZES))
+    parser.add_argument("--backends", nargs="+", default=['objects'], choices=sorted(MINE_FIELD_BACKENDS),
+                        help="Engine backends to benchmark (default: objects)")
+    parser.add_argument("--topologies", nargs="+", default=['square'], choices=list(TOPOLOGIES),
+                        help="Board topologies to benchmark (default: square; "
+                             "the bitboard backend only runs square boards)")
+    add_common_arguments(parser)
+    args = parser.parse_args()
+
+    suite = BenchmarkSuite(
+        "engine",
+        min_time=args.min_time,
+        measure_memory=not args.no_memory,
+        case_filter=args.cases
+    )
+    for backend in args.backends:
+        for topology in args.topologies:
+            if backend == 'bitboard' and topology != 'square':
+                continue
+            run_suite(suite, args.sizes, backend, topology)
+    return finish(suite, args)
+
+
+if __name__ == "__main__":
+    sys.exit(__main__())
@@ -0,0 +1,306 @@
+import multiprocessing
+import os
+import random
+
+import numpy as np
+
+from GameVariables import MineField
+
+# Reinforcement-learning style environments for training agents to play minesweeper
+# Follows the gym conventions:
+#   observation = env.reset()
+#   observation, reward, done, info = env.step(action)
+# No pygame is needed (or imported).
+#
+# Actions are digs: action = y * columns + x
+# Observations are int8 arrays of shape (rows, columns), indexed [y, x], holding what the player can see:
+#   0-8         revealed tile, showing its number of neighboring mines
+#   UNREVEALED  tile not dug yet
+#   MINE        mine (only shown once the game is lost)
+#
+#   MineSweeperEnv          - One board, played on a MineField
+#   VectorMineSweeperEnv    - N boards stepped in lockstep, stored as arrays (no per-board Python objects)
+#   SubprocessVectorEnv     - VectorMineSweeperEnv split across worker processes
+
+UNREVEALED = -1
+MINE = -2
+
+REWARD_WIN = 1.0        # Dig that clears the last safe tile
+REWARD_LOSS = -1.0      # Dig that hits a mine
+REWARD_REVEAL = 0.1     # Any other dig that reveals something
+REWARD_INVALID = -0.1   # Dig on a tile that is already revealed (nothing happens)
+
+
+class MineSweeperEnv:
+    # Single board environment wrapping a MineField
+    # The observation is updated from the MineField's change set, so a step costs
+    # only as much as the number of tiles it reveals
+    def __init__(self, columns=9, rows=9, mines=10, seed=None):
+        self.size = (columns, rows)
+        self.num_mines = mines
+        self.rng = random.Random(seed)
+        self.mine_field = MineField(columns, rows, rng=self.rng)
+        self.observation = np.full((rows, columns), UNREVEALED, dtype=np.int8)
+        self.num_actions = columns * rows
+
+    def reset(self, seed=None):
+        # Starts a new game and returns its (blank) observation
+        if seed is not None:
+            self.rng.seed(seed)
+        self.mine_field.reset(self.num_mines)
+        self.mine_field.take_changes()
+        self.observation.fill(UNREVEALED)
+        return self.observation.copy()
+
+    def step(self, action):
+        pos_x = action % self.size[0]
+        pos_y = action // self.size[0]
+        square = self.mine_field.get_square(pos_x, pos_y)
+
+        if square is None or not square.is_clickable() or self.mine_field.game_state() != 0:
+            reward = REWARD_INVALID
+        else:
+            self.mine_field.dig(by_square=square)
+            for changed_square in self.mine_field.take_changes():
+                self.observation[changed_square.pos[1], changed_square.pos[0]] = square_value(changed_square)
+
+            state = self.mine_field.game_state()
+            if state == -1:
+                reward = REWARD_LOSS
+            elif state == 1:
+                reward = REWARD_WIN
+            else:
+                reward = REWARD_REVEAL
+
+        state = self.mine_field.game_state()
+        info = {'won': state == 1, 'revealed': self.mine_field.num_revealed}
+        return self.observation.copy(), reward, state != 0, info
+
+
+def square_value(field_square):
+    # Observation value of a single FieldSquare
+    if not field_square.is_revealed:
+        return UNREVEALED
+    elif field_square.has_mine:
+        return MINE
+    else:
+        return field_square.neighboring_mines
+
+
+def neighbor_counts(boards):
+    # For a (n, rows, columns) array of booleans, the number of True neighbors of every tile
+    padded = np.pad(boards, ((0, 0), (1, 1), (1, 1))).astype(np.int8)
+    rows, columns = boards.shape[1:]
+    counts = np.zeros(boards.shape, dtype=np.int8)
+    for delta_y in range(3):
+        for delta_x in range(3):
+            if delta_x != 1 or delta_y != 1:
+                counts += padded[:, delta_y:delta_y + rows, delta_x:delta_x + columns]
+    return counts
+
+
+def neighbor_any(boards):
+    # For a (n, rows, columns) array of booleans, whether any neighbor of each tile is True
+    padded = np.pad(boards, ((0, 0), (1, 1), (1, 1)))
+    rows, columns = boards.shape[1:]
+    result = np.zeros(boards.shape, dtype=bool)
+    for delta_y in range(3):
+        for delta_x in range(3):
+            if delta_x != 1 or delta_y != 1:
+                result |= padded[:, delta_y:delta_y + rows, delta_x:delta_x + columns]
+    return result
+
+
+class VectorMineSweeperEnv:
+    # num_envs boards of the same size stepped together
+    # Board state lives in (num_envs, rows, columns) arrays and every step is a handful of array
+    # operations over all boards at once; flood fills run as repeated dilations over only the boards
+    # still spreading.
+    #
+    # Same rules as MineField: mines are placed on the first dig of each game, never under the dug tile
+    # (MineField's first move protection). Finished boards are reset automatically within the step that
+    # finishes them, so the observation returned for them is the start of their next game
+    # (info['final_observation'] has the finished boards as they ended).
+    def __init__(self, num_envs, columns=9, rows=9, mines=10, seed=None):
+        self.num_envs = num_envs
+        self.size = (columns, rows)
+        self.num_actions = columns * rows
+        # Same limits as MineField.populate_mines
+        self.num_mines = min(max(mines, 1), self.num_actions - 1)
+        self.rng = np.random.default_rng(seed)
+
+        shape = (num_envs, rows, columns)
+        self.mines = np.zeros(shape, dtype=bool)
+        self.counts = np.zeros(shape, dtype=np.int8)
+        self.revealed = np.zeros(shape, dtype=bool)
+        self.started = np.zeros(num_envs, dtype=bool)   # Mines have been placed (first dig made)
+        self.observation = np.full(shape, UNREVEALED, dtype=np.int8)
+        self.board_index = np.arange(num_envs)
+
+    def reset(self):
+        self.reset_boards(self.board_index)
+        return self.observation.copy()
+
+    def reset_boards(self, boards):
+        self.mines[boards] = False
+        self.counts[boards] = 0
+        self.revealed[boards] = False
+        self.started[boards] = False
+        self.observation[boards] = UNREVEALED
+
+    def place_mines(self, boards, first_cells):
+        # Places num_mines mines on each board, keeping each board's first dug cell clear
+        # Taking the num_mines smallest of a row of random keys picks a uniform random set of cells
+        num_boards = len(boards)
+        keys = self.rng.random((num_boards, self.num_actions))
+        keys[np.arange(num_boards), first_cells] = 2.0
+        picks = np.argpartition(keys, self.num_mines - 1, axis=1)[:, :self.num_mines]
+
+        flat_mines = np.zeros((num_boards, self.num_actions), dtype=bool)
+        flat_mines[np.arange(num_boards)[:, None], picks] = True
+        mines = flat_mines.reshape(num_boards, self.size[1], self.size[0])
+        self.mines[boards] = mines
+        self.counts[boards] = neighbor_counts(mines)
+        self.started[boards] = True
+
+    def flood(self, boards, pos_y, pos_x):
+        # Spreads out from blank tiles just dug on the given boards
+        # Tiles next to a blank can never be mines, so every neighbor of the frontier is revealed,
+        # and the newly revealed blanks become the next frontier
+        revealed = self.revealed[boards]
+        blanks = self.counts[boards] == 0
+        frontier = np.zeros(revealed.shape, dtype=bool)
+        frontier[np.arange(len(boards)), pos_y, pos_x] = True
+
+        active = np.arange(len(boards))
+        while len(active) > 0:
+            grow = neighbor_any(frontier) & ~revealed[active]
+            revealed[active] |= grow
+            frontier = grow & blanks[active]
+
+            # Boards that have stopped spreading drop out of the loop
+            still_spreading = frontier.any(axis=(1, 2))
+            active = active[still_spreading]
+            frontier = frontier[still_spreading]
+
+        self.revealed[boards] = revealed
+
+    def step(self, actions):
+        # actions: one dig per board (array-like of num_envs ints)
+        # Returns (observations, rewards, dones, info), each with num_envs rows
+        actions = np.asarray(actions, dtype=np.int64)
+        pos_y, pos_x = np.divmod(actions, self.size[0])
+        boards = self.board_index
+
+        first_digs = ~self.started
+        if first_digs.any():
+            self.place_mines(boards[first_digs], actions[first_digs])
+
+        valid = ~self.revealed[boards, pos_y, pos_x]
+        hit_mine = valid & self.mines[boards, pos_y, pos_x]
+        safe_dig = valid & ~hit_mine
+        self.revealed[boards[valid], pos_y[valid], pos_x[valid]] = True
+
+        spreads = safe_dig & (self.counts[boards, pos_y, pos_x] == 0)
+        if spreads.any():
+            self.flood(boards[spreads], pos_y[spreads], pos_x[spreads])
+
+        num_revealed = np.count_nonzero(self.revealed, axis=(1, 2))
+        won = safe_dig & (num_revealed >= self.num_actions - self.num_mines)
+        dones = hit_mine | won
+
+        rewards = np.where(valid, REWARD_REVEAL, REWARD_INVALID).astype(np.float32)
+        rewards[hit_mine] = REWARD_LOSS
+        rewards[won] = REWARD_WIN
+
+        np.copyto(self.observation, np.where(self.revealed, self.counts, np.int8(UNREVEALED)))
+        if hit_mine.any():
+            self.observation[hit_mine] = np.where(self.mines[hit_mine], np.int8(MINE), self.observation[hit_mine])
+
+        info = {'won': won, 'revealed': num_revealed}
+        if dones.any():
+            info['final_observation'] = self.observation[dones].copy()
+            self.reset_boards(boards[dones])
+
+        return self.observation.copy(), rewards, dones, info
+
+
+def run_worker(connection, num_envs, columns, rows, mines, seed):
+    # Worker process loop for SubprocessVectorEnv: runs commands sent down the pipe until 'close'
+    env = VectorMineSweeperEnv(num_envs, columns, rows, mines, seed)
+    while True:
+        command, data = connection.recv()
+        if command == 'step':
+            connection.send(env.step(data))
+        elif command == 'reset':
+            connection.send(env.reset())
+        elif command == 'close':
+            connection.close()
+            break
+
+
+class SubprocessVectorEnv:
+    # VectorMineSweeperEnv with its boards split across worker processes (one per core by default)
+    # Each step sends every worker its share of the actions before waiting on any of them,
+    # so the workers step their boards in parallel. Results are joined back in board order.
+    def __init__(self, num_envs, columns=9, rows=9, mines=10, seed=None, num_workers=None):
+        if num_workers is None:
+            num_workers = os.cpu_count() or 1
+        num_workers = max(1, min(num_workers, num_envs))
+
+        self.num_envs = num_envs
+        self.size = (columns, rows)
+        self.num_actions = columns * rows
+
+        # Boards per worker, as even as possible
+        shard_sizes = [num_envs // num_workers + (1 if worker < num_envs % num_workers else 0)
+                       for worker in range(num_workers)]
+        self.splits = np.cumsum(shard_sizes)[:-1]
+
+        # Each worker gets its own independent random stream
+        worker_seeds = np.random.SeedSequence(seed).spawn(num_workers)
+
+        self.connections = []
+        self.processes = []
+        for shard_size, worker_seed in zip(shard_sizes, worker_seeds):
+            parent_connection, child_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=run_worker,
+                args=(child_connection, shard_size, columns, rows, mines, worker_seed),
+                daemon=True
+            )
+            process.start()
+            child_connection.close()
+            self.connections.append(parent_connection)
+            self.processes.append(process)
+
+    def reset(self):
+        for connection in self.connections:
+            connection.send(('reset', None))
+        return np.concatenate([connection.recv() for connection in self.connections])
+
+    def step(self, actions):
+        for connection, worker_actions in zip(self.connections, np.split(np.asarray(actions), self.splits)):
+            connection.send(('step', worker_actions))
+        results = [connection.recv() for connection in self.connections]
+
+        observations = np.concatenate([result[0] for result in results])
+        rewards = np.concatenate([result[1] for result in results])
+        dones = np.concatenate([result[2] for result in results])
+        info = {
+            'won': np.concatenate([result[3]['won'] for result in results]),
+            'revealed': np.concatenate([result[3]['revealed'] for result in results])
+        }
+        final_observations = [result[3]['final_observation'] for result in results if 'final_observation' in result[3]]
+        if len(final_observations) > 0:
+            info['final_observation'] = np.concatenate(final_observations)
+        return observations, rewards, dones, info
+
+    def close(self):
+        for connection in self.connections:
+            connection.send(('close', None))
+            connection.close()
+        for process in self.processes:
+            process.join()
+        self.connections = []
+        self.processes = []
@@ -0,0 +1,111 @@
+import argparse
+import sys
+
+import numpy as np
+
+from Benchmark import BenchmarkSuite, add_common_arguments, finish, parse_board
+from Environment import MineSweeperEnv, SubprocessVectorEnv, VectorMineSweeperEnv
+
+# Benchmarks for the training environments (steps per second)
+# Agents are replaced by uniformly random actions, generated before timing starts
+#
+# Usage (from the repository root):
+#   python Minesweeper_py/EnvironmentBenchmark.py --output env.json
+#   python Minesweeper_py/EnvironmentBenchmark.py --workers 4 --baseline env.json
+
+DEFAULT_BOARD = (9, 9, 10)                  # (columns, rows, mines)
+DEFAULT_NUM_ENVS = [1, 64, 1024, 4096]      # Batch sizes for the vectorized environment
+STEPS_PER_RUN = 100                         # Steps (of every board) per timed run
+SEED = 1234
+
+
+def random_actions(num_actions, num_steps, num_envs):
+    rng = np.random.default_rng(SEED)
+    return rng.integers(0, num_actions, (num_steps, num_envs))
+
+
+def run_single(env, actions):
+    for action in actions:
+        if env.step(action)[2]:
+            env.reset()
+
+
+def run_vector(env, actions):
+    for step_actions in actions:
+        env.step(step_actions)
+
+
+def setup_single(board):
+    env = MineSweeperEnv(*board, seed=SEED)
+    env.reset()
+    return env, [int(action) for action in random_actions(env.num_actions, STEPS_PER_RUN, 1)[:, 0]]
+
+
+def setup_vector(board, num_envs):
+    env = VectorMineSweeperEnv(num_envs, *board, seed=SEED)
+    env.reset()
+    return env, random_actions(env.num_actions, STEPS_PER_RUN, num_envs)
+
+
+def run_suite(suite, board, env_counts, num_workers):
+    label = "{}x{}/{}".format(*board)
+
+    suite.run_case(
+        "single/" + label,
+        run_single,
+        setup=lambda: setup_single(board),
+        ops_per_run=STEPS_PER_RUN
+    )
+
+    for num_envs in env_counts:
+        suite.run_case(
+            "vector/{}/{}".format(num_envs, label),
+            run_vector,
+            setup=lambda: setup_vector(board, num_envs),
+            ops_per_run=STEPS_PER_RUN * num_envs
+        )
+
+    if num_workers > 0:
+        # Workers are started once and shared by every run (starting processes isn't what's being measured)
+        num_envs = max(env_counts)
+        case_name = "subprocess/{}x{}/{}".format(num_workers, num_envs, label)
+        if suite.wants(case_name):
+            env = SubprocessVectorEnv(num_envs, *board, seed=SEED, num_workers=num_workers)
+            env.reset()
+            actions = random_actions(env.num_actions, STEPS_PER_RUN, num_envs)
+            try:
+                suite.run_case(
+                    case_name,
+                    run_vector,
+                    setup=lambda: (env, actions),
+                    ops_per_run=STEPS_PER_RUN * num_envs
+                )
+            finally:
+                env.close()
+
+
+def __main__():
+    parser = argparse.ArgumentParser(description="Benchmark the training environments")
+    parser.add_argument("--board", type=parse_board, default=DEFAULT_BOARD,
+                        help="Board as COLUMNSxROWS:MINES (default: 9x9:10)")
+    parser.add_argument("--num-envs", type=int, nargs="+", default=DEFAULT_NUM_ENVS,
+                        help="Batch sizes for the vectorized environment (default: {})".format(DEFAULT_NUM_ENVS))
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Also benchmark the subprocess backend with this many workers "
+                             "(stepping the largest batch size)")
+    add_common_arguments(parser)
+    args = parser.parse_args()
+
+    # Peak memory is measured per run, which would mean restarting worker processes under tracemalloc
+    suite = BenchmarkSuite(
+        "environment",
+        min_time=args.min_time,
+        measure_memory=not args.no_memory and args.workers == 0,
+        case_filter=args.cases
+    )
+    run_suite(suite, args.board, args.num_envs, args.workers)
+    return finish(suite, args)
+
+
+if __name__ == "__main__":
+    sys.exit(__main__())
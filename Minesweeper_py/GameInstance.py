@@ -1,30 +1,36 @@
-from Interface import *
-from GameVariables import *
+from Assets import AssetBundle
+from Interface import ProfilerOverlay
+from Scenes import RaceScene, SessionScene, StartMenuScene
+from Statistics import StatsStore
+from BoardLibrary import BoardLibrary
+from Topology import TOPOLOGIES
+from Profiler import FrameProfiler, LatencyRecorder
+from Renderer import RenderStage
 from math import ceil
-import os
+import atexit
 import sys
 import time
 import pygame
-import matplotlib
-pygame.init()
 
 
 class GameInstance:
-    def __init__(self):
-        self.current_screen = None
-        self.show_startmenu = False
-        self.show_game = False
-
-        self.clock = pygame.time.Clock()
-        self.color_scheme = matplotlib.cm.get_cmap("summer")
-
-        self.screen_control = {
-            'STARTMENU': False,
-            'GAME': False,
-            'RESTART': False,
-            'CONFIG': False,
-            'GAMEOVER': False
-        }
+    FRAME_TIME = 1 / 60             # Seconds per frame (60 fps)
+    MOUSE_BUTTONS = (1, 2, 3)       # pygame button numbers of the left, middle & right buttons
+
+    def __init__(self, trace_frames=0, race=None, engine='objects', topology='square', measure_latency=False,
+                 render_thread=False, session=None):
+        self.current_scene = None       # Scene currently being run
+        self.next_scene = None          # Scene to switch to at the end of this frame's logic
+        self.scene_change = False       # Flag indicating a scene switch was requested this frame
+        self.screen = None              # The one display surface, kept alive across scenes
+        self.display_mode = None        # ((width, height), fullscreen) the display was created with
+
+        self.engine = engine            # MineField backend games are played on (see create_mine_field)
+
+        self.next_frame = 0.0           # When the next frame is due (perf_counter)
+        self.mouse_buttons = (False, False, False)  # Mouse buttons held, as of the last press/release handled
+        self.color_scheme = None        # matplotlib colormap of the settings buttons, loaded when first needed
+        self.screen_resolution = None   # Size of the monitor, found when the display is started
 
         # Directly user-controlled settings
         self.settings = {
@@ -32,6 +38,7 @@ class GameInstance:
             'row_count': 10,          # Minimum 1    Maximum: 100
             'column_count': 10,       # Minimum 4    Maximum: 100
             'fullscreen': False,      # Controls if game will open in fullscreen mode
+            'topology': topology,     # Board topology: square, torus or hex (see Topology.py)
             'screen_size': 500        # Maximum dimension (width or height) of non-fullscreen screen,
         }
 
@@ -44,50 +51,53 @@ class GameInstance:
             'box_size': 32.0         # Current calculated size of the minesweeper squares
         }
 
+        self.asset_bundle = None     # AssetBundle every sprite is loaded from
         self.menu_elements = {}      # images for drawing menu elements
         self.face_sprites = {}       # sprites of the minesweeper dude's faces
         self.grid_sprites = {}       # sprite of grid tile icons
         self.digit_sprites = {}      # sprites of digital-clock style digits
         self.load_images()           # populate sprite_lists described above
 
-        self.screen_resolution = (pygame.display.Info().current_w, pygame.display.Info().current_h)
+        # Record of finished games. Closing flushes any games still buffered
+        self.stats_store = StatsStore()
+        atexit.register(self.stats_store.close)
 
-        print("Resolution: {}".format(pygame.display.Info()))
+        # Pre-scored boards for the daily & hard board buttons (empty until BoardLibrary.py is run)
+        self.board_library = BoardLibrary()
+
+        # Per-phase frame timings (F3 overlay, F4 log)
+        self.profiler = FrameProfiler()
+        if trace_frames > 0:
+            self.profiler.start_trace(trace_frames)
+        self.profiler_overlay = ProfilerOverlay(self.profiler)
+
+        # Input-to-display latency of mouse clicks, reported on exit (None unless measuring)
+        self.latency = LatencyRecorder() if measure_latency else None
 
-        self.run_startmenu()
+        # Scenes draw into the render stage's queue; the render stage draws & flips (see Renderer.py)
+        self.renderer = RenderStage(threaded=render_thread, latency=self.latency)
+
+        self.init_display()
+
+        # race: a Client.RaceConnection to play instead of opening the menu
+        # session: (seed string, boards, boards on screen at once) of a tournament session to play instead
+        if race is not None:
+            self.change_scene(RaceScene(self, race[0], num_boards=race[1]))
+        elif session is not None:
+            self.change_scene(SessionScene(self, session[0], num_boards=session[1], tiles=session[2]))
+        else:
+            self.change_scene(StartMenuScene(self))
+        self.run()
 
     def load_images(self):
-        self.menu_elements['MENU_BAR'] = pygame.image.load(os.path.join("Minesweeper_py", "Resources", "MenuElements", "menubar.png"))
-
-        # For each file in Sprites folder, add its filename as a
-        # reference to the loaded image in a dictionary
-        # e.g. 'grid3.png' -> self.sprite_list['grid3'] = grid3.png
-        for image_name in os.listdir(
-            os.path.join(os.getcwd(), "Minesweeper_py", "Resources", "Sprites", "Grid")
-        ):
-            self.grid_sprites[
-                image_name[:-4]
-            ] = pygame.image.load(os.path.join("Minesweeper_py", "Resources", "Sprites", "Grid", image_name))
-
-        # Load faces the same way
-        for image_name in os.listdir(
-            os.path.join(os.getcwd(),"Minesweeper_py", "Resources", "Sprites", "Faces")
-        ):
-            self.face_sprites[
-                image_name[:-4]
-            ] = pygame.image.load(os.path.join("Minesweeper_py", "Resources", "Sprites", "Faces", image_name))
-
-        # Load digits the same say
-        for image_name in os.listdir(
-            os.path.join(os.getcwd(),"Minesweeper_py", "Resources", "Sprites", "Digits")
-        ):
-            self.digit_sprites[
-                image_name[:-4]
-            ] = pygame.image.load(os.path.join("Minesweeper_py", "Resources", "Sprites", "Digits", image_name))
-
-    def exit_screen(self, screen_type):
-        # Marks a described loop control flag as False (to end that loop)
-        self.screen_control[screen_type] = False
+        # Sprites come out of the asset bundle (see Assets.py): one file opened, wherever the game is started from
+        # Each folder is a dictionary of sprites by file name, e.g. 'grid3.png' -> self.grid_sprites['grid3'],
+        # and each sprite is decoded the first time it's used
+        self.asset_bundle = AssetBundle()
+        self.menu_elements['MENU_BAR'] = self.asset_bundle.folder("MenuElements")['menubar']
+        self.grid_sprites = self.asset_bundle.folder("Sprites/Grid")
+        self.face_sprites = self.asset_bundle.folder("Sprites/Faces")
+        self.digit_sprites = self.asset_bundle.folder("Sprites/Digits")
 
     def toggle_fullscreen(self):
         self.settings['fullscreen'] = not self.settings['fullscreen']
@@ -96,6 +106,11 @@ class GameInstance:
         # (to minimums & maximums)
         self.adjust_settings('screen_size', 0)
 
+    def cycle_topology(self):
+        # Switch to the next board topology (square -> torus -> hex -> square)
+        names = list(TOPOLOGIES)
+        self.settings['topology'] = names[(names.index(self.settings['topology']) + 1) % len(names)]
+
     def adjust_settings(self, setting_type, adjust_amount):
         # Change game settings (rows, columns, number of mines)
         # Then auto-correct those settings based on set minimums/maximums
@@ -181,6 +196,10 @@ class GameInstance:
         # Given a matplotlib colormap (self.color_scheme), use a scale_factor,
         # then convert it to a colormap in the style used by my buttons
         # {'BASE': (R, G, B), 'MOUSEOVER': (R, G, B)}
+        if self.color_scheme is None:
+            # matplotlib takes longer to import than everything else put together, and only the settings use it
+            import matplotlib
+            self.color_scheme = matplotlib.colormaps["summer"]
         raw_cmap = self.color_scheme(scale_factor)
         base_color = tuple([col * 255 for col in raw_cmap[0:3]])
         mouseover_color = tuple([0.8 * col for col in base_color])
@@ -198,257 +217,10 @@ class GameInstance:
 
         return return_val
 
-    def run_startmenu(self):
-        screen_height = 300
-        screen_width = 300
-
-        # buttons on main menu
-        menu_buttons = [
-            # START BUTTON: Starts game
-            Button(
-                pos_x=0,
-                pos_y=0,
-                height=screen_height/3,
-                width=screen_width,
-                colormap=self.get_colormap(0.25),
-                box_text="START",
-                leftclick=self.run_game
-            ),
-            # CONFIG BUTTON: Opens config menu
-            Button(
-                pos_x=0, pos_y=screen_height/3,
-                height=screen_height/3,
-                width=screen_width,
-                colormap=self.get_colormap(0.5),
-                box_text="SETTINGS",
-                leftclick=self.run_settings
-            ),
-            # EXIT BUTTON: Exits Main Menu
-            Button(
-                pos_x=0,
-                pos_y=2 * screen_height/3,
-                height=screen_height/3,
-                width=screen_width,
-                colormap=self.get_colormap(0.75),
-                box_text='EXIT',
-                leftclick=lambda: self.exit_screen("STARTMENU")
-            )
-        ]
-
-        menu_screen = pygame.display.set_mode([screen_width, screen_height])
-
-        pygame.display.set_caption("Minesweeper - Menu")
-
-        self.screen_control['STARTMENU'] = True
-        while self.screen_control['STARTMENU']:
-            ### RESOLVE USER INPUT ###
-
-            for ev in pygame.event.get():
-                if ev.type == pygame.QUIT or ev.type == pygame.KEYDOWN and ev.key == pygame.K_ESCAPE:
-                    pygame.quit()
-                    sys.exit()
-
-            # Store mouse status (position & buttons) to each button
-            for mb_inputs in menu_buttons:
-                mb_inputs.store_inputs(pygame.mouse.get_pos(), pygame.mouse.get_pressed(3))
-
-            ### UPDATE GAME VARIABLES ###
-
-            # Check each button for clicked or not, run logic
-            for mb_logic in menu_buttons:
-                mb_logic.button_logic()
-
-            ### UPDATE DISPLAY ###
-
-            # Re-establish screen if it is dead
-            if self.screen_is_dead(menu_screen):
-                menu_screen = pygame.display.set_mode([screen_width, screen_height])
-                pygame.display.set_caption("Minesweeper - Menu")
-
-            # Draw each button
-            for mb_display in menu_buttons:
-                mb_display.draw(menu_screen, force=True)
-
-            pygame.display.flip()
-
-    def run_settings(self):
-        pygame.display.quit()
-        pygame.display.init()
-
-        screen_height = 200
-        screen_width = 500
-
-        self.screen_control['SETTINGS'] = True
-
-        button_width = screen_width/5
-        button_height = screen_height/4
-
-        col_color = {
-            'MINES': self.get_colormap(0),
-            'NROW': self.get_colormap(0.2),
-            'NCOL': self.get_colormap(0.4),
-            'SCREEN': self.get_colormap(0.6)
-        }
-
-        # y-coordinates for element positioning
-        row_y = {
-            'LABEL': 0,
-            'ADJUST': button_height/2,
-            'NUM': 2 * screen_height/4,
-            'CONFIRM': 3 * screen_height/4
-        }
-        # x-coordinates for element positioning
-        column_x = {
-            'MINES': 0,
-            'NROW': screen_width/5,
-            'NCOL': 2 * screen_width/5,
-            'SCREEN': 3 * screen_width/5,
-            'FULLSCREEN': 4 * screen_width/5
-        }
-        # standard time-sheet for button hold-down (on adjustment buttons)
-        adjustment_timer = [
-            (0, 10),
-            (60, 5),
-            (120, 1)
-        ]
-
-        config_buttons = [
-            ### LABEL ROW ###
-            Button(
-                pos_x=column_x['MINES'], pos_y=row_y['LABEL'],
-                width=button_width, height=(1/2) * button_height,
-                box_text='Mines', colormap=col_color['MINES'],
-                do_mouseover_color=False
-            ),
-            Button(
-                pos_x=column_x['NROW'], pos_y=row_y['LABEL'],
-                width=button_width, height=(1/2) * button_height,
-                box_text='Rows', colormap=col_color['NROW'],
-                do_mouseover_color=False
-            ),
-            Button(
-                pos_x=column_x['NCOL'], pos_y=row_y['LABEL'],
-                width=button_width, height=(1/2) * button_height,
-                box_text='Columns', colormap=col_color['NCOL'],
-                do_mouseover_color=False
-            ),
-            Button(
-                pos_x=column_x['SCREEN'], pos_y=row_y['LABEL'],
-                width=button_width, height=(1/2) * button_height,
-                box_text='Screen Size', colormap=col_color['SCREEN'],
-                do_mouseover_color=False
-            ),
-            ### ADJUSTMENT ROW ###
-            Button(
-                pos_x=column_x['MINES'], pos_y=row_y['ADJUST'],
-                width=button_width, height=(3/2) * button_height,
-                box_text="+ -", colormap=col_color['MINES'],
-                leftclick=lambda: self.adjust_settings('mine_count', 1),
-                rightclick=lambda: self.adjust_settings('mine_count', -1),
-                repeat_timer=adjustment_timer
-            ),
-            Button(
-                pos_x=column_x['NROW'], pos_y=row_y['ADJUST'],
-                width=button_width, height=(3/2) * button_height,
-                box_text="+ -", colormap=col_color['NROW'],
-                leftclick=lambda: self.adjust_settings('row_count', 1),
-                rightclick=lambda: self.adjust_settings('row_count', -1),
-                repeat_timer=adjustment_timer
-            ),
-            Button(
-                pos_x=column_x['NCOL'], pos_y=row_y['ADJUST'],
-                width=button_width, height=(3/2) * button_height,
-                box_text="+ -", colormap=col_color['NCOL'],
-                leftclick=lambda: self.adjust_settings('column_count', 1),
-                rightclick=lambda: self.adjust_settings('column_count', -1),
-                repeat_timer=adjustment_timer
-            ),
-            Button(
-                pos_x=column_x['SCREEN'], pos_y=row_y['ADJUST'],
-                width=button_width, height=(3/2) * button_height,
-                box_text="+ -", colormap=col_color['SCREEN'],
-                leftclick=lambda: self.adjust_settings('screen_size', 10),
-                rightclick=lambda: self.adjust_settings('screen_size', -5),
-                repeat_timer=adjustment_timer
-            ),
-            FullScreenButton(
-                object_link=self,
-                pos_x=column_x['FULLSCREEN'], pos_y=0,
-                width=button_width, height=3 * button_height,
-                leftclick=lambda: self.toggle_fullscreen(),
-                repeat_timer=adjustment_timer
-            ),
-            ### NUMBER DISPLAY ROW ###
-            GameSettingButton(
-                object_link=self, setting_type='mine_count',
-                pos_x=column_x['MINES'], pos_y=row_y['NUM'],
-                colormap=col_color['MINES'], do_mouseover_color=False,
-                width=button_width, height=button_height
-            ),
-            GameSettingButton(
-                object_link=self, setting_type='row_count',
-                pos_x=column_x['NROW'], pos_y=row_y['NUM'],
-                colormap=col_color['NROW'], do_mouseover_color=False,
-                width=button_width, height=button_height
-            ),
-            GameSettingButton(
-                object_link=self, setting_type='column_count',
-                pos_x=column_x['NCOL'], pos_y=row_y['NUM'],
-                colormap=col_color['NCOL'], do_mouseover_color=False,
-                width=button_width, height=button_height
-            ),
-            GameSettingButton(
-                object_link=self, setting_type='screen_size',
-                pos_x=column_x['SCREEN'], pos_y=row_y['NUM'],
-                colormap=col_color['SCREEN'], do_mouseover_color=False,
-                width=button_width, height=button_height
-            ),
-            ### CONFIRM BUTTON ###
-            Button(
-                pos_y=row_y['CONFIRM'], pos_x=0,
-                width=screen_width, height=button_height,
-                colormap=self.get_colormap(0.8),
-                box_text='CONFIRM', leftclick=lambda: self.exit_screen('SETTINGS')
-            )
-        ]
-
-        config_screen = pygame.display.set_mode([screen_width, screen_height])
-        pygame.display.set_caption("Game Settings")
-
-        # Menu screen loop
-        while self.screen_control['SETTINGS']:
-            self.clock.tick(60)
-
-            ### PROCESS USER INPUT ###
-            for ev in pygame.event.get():
-                if ev.type == pygame.QUIT:
-                    pygame.quit()
-
-            for cb in config_buttons:
-                cb.store_inputs(pygame.mouse.get_pos(), pygame.mouse.get_pressed(3))
-
-            ### UPDATE GAME VARIABLES ###
-            for cb in config_buttons:
-                cb.button_logic()
-
-            ### UPDATE DISPLAY ###
-            if self.screen_is_dead(config_screen):
-                config_screen = pygame.display.set_mode([screen_width, screen_height])
-                pygame.display.set_caption("Game Settings")
+    def compute_display_settings(self):
+        # Calculates display_settings (menu bar, face & grid tile sizes) for the current settings
+        # Returns the ((width, height), fullscreen) display mode the game screen needs
 
-            for cb in config_buttons:
-                cb.draw(config_screen)
-
-            pygame.display.flip()
-
-        pygame.display.quit()
-        pygame.display.init()
-
-    def set_display_settings(self):
-        """
-
-        :rtype: pygame.Surface
-        """
         # Static values
         menu_bar_height = 75
 
@@ -477,179 +249,166 @@ class GameInstance:
             # Though display_settings aren't used for setting up screen,
             # if fullscreen is selected, we'll still need those attributes
             # to determine display element sizes
-            return pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+            return (screen_width, screen_height), True
         else:
-            return pygame.display.set_mode([screen_width, screen_height + menu_bar_height])
+            return (screen_width, screen_height + menu_bar_height), False
 
-    def run_game(self):
-        # Potential new screen size for game: close and reopen
-        # (Things appear off-center sometimes if I don't do this, idk)
-        pygame.display.quit()
+    def init_display(self):
+        # Only the pygame modules the game uses are started (display here, font in Interface.get_font),
+        # and only once the first scene is about to be shown: importing the game starts nothing
         pygame.display.init()
+        self.screen_resolution = (pygame.display.Info().current_w, pygame.display.Info().current_h)
 
-        game_screen = self.set_display_settings()
-
-        # Create minefield from game settings
-        mine_field = MineField(self.settings['column_count'], self.settings['row_count'])
-
-        # Add mines to minefield from game settings
-        mine_field.populate_mines(self.settings['mine_count'])
-
-        # Button functions (that require >1 line)
-        def exit_all():
-            self.exit_screen("GAME")
-            self.exit_screen("RESTART")
-
-        def reset_mines():
-            # Resets mine field mines AND restarts game loop
-            mine_field.reset(self.settings['mine_count'])
-            game_grid.flag_redraw()
-            self.exit_screen("GAME")
-
-        def commit_mines():
-            mine_field.commit_mines()
-            game_grid.flag_redraw()
-
-        # Create buttons
-        menu_buttons = [
-            # FACE BUTTON
-            MineSweeperFace(
-                # Center in menu bar
-                pos_x=(self.display_settings['screen_width'] / 2) - (self.display_settings['face_size'] / 2),
-                pos_y=(self.display_settings['menu_bar_height'] / 2) - (self.display_settings['face_size'] / 2),
-                width=self.display_settings['face_size'], height=self.display_settings['face_size'],
-                leftclick=reset_mines, rightclick=commit_mines,
-                object_link=mine_field,
-                sprite_list=self.face_sprites
-            )
-        ]
-        game_grid = MineSweeperGrid(
-            pos_x=(self.display_settings['screen_width']/2) - (mine_field.size[0] * self.display_settings['box_size']/2),
-            pos_y=self.display_settings['menu_bar_height'],
-            tile_size=self.display_settings['box_size'],
-            sprite_list=self.grid_sprites,
-            object_link=mine_field
-        )
+        print("Resolution: {}".format(pygame.display.Info()))
 
-        # Use the blank digit sprite as a template for digit sprite sizes
-        digit_size_ratio = self.digit_sprites['blank'].get_width()/self.digit_sprites['blank'].get_height()
-        d_height = self.display_settings['face_size'] #* 0.9
-        d_width = digit_size_ratio * d_height
-
-        # Create digit-style counters
-        mine_counter = DigitDisplay(
-                sprite_list=self.digit_sprites,
-                digit_height=d_height, digit_width=d_width,
-                num_digits=3,
-                pos_x=(39/40) * self.display_settings['screen_width'] - (3 * d_width),
-                pos_y=(1/2) * self.display_settings['menu_bar_height'] - (1/2) * d_height
-            )
-        time_counter = DigitDisplay(
-                sprite_list=self.digit_sprites,
-                digit_height=d_height, digit_width=d_width,
-                num_digits=3,
-                pos_x=(1/40) * self.display_settings['screen_width'],
-                pos_y=(1/2) * self.display_settings['menu_bar_height'] - (1/2) * d_height
-        )
+    def set_display(self, size, fullscreen=False):
+        # Makes sure the display matches the requested mode
+        # The existing window is kept whenever it already does; otherwise it is resized in place
+        # Returns True if the display surface was (re)created
+        mode = ((int(size[0]), int(size[1])), fullscreen)
+        if self.screen is not None and mode == self.display_mode and not self.screen_is_dead(self.screen):
+            return False
+
+        # The render stage must be done with the old display first
+        self.renderer.wait_idle()
+        if fullscreen:
+            self.screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+        else:
+            self.screen = pygame.display.set_mode(mode[0])
+        self.display_mode = mode
+        self.renderer.set_target(self.screen)
+        return True
+
+    def change_scene(self, new_scene):
+        # Requests a switch to new_scene (None exits the game)
+        # The switch happens after the current frame's logic, and the new scene is drawn that same frame
+        self.next_scene = new_scene
+        self.scene_change = True
+
+    def enter_next_scene(self):
+        if self.current_scene is not None:
+            self.current_scene.exit()
+
+        self.current_scene = self.next_scene
+        self.next_scene = None
+        self.scene_change = False
+        if self.current_scene is None:
+            return
+
+        display_changed = self.set_display(*self.current_scene.get_display_mode())
+        pygame.display.set_caption(self.current_scene.caption)
+        self.current_scene.enter(display_changed)
+        self.profiler_overlay.pos = self.current_scene.overlay_pos
+
+    def toggle_overlay(self):
+        self.profiler.toggle_overlay()
+        if not self.profiler.show_overlay and self.current_scene is not None:
+            # Clear the overlay box & redraw whatever it was covering
+            self.profiler_overlay.erase(self.renderer.canvas, self.current_scene.background_color)
+            self.current_scene.flag_redraw()
+
+    def report(self):
+        if self.latency is not None:
+            self.latency.report()
+            pacing = self.renderer.pacing()
+            if pacing is not None:
+                print("[latency] {:<10} p50 {:>7.2f}   p95 {:>7.2f}   max {:>7.2f}   stdev {:>7.2f}".format(
+                    "frame gap", pacing['p50'], pacing['p95'], pacing['max'], pacing['stdev']
+                ))
+
+    def quit(self):
+        self.renderer.stop()
+        self.report()
+        pygame.quit()
+        sys.exit()
+
+    def wait_for_frame(self):
+        # Waits until the next frame is due, collecting events as they arrive
+        # Returns a list of (event, when it arrived), so latency can be measured from the moment of input
+        events = []
+        while True:
+            remaining = self.next_frame - time.perf_counter()
+            if remaining <= 0:
+                break
+            ev = pygame.event.wait(max(1, int(1000 * remaining)))
+            if ev.type != pygame.NOEVENT:
+                events.append((ev, time.perf_counter()))
+        now = time.perf_counter()
+        events.extend((ev, now) for ev in pygame.event.get())
+        self.next_frame = max(self.next_frame + self.FRAME_TIME, now)
+        return events
+
+    def mouse_event(self, scene, ev):
+        # Hands a press or release to the scene with the position it happened at
+        # Once the scene has asked to switch, the rest of the frame's clicks were aimed at a screen that's going
+        buttons = list(self.mouse_buttons)
+        buttons[ev.button - 1] = ev.type == pygame.MOUSEBUTTONDOWN
+        self.mouse_buttons = tuple(buttons)
+        if not self.scene_change:
+            scene.mouse_event(ev.pos, self.mouse_buttons)
+
+    def run(self):
+        # Main loop: runs the current scene once per frame until a scene exits the game
+        while self.scene_change or self.current_scene is not None:
+            if self.scene_change:
+                self.enter_next_scene()
+                continue
+
+            scene = self.current_scene
+            events = self.wait_for_frame()
+            self.profiler.start_frame()
 
-        # Fill background with grey and draw menu bar texture at top
-        game_screen.fill((192, 192, 192))
-        game_screen.blit(pygame.transform.scale(
-            self.menu_elements['MENU_BAR'], (self.display_settings['screen_width'], self.display_settings['menu_bar_height'])),
-            (0, 0)
-        )
-        pygame.display.set_caption("Minesweeper")
-
-        self.screen_control['RESTART'] = True
-        while self.screen_control['RESTART']:
-
-            self.screen_control['GAME'] = True
-            tick_count = 0 # Stores ticks since game start
-
-            # Run main game loop
-            while mine_field.game_state() == 0 and self.screen_control['GAME']:
-                self.clock.tick(60)
-
-                st = time.time()
-                ### RESOLVE USER INPUT ###
-                for ev in pygame.event.get():
-                    if ev.type == pygame.QUIT:
-                        pygame.quit()
-                        sys.exit()
-                    elif ev.type == pygame.KEYDOWN:
-                        if ev.key == pygame.K_ESCAPE:
-                            exit_all()
-                        elif ev.key == pygame.K_r:
-                            reset_mines()
-
-                # Store mouse inputs for each button
-                for allb in menu_buttons: # + game_buttons:
-                    allb.store_inputs(pygame.mouse.get_pos(), pygame.mouse.get_pressed(3))
-                game_grid.store_inputs(pygame.mouse.get_pos(), pygame.mouse.get_pressed(3))
-
-                ### UPDATE GAME VARIABLES ###
-                # Run click logic (where applicable) to buttons
-                for allb in menu_buttons: # + game_buttons:
-                    allb.button_logic()
-                game_grid.button_logic()
-
-                ### UPDATE DISPLAY ###
-                # Re-draw base display if dead
-                if self.screen_is_dead(game_screen):
-                    game_screen = self.set_display_settings()
-                    game_screen.fill((192, 192, 192))
-                    game_screen.blit(pygame.transform.scale(
-                        self.menu_elements['MENU_BAR'],
-                        (self.display_settings['screen_width'], self.display_settings['menu_bar_height'])),
-                        (0, 0)
-                    )
-                    pygame.display.set_caption("Minesweeper")
-
-                for allb in menu_buttons: # + game_buttons:
-                    allb.draw(game_screen)
-                game_grid.draw(game_screen)
-
-                # Since there are only two digit-counters, I choose to
-                # manually update them each loop (as opposed to looping through a list of them)
-                mine_counter.draw(game_screen, len(mine_field.mine_squares) - len(mine_field.flag_squares))
-                time_counter.draw(game_screen, int(tick_count/60))
-
-                pygame.display.flip()
-
-                tick_count += 1
-
-            # Once game loop ends, do GAMEOVER loop
-            while self.screen_control['GAME']:
-                self.clock.tick()
-                ### RESOLVE USER INPUT ###
-
-                for ev in pygame.event.get():
-                    if ev.type == pygame.QUIT:
-                        pygame.quit()
-                        sys.exit()
-                    elif ev.type == pygame.KEYDOWN:
-                        # Escape returns to startmenu
-                        if ev.key == pygame.K_ESCAPE:
-                            exit_all()
-                        elif ev.key == pygame.K_r:
-                            # R resets game
-                            reset_mines()
-
-                for mb in menu_buttons:
-                    mb.store_inputs(pygame.mouse.get_pos(), pygame.mouse.get_pressed())
-
-                ### RESOLVE LOOP VARIABLES ###
-                for mb in menu_buttons:
-                    mb.button_logic()
-
-                ### UPDATE DISPLAY ###
-                if self.screen_is_dead(game_screen):
-                    game_screen = self.set_display_settings()
-
-                for mb in menu_buttons:
-                    mb.draw(game_screen)
-
-                pygame.display.flip()
-
-        pygame.display.quit()
-        pygame.display.init()
+            ### RESOLVE USER INPUT ###
+            # Mouse presses & releases are handled one by one, in order, where they happened
+            for ev, arrival in events:
+                if ev.type == pygame.QUIT:
+                    self.quit()
+                elif ev.type == pygame.KEYDOWN and ev.key == pygame.K_F3:
+                    self.toggle_overlay()
+                elif ev.type == pygame.KEYDOWN and ev.key == pygame.K_F4:
+                    self.profiler.toggle_log()
+                elif ev.type in (pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP) and ev.button in self.MOUSE_BUTTONS:
+                    self.mouse_event(scene, ev)
+                    if self.latency is not None:
+                        self.latency.event_handled("press" if ev.type == pygame.MOUSEBUTTONDOWN else "release", arrival)
+                else:
+                    scene.handle_event(ev)
+            self.profiler.mark('events')
+
+            # Once a frame the buttons also get where the mouse is now (for hovering & held buttons)
+            self.mouse_buttons = pygame.mouse.get_pressed(3)
+            scene.store_inputs(pygame.mouse.get_pos(), self.mouse_buttons)
+            self.profiler.mark('store_inputs')
+
+            ### UPDATE GAME VARIABLES ###
+            scene.button_logic()
+            self.profiler.mark('button_logic')
+
+            if self.scene_change:
+                # Switch now so the new scene is drawn this frame
+                self.enter_next_scene()
+                scene = self.current_scene
+                if scene is None:
+                    break
+
+            ### UPDATE DISPLAY ###
+            # Re-establish screen if it is dead
+            if self.set_display(*scene.get_display_mode()):
+                scene.flag_redraw()
+
+            # The scene's draw calls are recorded, then drawn & shown by the render stage
+            # while the next frame's input & engine work goes ahead
+            scene.draw(self.renderer.canvas)
+            self.profiler.mark('draw')
+
+            if self.profiler.show_overlay:
+                self.profiler_overlay.draw(self.renderer.canvas)
+                self.profiler.mark('overlay')
+
+            self.renderer.submit(self.latency.take_pending() if self.latency is not None else None)
+            self.profiler.mark('submit')
+            self.profiler.end_frame()
+
+        self.renderer.stop()
+        self.report()
+        pygame.quit()
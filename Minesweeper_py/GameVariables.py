@@ -1,37 +1,125 @@
-from random import randint
+import random
+import struct
 import time
 
+from BitboardField import BitboardMineField, BitboardSquare
+from Difficulty import board_metrics
+from Topology import get_topology
+
+# MineField.pack layout: width, height, committed mines, revealed, clicks, commits, exploded
+PACK_HEADER = struct.Struct('!HHIIII?')
+
+# Squares a time-sliced flood fill expands between checks of the clock (see MineField.spread_waves)
+SPREAD_SLICE = 256
+
+# FieldSquare.pack bits
+SQUARE_MINE = 1
+SQUARE_MINE_REMOVED = 2
+SQUARE_FLAG = 4
+SQUARE_REVEALED = 8
+SQUARE_SOURCE_EXPLOSION = 16
+
 
 class MineField:
     # Collector of squares in minefield
     # Handles creation of minefield and current state of game
     # (win, loss, etc.)
-    def __init__(self, width, height=0):
+    def __init__(self, width, height=0, rng=None, topology=None):
         if height <= 0:
             height = width
         self.size = (width, height)
+        self.rng = rng if rng is not None else random    # Source of mine positions (e.g. a seeded random.Random)
+        self.topology = get_topology(topology, width, height)   # Which tiles neighbor which (see Topology.py)
         self.field = []                     # Container for all FieldSquares (list of lists)
+        self.squares = []                   # The same FieldSquares in one list, by topology index (x * height + y)
+        self.time_sliced = False            # If True, the front-end runs flood fills with advance_spread
+        self.profiler = None                # Optional FrameProfiler that engine timings are reported to
+        self.listeners = []                 # Functions called as listener(old_state, new_state) on state changes
+
+        # Loop through all grid coordinates to create FieldSquares
+        for x in range(width):
+            self.field.append([])
+            for y in range(height):
+                self.field[x].append(FieldSquare(x, y))
+            self.squares.extend(self.field[x])
+
+        self.reset_state()
+
+    def reset_state(self):
+        # Everything about the game in progress, apart from the squares themselves
         self.mine_squares = set()           # Set of coordinates of all squares with mines
         self.flag_squares = set()           # Set of coordinates of all squares with flags
+        self.num_correct_flags = 0          # Number of flag_squares that have a mine
+        self.num_wrong_flags = 0            # Number of flag_squares that don't have a mine
 
         self.num_committed_mines = 0        # Tracks number of successfully committed mines
         self.num_revealed = 0               # Number of tiles successfully revealed
+        self.num_clicks = 0                 # Number of digs, chords & flag toggles performed
+        self.num_commits = 0                # Number of times commit_mines has been run
         self.exploded = False
 
-        # Loop through all grid coordinates to create FieldSquares
-        for x in range(width):
-            self.field.append([])
-            for y in range(height):
-                self.field[x].append(FieldSquare(x, y))
+        # Counters kept up to date by the methods that change them, so reading them is free
+        self.state = 0                                      # Cached game_state() code
+        self.num_safe_remaining = self.size[0] * self.size[1]   # Safe tiles still to be revealed
+        self.num_mines_left = 0                             # Mines minus flags (what the mine counter shows)
+        self.metrics = None                                 # Difficulty metrics of the layout (see get_metrics)
+
+        # Change set: squares whose appearance has changed since the last take_changes()
+        # A whole-field operation (like reset) changes every square, so front-ends redraw everything then
+        self.changed = set()
+
+        # Flood fill in progress (see spread_blanks & advance_spread)
+        self.frontier = set()               # Revealed squares the flood fill still has to spread from
+        self.spreading = None               # spread_waves generator working through frontier, if any
 
     def reset(self, num_mines=-1):
         # Resets grid, spawns new mines based on # mines in current minefield state
         if num_mines < 1:
             num_mines = len(self.mine_squares) + self.num_committed_mines
 
-        self.__init__(self.size[0], self.size[1])
+        # The squares are cleared & reused rather than made again
+        # Attachments (profiler, listeners) outlive the reset, a flood fill still in progress doesn't
+        previous_state = self.state
+        self.reset_state()
+        for square in self.squares:
+            square.clear()
         self.populate_mines(num_mines)
 
+        # Let listeners know if the reset took the game out of a won/lost state
+        self.state = previous_state
+        self.update_state()
+
+    def add_listener(self, listener):
+        # listener(old_state, new_state) is called whenever game_state() changes
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        self.listeners.remove(listener)
+
+    def update_state(self):
+        # Recalculates the cached game state from the counters & notifies listeners of any change
+        #   -1  Exploded
+        #    0  Still going
+        #    1  Game won
+        if self.exploded:
+            new_state = -1
+        elif self.num_safe_remaining <= 0:
+            new_state = 1
+        else:
+            new_state = 0
+
+        if new_state != self.state:
+            old_state = self.state
+            self.state = new_state
+            for listener in list(self.listeners):
+                listener(old_state, new_state)
+
+    def take_changes(self):
+        # Returns the change set and starts a new one
+        changed = self.changed
+        self.changed = set()
+        return changed
+
     def out_of_bounds(self, pos_x, pos_y):
         return not (0 <= pos_x < self.size[0] and 0 <= pos_y < self.size[1])
 
@@ -57,6 +145,9 @@ class MineField:
                 to_return = True
                 self.mine_squares.add((pos_x, pos_y))
                 square_to_set.set_mine()
+                self.num_safe_remaining -= 1
+                self.num_mines_left += 1
+                self.metrics = None
 
                 # Increment nearby-mine counter for all neighbors
                 for neighbor in self.all_neighbors(pos_x, pos_y):
@@ -78,8 +169,8 @@ class MineField:
             # Generate random x,y pairs until a non-mined tile is found
             location_found = False
             while not location_found:
-                x_to_mine = randint(0, self.size[0] - 1)
-                y_to_mine = randint(0, self.size[1] - 1)
+                x_to_mine = self.rng.randint(0, self.size[0] - 1)
+                y_to_mine = self.rng.randint(0, self.size[1] - 1)
 
                 # Sets mine and exits while if successful
                 # Does thing and continues while loop if this fails
@@ -94,28 +185,32 @@ class MineField:
             current_mine.has_flag = False
             # Force-add the is_revealed flag
             current_mine.is_revealed = True
+            self.changed.add(current_mine)
 
         for flag_pos in self.flag_squares:
             # Force-reveal flagged non-mine tiles to display X'ed mines on gameover
             if flag_pos not in self.mine_squares:
-                self.get_square(flag_pos[0], flag_pos[1]).is_revealed = True
+                wrong_flag = self.get_square(flag_pos[0], flag_pos[1])
+                wrong_flag.is_revealed = True
+                self.changed.add(wrong_flag)
 
     def commit_mines(self):
         # A unique functionality for my implementation of minesweeper
         # Removes all successfully flagged mines from map & adjusts neighbor counts
         # Explodes if a non-mined tile is flagged
 
+        self.num_commits += 1
+
         # First, check if any flags are non-mined (we don't want to remove any mines until we know this)
-        to_commit = set()
-        for flag_pos in self.flag_squares:
-            if flag_pos not in self.mine_squares:
-                self.exploded = True
-                self.reveal_mines()
-                return
-            else:
-                # Commit flag squares that have a mine
-                to_commit.add(self.get_square(flag_pos[0], flag_pos[1]))
-        self.remove_mine(by_square=to_commit, commit=True)
+        # toggle_flag keeps the wrong-flag count up to date, so no need to look through the flags here
+        if self.num_wrong_flags > 0:
+            self.exploded = True
+            self.reveal_mines()
+            self.update_state()
+            return
+
+        # Every flag is on a mine: commit them all at once
+        self.remove_mine(by_square=[self.field[pos_x][pos_y] for pos_x, pos_y in self.flag_squares], commit=True)
 
     def remove_mine(self, x_pos=-1, y_pos=-1, by_square=None, commit=True):
         if by_square is None:
@@ -126,31 +221,52 @@ class MineField:
             except TypeError:
                 square_to_remove = {by_square}
 
-        new_blanks = set()
+        # Total up how many removed mines border each square first, so every neighbor
+        # count is decremented once no matter how many of its neighboring mines are removed
+        decrements = {}
         for square in square_to_remove:
 
             if square.remove_mine(commit):
                 # Only run removal logic if a mine was actually removed
+                self.changed.add(square)
                 if commit:
                     self.num_committed_mines += 1
                     if square.has_flag:
                         # We only need to remove flag (& flagged tile from flag list) if committing
-                        self.toggle_flag(by_square=square)
+                        square.toggle_flag()
+                        self.flag_squares.remove(square.pos)
+                        self.num_correct_flags -= 1
+                        self.num_mines_left += 1
 
                     # Main philosophy here: anything dealt with (and thus non-interactable)
                     # should be considered "Revealed"
+                    # (one more safe tile, and it's already revealed: num_safe_remaining is unchanged)
                     square.is_revealed = True
                     self.num_revealed += 1
+                else:
+                    # The layout itself changed (first move protection)
+                    self.num_safe_remaining += 1
+                    self.metrics = None
 
                 self.mine_squares.remove(square.pos)
+                self.num_mines_left -= 1
                 for neighbor in self.all_neighbors(by_square=square):
-                    assert isinstance(neighbor, FieldSquare)
-                    neighbor.neighboring_mines -= 1
-                    if neighbor.is_revealed:
-                        # Any square already revealed must now be re-evaluated for blank filling
-                        new_blanks.add(neighbor)
+                    decrements[neighbor] = decrements.get(neighbor, 0) + 1
 
+        new_blanks = set()
+        for neighbor, num_removed in decrements.items():
+            assert isinstance(neighbor, FieldSquare)
+            neighbor.neighboring_mines -= num_removed
+            if neighbor.is_revealed:
+                # Revealed numbers are on display
+                self.changed.add(neighbor)
+            if neighbor.is_revealed and neighbor.neighboring_mines == 0:
+                # A revealed square that just became blank must now spread (committed squares included)
+                new_blanks.add(neighbor)
+
+        # One flood fill for everything that was removed
         self.spread_blanks(by_square=new_blanks)
+        self.update_state()
 
     def dig(self, x_pos=-1, y_pos=-1, by_square=None):
         if by_square is not None:
@@ -162,23 +278,80 @@ class MineField:
             if square_to_dig.has_mine and self.num_revealed == 0:
                 # FIRST MOVE PROTECTION:
                 # If the first move reveals a mine, move it away and try again
-                print("FIRST MOVE PROTECTION")
                 # First populate new mine (keep the old one for now so it isn't re-populated)
                 self.populate_mines(1)
                 # Next remove the existing mine (don't commit it) and re-try the dig
                 self.remove_mine(by_square=square_to_dig, commit=False)
                 self.dig(by_square=square_to_dig)
             else:
+                self.num_clicks += 1
                 self.num_revealed += 1
+                self.num_safe_remaining -= 1
                 square_to_dig.dig()
+                self.changed.add(square_to_dig)
                 if square_to_dig.has_mine:
                     self.exploded = True
                     self.reveal_mines()
+                    self.update_state()
                 else:
                     self.spread_blanks(by_square=square_to_dig)
 
+    def chord(self, x_pos=-1, y_pos=-1, by_square=None):
+        # Chording: on a revealed number with exactly that many flags around it,
+        # dig every other neighbor in one go
+        # All the digs are done first, then a single flood fill covers every blank they uncovered
+        # Returns True if anything was dug
+        if by_square is not None:
+            square_to_chord = by_square
+        else:
+            square_to_chord = self.get_square(x_pos, y_pos)
+
+        if (
+                square_to_chord is None
+                or not square_to_chord.is_revealed
+                or square_to_chord.has_mine
+                or square_to_chord.mine_removed     # Committed: its number was never shown
+                or square_to_chord.neighboring_mines == 0
+                or self.state != 0
+        ):
+            return False
+
+        neighbors = self.all_neighbors(by_square=square_to_chord)
+        num_flags = 0
+        for neighbor in neighbors:
+            if neighbor.has_flag:
+                num_flags += 1
+        if num_flags != square_to_chord.neighboring_mines:
+            return False
+
+        to_dig = [neighbor for neighbor in neighbors if neighbor.is_clickable()]
+        if len(to_dig) == 0:
+            return False
+
+        self.num_clicks += 1
+        new_blanks = set()
+        for neighbor in to_dig:
+            neighbor.dig()
+            self.changed.add(neighbor)
+            self.num_revealed += 1
+            self.num_safe_remaining -= 1
+            if neighbor.has_mine:
+                # A misplaced flag: every other neighbor is still dug, as in classic minesweeper
+                self.exploded = True
+            elif neighbor.neighboring_mines == 0:
+                new_blanks.add(neighbor)
+
+        if self.exploded:
+            self.reveal_mines()
+            self.update_state()
+        else:
+            self.spread_blanks(by_square=new_blanks)
+        return True
+
     def spread_blanks(self, x_pos=-1, y_pos=-1, by_square=None):
         # Continually reveals neighboring squares so long as the square to consider has 0 neighboring mines
+        # With time_sliced set, the squares are only queued: the flood fill happens over the next frames,
+        # as the front-end calls advance_spread
         if by_square is None:
             to_consider = {self.get_square(x_pos, y_pos)}
         else:
@@ -187,19 +360,65 @@ class MineField:
             except TypeError:
                 to_consider = {by_square}
 
-        st = time.time()
-        # Keep a running set of tiles to consider
-        # Keep removing them & considering new ones them until the set is empty
-        while len(to_consider) > 0:
-            # Consider & remove an item in the set
-            current_square = to_consider.pop()
-            if current_square.neighboring_mines == 0:
-                # add new squares to consider only if the current one is not next to any mines
-                for neighbor in self.all_neighbors(by_square=current_square):
-                    if neighbor.is_clickable():
-                        neighbor.dig()
-                        self.num_revealed += 1
-                        to_consider.add(neighbor)
+        self.frontier |= to_consider
+        if self.spreading is None:
+            self.spreading = self.spread_waves()
+        if not self.time_sliced:
+            self.advance_spread()
+        self.update_state()
+
+    def spread_waves(self):
+        # Generator doing the flood fill for spread_blanks, one wave at a time: every clickable neighbor of
+        # the current wave's blanks is revealed, and makes up the next wave. Yields True after each wave,
+        # and False every SPREAD_SLICE squares within one, so it can be paused at any of those points
+        # Everything it reveals is counted & added to the change set as it goes, so the counters, the
+        # game state & the front-end are up to date whenever it's paused (the waves make a ripple on screen)
+        # Squares queued by spread_blanks while it's paused join the next wave
+        while len(self.frontier) > 0 and not self.exploded:
+            wave = self.frontier
+            self.frontier = set()
+            num_expanded = 0
+            for current_square in wave:
+                if current_square.neighboring_mines == 0:
+                    # add new squares to consider only if the current one is not next to any mines
+                    for neighbor in self.all_neighbors(by_square=current_square):
+                        if neighbor.is_clickable():
+                            neighbor.dig()
+                            self.changed.add(neighbor)
+                            self.num_revealed += 1
+                            self.num_safe_remaining -= 1
+                            self.frontier.add(neighbor)
+                num_expanded += 1
+                if num_expanded % SPREAD_SLICE == 0:
+                    self.update_state()
+                    yield False
+            self.update_state()
+            yield True
+
+        # A lost game doesn't keep spreading
+        self.frontier = set()
+
+    def advance_spread(self, budget=None, max_waves=None):
+        # Runs the flood fill in progress, stopping (between squares) once budget seconds have passed
+        # or max_waves waves are done. None means no limit: the flood fill is finished
+        # Returns True if there's nothing left to spread
+        if self.spreading is None:
+            return True
+
+        start = time.perf_counter()
+        num_waves = 0
+        for wave_done in self.spreading:
+            num_waves += wave_done
+            if max_waves is not None and num_waves >= max_waves:
+                break
+            if budget is not None and time.perf_counter() - start >= budget:
+                break
+        else:
+            self.spreading = None
+
+        if self.profiler is not None:
+            self.profiler.add('spread_blanks', time.perf_counter() - start)
+        return self.spreading is None
 
     def toggle_flag(self, x_pos=-1, y_pos=-1, by_square=None):
         if by_square is not None:
@@ -208,70 +427,114 @@ class MineField:
             square_to_toggle = self.get_square(x_pos, y_pos)
 
         if square_to_toggle is not None and not square_to_toggle.is_revealed:
+            self.num_clicks += 1
             square_to_toggle.toggle_flag()
+            self.changed.add(square_to_toggle)
             if square_to_toggle.has_flag:
                 self.flag_squares.add(square_to_toggle.pos)
+                flag_change = 1
             else:
                 self.flag_squares.remove(square_to_toggle.pos)
+                flag_change = -1
+            self.num_mines_left -= flag_change
+
+            # Keep track of right & wrong flags as they're placed, for commit_mines
+            if square_to_toggle.has_mine:
+                self.num_correct_flags += flag_change
+            else:
+                self.num_wrong_flags += flag_change
+
+    def get_metrics(self):
+        # Difficulty metrics of the mine layout: 3BV, openings, isolated numbers, islands & guesses
+        # (see Difficulty.py). Worked out the first time they're asked for after the mines are placed,
+        # and again only if a mine is moved. Committing mines doesn't change them.
+        if self.metrics is None:
+            self.metrics = board_metrics(self)
+        return self.metrics
 
     def game_state(self):
-        # Integer codes indicating state of game
-        #   -1  Exploded
-        #    0  Still going
-        #    1  Game won
-        if self.exploded:
-            return -1
-        elif self.num_revealed >= self.num_safe_tiles():
-            # If num tiles revealed >= number of safe tiles
-            return 1
-        else:
-            return 0
+        # Integer codes indicating state of game (see update_state)
+        # Kept up to date by every method that can change it, so this is just a lookup
+        return self.state
+
+    def pack(self):
+        # Compact snapshot of the field: a fixed header, then two bytes per square (column by column):
+        # its FieldSquare flags, and its neighboring mine count
+        # The mine/flag sets & counters are rebuilt from these by unpack()
+        # Listeners, the profiler and rng are attachments, and are not included
+        header = PACK_HEADER.pack(
+            self.size[0], self.size[1],
+            self.num_committed_mines, self.num_revealed, self.num_clicks, self.num_commits,
+            self.exploded
+        )
+        squares = [square for column in self.field for square in column]
+        return (
+            header
+            + bytes([square.pack() for square in squares])
+            + bytes([square.neighboring_mines for square in squares])
+        )
+
+    @classmethod
+    def unpack(cls, data, rng=None, topology=None):
+        # Rebuilds a MineField from pack() output
+        # (the topology isn't packed: both ends are expected to agree on it)
+        width, height, num_committed_mines, num_revealed, num_clicks, num_commits, exploded = \
+            PACK_HEADER.unpack_from(data)
+        mine_field = cls(width, height, rng, topology)
+
+        flags_start = PACK_HEADER.size
+        counts_start = flags_start + width * height
+        index = 0
+        for column in mine_field.field:
+            for square in column:
+                square.unpack(data[flags_start + index])
+                square.neighboring_mines = data[counts_start + index]
+                index += 1
+                if square.has_mine:
+                    mine_field.mine_squares.add(square.pos)
+                if square.has_flag:
+                    mine_field.flag_squares.add(square.pos)
+                    if square.has_mine:
+                        mine_field.num_correct_flags += 1
+                    else:
+                        mine_field.num_wrong_flags += 1
+
+        mine_field.num_committed_mines = num_committed_mines
+        mine_field.num_revealed = num_revealed
+        mine_field.num_clicks = num_clicks
+        mine_field.num_commits = num_commits
+        mine_field.exploded = exploded
+        mine_field.num_safe_remaining = mine_field.num_safe_tiles() - num_revealed
+        mine_field.num_mines_left = len(mine_field.mine_squares) - len(mine_field.flag_squares)
+
+        # No listeners yet, so this just sets the cached state
+        mine_field.update_state()
+        return mine_field
 
     def num_safe_tiles(self):
         return self.size[0] * self.size[1] - len(self.mine_squares)
 
     def all_neighbors(self, square_x=-1, square_y=-1, by_square=None):
+        # Neighboring FieldSquares, straight from the topology's adjacency table
         if by_square is not None:
             square_x, square_y = by_square.pos
 
-        to_return = []
-
-        for delta_x in range(-1, 2):
-            for delta_y in range(-1, 2):
-                if delta_x != 0 or delta_y != 0:
-                    neighbor_field = self.get_square(square_x + delta_x, square_y + delta_y)
-                    if neighbor_field is not None:
-                        to_return.append(neighbor_field)
-        return to_return
+        index = square_x * self.size[1] + square_y
+        starts = self.topology.starts
+        squares = self.squares
+        return [squares[neighbor] for neighbor in self.topology.neighbors[starts[index]:starts[index + 1]]]
 
     def print_minefield(self, cushion=5):
-        # Prints the status of each mine tile to console
+        # Prints the status of each mine tile to console (Terminal.py is the playable terminal front-end)
         # brackets [] indicate unrevealed squares
         # M -  mine
         # F -  flag
         # # -  number of neighboring tiles with mines
-
-        print_list = ["" for y in range(self.size[1])]
-
-        # First find the maximum element length to ensure we align everything equally
-        max_elem_len = 0
-        for x in range(self.size[0]):
-            x_list = self.field[x]
-            for y in range(self.size[1]):
-                y_elem = x_list[y]
-                elem_len = len(str(y_elem.get_display_text()))
-                if elem_len > max_elem_len:
-                    max_elem_len = elem_len
-
-        for x in range(self.size[0]):
-            x_list = self.field[x]
-            for y in range(self.size[1]):
-                y_elem = x_list[y]
-                elem_text = y_elem.get_display_text()
-                print_list[y] = print_list[y] + elem_text + " " * (cushion + max_elem_len - len(elem_text))
-
-        for str_to_print in print_list:
-            print(str_to_print)
+        # Each row is joined in one go: adding to the row strings tile by tile copied them over & over
+        texts = [[self.field[x][y].get_display_text() for x in range(self.size[0])] for y in range(self.size[1])]
+        max_elem_len = max(len(text) for row in texts for text in row)
+        for row in texts:
+            print("".join(text + " " * (cushion + max_elem_len - len(text)) for text in row))
 
 
 class FieldSquare:
@@ -282,8 +545,15 @@ class FieldSquare:
     #   revealed
     #   exploded
     # Contains methods for digging (and auto-digging blanks around it)
+    # One is made per tile, so attributes are slots rather than a per-instance __dict__
+    __slots__ = ('pos', 'neighboring_mines', 'has_mine', 'mine_removed', 'has_flag', 'is_revealed', 'source_explosion')
+
     def __init__(self, pos_x, pos_y):
         self.pos = (pos_x, pos_y)
+        self.clear()
+
+    def clear(self):
+        # Back to an untouched tile (MineField.reset reuses squares)
         self.neighboring_mines = 0  # Number of mines adjacent to this square
 
         self.has_mine = False  # Boolean flag indicating there is a mine in this field
@@ -316,6 +586,23 @@ class FieldSquare:
         if self.has_mine:
             self.source_explosion = True
 
+    def pack(self):
+        # All flags as one byte (see MineField.pack)
+        return (
+            self.has_mine * SQUARE_MINE
+            | self.mine_removed * SQUARE_MINE_REMOVED
+            | self.has_flag * SQUARE_FLAG
+            | self.is_revealed * SQUARE_REVEALED
+            | self.source_explosion * SQUARE_SOURCE_EXPLOSION
+        )
+
+    def unpack(self, packed):
+        self.has_mine = bool(packed & SQUARE_MINE)
+        self.mine_removed = bool(packed & SQUARE_MINE_REMOVED)
+        self.has_flag = bool(packed & SQUARE_FLAG)
+        self.is_revealed = bool(packed & SQUARE_REVEALED)
+        self.source_explosion = bool(packed & SQUARE_SOURCE_EXPLOSION)
+
     def get_display_text(self):
         # What text to display on printing minefield
         if self.mine_removed:
@@ -332,3 +619,20 @@ class FieldSquare:
 
         return to_return
 
+
+
+# Engine backends, chosen when a field is created
+#   objects     MineField: a FieldSquare object per tile
+#   bitboard    BitboardMineField: the board as whole-board bitboards (see BitboardField.py)
+MINE_FIELD_BACKENDS = {
+    'objects': MineField,
+    'bitboard': BitboardMineField
+}
+
+
+MINE_FIELD_TYPES = tuple(MINE_FIELD_BACKENDS.values())
+SQUARE_TYPES = (FieldSquare, BitboardSquare)    # What each backend's field holds
+
+
+def create_mine_field(width, height=0, rng=None, backend='objects', topology=None):
+    return MINE_FIELD_BACKENDS[backend](width, height, rng, topology)
@@ -1,12 +1,62 @@
 import pygame
-from GameVariables import *
-from GameInstance import *
+from GameVariables import MINE_FIELD_TYPES, SQUARE_TYPES, MineField
+from functools import lru_cache
 import math
-pygame.init()
 
 # Display & interacion elements
 # Used as a mediator between game objects & the player
 
+
+### SHARED CACHES ###
+
+@lru_cache(maxsize=32)
+def get_font(text_font, font_size):
+    # SysFont does a system font lookup & loads the font file on every call,
+    # so each (font, size) pair is only loaded once and shared by every Button
+    # The font module is started here, the first time any text is needed, rather than at import
+    if not pygame.font.get_init():
+        pygame.font.init()
+    return pygame.font.SysFont(text_font, font_size)
+
+
+@lru_cache(maxsize=512)
+def render_text(text, text_font, font_size, color=(0, 0, 0)):
+    # Rendered text surfaces, shared by every Button showing the same text
+    # Returned surfaces are shared: blit them, never draw onto them
+    return get_font(text_font, font_size).render(text, True, color)
+
+
+@lru_cache(maxsize=1024)
+def scale_sprite(sprite, size):
+    # Sprites scaled to a size, shared by every grid, face & digit display:
+    # each sprite is scaled once per size, however many boards & counters draw it
+    # Returned surfaces are shared: blit them, never draw onto them
+    return pygame.transform.scale(sprite, size)
+
+
+def hexagon_corners(left, top, width, height):
+    # Corners of the pointy-topped hexagon whose bounding box starts at (left, top)
+    return [
+        (left + width / 2, top), (left + width, top + height / 4), (left + width, top + 3 * height / 4),
+        (left + width / 2, top + height), (left, top + 3 * height / 4), (left, top + height / 4)
+    ]
+
+
+@lru_cache(maxsize=256)
+def hexagon_tile(sprite, width, height, outline_color):
+    # Sprite stretched over a hexagon's bounding box, cut to the hexagon & outlined
+    # (the corners are see-through, so neighboring tiles aren't drawn over)
+    # Shared like scale_sprite: never draw onto the returned surface
+    size = (math.ceil(width), math.ceil(height))
+    tile = pygame.Surface(size, pygame.SRCALPHA)
+    tile.blit(pygame.transform.scale(sprite, size), (0, 0))
+
+    mask = pygame.Surface(size, pygame.SRCALPHA)
+    pygame.draw.polygon(mask, (255, 255, 255, 255), hexagon_corners(0, 0, width, height))
+    tile.blit(mask, (0, 0), special_flags=pygame.BLEND_RGBA_MULT)
+    pygame.draw.polygon(tile, outline_color, hexagon_corners(0, 0, width, height), 1)
+    return tile
+
 ### INTERACTABLES ###
 
 
@@ -21,6 +71,14 @@ class Interactable:
     #   held timers (3, one for each mouse button)
     #   repeat timer (list of tuples - acts as timesheet for button-hold logic)
     # as well as storing mouse positions and button states
+    # Attributes are slots rather than a per-instance __dict__ (smaller, and quicker to make)
+    # Subclasses list only the attributes they add
+    __slots__ = (
+        'pos_x', 'pos_y', 'width', 'height',
+        'mouse_pos', 'old_pressed', 'new_pressed', 'held_timer', 'repeat_timer',
+        'default_leftclick', 'default_middleclick', 'default_rightclick'
+    )
+
     def __init__(self,
                  pos_x=0, pos_y=0,
                  width=-1, height=-1,
@@ -121,6 +179,8 @@ class Interactable:
 class ImageInteractable(Interactable):
     # Template for interactable element that uses an image surface
     # instead of rectangles.
+    __slots__ = ('sprite_list', 'display_image')
+
     def __init__(self,
                  sprite_list={},
                  **kwds):
@@ -145,9 +205,7 @@ class ImageInteractable(Interactable):
         # Only perform draw if image has changed
         if image_to_display != self.display_image:
             # Scale image to current calculated size
-            to_screen.blit(
-                pygame.transform.scale(image_to_display, (self.width, self.height)), (self.pos_x, self.pos_y)
-            )
+            to_screen.blit(scale_sprite(image_to_display, (self.width, self.height)), (self.pos_x, self.pos_y))
             self.display_image = image_to_display
 
     def mouse_collision(self):
@@ -161,6 +219,8 @@ class ImageInteractable(Interactable):
 
 
 class MineSweeperFace(ImageInteractable):
+    __slots__ = ('mine_field',)
+
     def __init__(self,
                  object_link=None,
                  **kwds):
@@ -183,7 +243,7 @@ class MineSweeperFace(ImageInteractable):
         #   Game won - Sunglasses
         #   Game loss - Xs on eyes
         #   Button Held - Held-down smile
-        assert isinstance(self.mine_field, MineField)
+        assert isinstance(self.mine_field, MINE_FIELD_TYPES)
         if self.mouse_collision() and self.new_pressed[0]:
             image_key = "HAPPY_PRESSED"
         elif self.mouse_collision() and self.new_pressed[2]:
@@ -201,12 +261,19 @@ class MineSweeperFace(ImageInteractable):
 
 class MineSweeperGrid:
     # Big daddy grid manager. Controls which of the MineSweeperSquares get drawn and which don't
+    __slots__ = (
+        'sprite_list', 'mine_field', 'move_listener', 'tile_size', 'pos', 'do_redraw',
+        'mouse_pos', 'squares', 'pressed', 'chording'
+    )
+
     def __init__(self, pos_x, pos_y,
                  tile_size, sprite_list,
-                 object_link: MineField):
+                 object_link: MineField,
+                 move_listener=None):
 
         self.sprite_list = sprite_list
         self.mine_field = object_link
+        self.move_listener = move_listener  # Optional function called as move_listener(move, x, y) after each move
         self.tile_size = tile_size
         self.pos = (pos_x, pos_y)
         self.do_redraw = True  # Flag indicating if entire field should be redrawn
@@ -219,39 +286,66 @@ class MineSweeperGrid:
             'NEW': (False, False, False),
             'OLD': (False, False, False)
         }
+        self.chording = False   # Left & right mouse have both been held since the last chord started
 
     def flag_redraw(self):
         self.do_redraw = True
 
+    def set_mine_field(self, mine_field):
+        # Shows another board of the same size in place of this one (e.g. the next board of a session)
+        # The tiles are already scaled, so nothing is reloaded: the new board is just drawn in full
+        self.mine_field = mine_field
+        self.squares = {
+            'NEW': None,
+            'OLD': None
+        }
+        self.chording = False
+        self.flag_redraw()
+
+    def prescale(self):
+        # Makes every tile up front (decoding & scaling each sprite), so none is made mid-game
+        for image_key in self.sprite_list:
+            self.get_tile(image_key)
+
     def draw(self, to_screen):
         if self.do_redraw:
             # Loop through every tile and redraw
             for tile_list in self.mine_field.field:
                 for tile_to_draw in tile_list:
                     self.draw_tile(to_screen, tile_to_draw)
+            self.mine_field.take_changes()
             self.do_redraw = False
         else:
-            # Redraw only the currently & recently interacted-with tiles
+            # Redraw the tiles the mine field has changed (digs, flood fills, flags, commits)
+            for tile_to_draw in self.mine_field.take_changes():
+                self.draw_tile(to_screen, tile_to_draw)
+
+            # And the currently & recently interacted-with tiles
             for tile_items in self.squares.items():
                 tile_to_draw = tile_items[1]
                 if tile_to_draw is not None:
                     self.draw_tile(to_screen, tile_to_draw)
 
     def draw_tile(self, to_screen, field_square):
-        assert isinstance(field_square, FieldSquare)
+        assert isinstance(field_square, SQUARE_TYPES)
         grid_x, grid_y = field_square.pos # Relative x,y position in grid of buttons
         pos_x, pos_y = self.pos # x,y position of Grid structure on main screen
 
-        image_to_draw = self.get_image(field_square)
         draw_x = pos_x + grid_x * self.tile_size
         draw_y = pos_y + grid_y * self.tile_size
 
-        to_screen.blit(
-            pygame.transform.scale(image_to_draw,(self.tile_size, self.tile_size)),
-            (draw_x, draw_y)
-        )
+        to_screen.blit(self.get_tile(self.get_image_key(field_square)), (draw_x, draw_y))
+
+    def get_tile(self, image_key):
+        # Sprite scaled to the tile size, made once per sprite & size and shared by every grid (see scale_sprite)
+        # (a whole-board redraw is then just blits, which the render stage does off the game loop)
+        return scale_sprite(self.sprite_list[image_key], (self.tile_size, self.tile_size))
 
     def get_image(self, field_square):
+        return self.sprite_list[self.get_image_key(field_square)]
+
+    def get_image_key(self, field_square):
+        # Which sprite shows the square as it is now
         if field_square.mine_removed:
             image_key = "mineRemoved"
         elif field_square.is_revealed:
@@ -281,7 +375,7 @@ class MineSweeperGrid:
             else:
                 image_key = "grid"
 
-        return self.sprite_list[image_key]
+        return image_key
 
     def store_inputs(self, mouse_pos=(-1, -1), mouse_buttons=(False, False, False)):
         self.mouse_pos = mouse_pos
@@ -311,34 +405,133 @@ class MineSweeperGrid:
             return -1, -1
 
     def button_logic(self):
+        left_new, middle_new, right_new = self.pressed['NEW']
+        left_old, middle_old, right_old = self.pressed['OLD']
+
+        # Left + right together: chord when either of them is let go
+        # Nothing else happens until both are released (so the left release doesn't also dig)
+        if left_new and right_new:
+            self.chording = True
+        if self.chording:
+            if left_old and right_old and not (left_new and right_new):
+                self.middleclick()
+            if not left_new and not right_new:
+                self.chording = False
+            return
+
         # Leftmouse: pressed and let go
-        if not self.pressed['NEW'][0] and self.pressed['OLD'][0]:
+        if not left_new and left_old:
             self.leftclick()
         # Rightmouse: click
-        elif self.pressed['NEW'][2] and not self.pressed['OLD'][2]:
+        elif right_new and not right_old:
             self.rightclick()
+        # Middlemouse: pressed and let go
+        elif not middle_new and middle_old:
+            self.middleclick()
 
     def leftclick(self):
         # Executes dig on tile, if it exists in this grid
         try:
             coord_x, coord_y = self.map_coords(self.mouse_pos)
             self.mine_field.dig(coord_x, coord_y)
-            self.flag_redraw()
+            self.report_move('dig', coord_x, coord_y)
         except TypeError:
             pass
 
+    def middleclick(self):
+        # Chords on tile, if it exists in this grid
+        coord_x, coord_y = self.map_coords(self.mouse_pos)
+        self.mine_field.chord(coord_x, coord_y)
+        self.report_move('chord', coord_x, coord_y)
+
     def rightclick(self):
         # Executes flag on tile, if it exists in this grid
         try:
             coord_x, coord_y = self.map_coords(self.mouse_pos)
             self.mine_field.toggle_flag(coord_x, coord_y)
+            self.report_move('flag', coord_x, coord_y)
         except TypeError:
             pass
 
+    def report_move(self, move, coord_x, coord_y):
+        if self.move_listener is not None and coord_x >= 0:
+            self.move_listener(move, coord_x, coord_y)
+
+
+class HexMineSweeperGrid(MineSweeperGrid):
+    # Grid for hex topologies (see Topology.py): pointy-topped hexagons, odd rows shifted half a tile right
+    # tile_size is the size a square tile would have had: hexagons are shrunk so the board still fits
+    # in the same columns x rows of square tiles
+    __slots__ = ('tile_height', 'row_height')
+    OUTLINE_COLOR = (123, 123, 123)
+
+    def __init__(self, pos_x, pos_y,
+                 tile_size, sprite_list,
+                 object_link: MineField,
+                 move_listener=None):
+        super().__init__(pos_x, pos_y, tile_size, sprite_list, object_link, move_listener)
+
+        # Board is (columns + 1/2) hexagons wide, and rows * 3/4 + 1/4 hexagon heights tall
+        columns, rows = self.mine_field.size
+        self.tile_size = tile_size * min(
+            columns / (columns + 1/2),
+            rows / (math.sqrt(3) / 2 * (rows + 1/3))
+        )                                                       # Width of a hexagon (flat side to flat side)
+        self.tile_height = self.tile_size * 2 / math.sqrt(3)    # Height of a hexagon (point to point)
+        self.row_height = self.tile_height * 3 / 4              # Distance between rows
+
+    def hexagon(self, left, top):
+        # Corners of the hexagon whose bounding box starts at (left, top)
+        return hexagon_corners(left, top, self.tile_size, self.tile_height)
+
+    def get_tile(self, image_key):
+        # Hexagon-shaped tile, made once per sprite & size and shared by every hex grid (see hexagon_tile)
+        return hexagon_tile(self.sprite_list[image_key], self.tile_size, self.tile_height, self.OUTLINE_COLOR)
+
+    def draw_tile(self, to_screen, field_square):
+        assert isinstance(field_square, SQUARE_TYPES)
+        grid_x, grid_y = field_square.pos
+        pos_x, pos_y = self.pos
+
+        draw_x = pos_x + (grid_x + (grid_y % 2) / 2) * self.tile_size
+        draw_y = pos_y + grid_y * self.row_height
+        to_screen.blit(self.get_tile(self.get_image_key(field_square)), (draw_x, draw_y))
+
+    def map_coords(self, mouse_pos):
+        # The point is in the hexagon with the nearest center. Only two can be nearest:
+        # one in each of the two rows whose hexagons cover the point's height
+        mouse_x, mouse_y = mouse_pos
+        pos_x, pos_y = self.pos
+        rel_x = mouse_x - pos_x
+        rel_y = mouse_y - pos_y
+
+        top_row = math.floor((rel_y - self.tile_height / 4) / self.row_height)
+        nearest = None
+        nearest_distance = None
+        for tile_y in (top_row, top_row + 1):
+            shift = (tile_y % 2) / 2
+            tile_x = math.floor(rel_x / self.tile_size - shift)
+            center_x = (tile_x + shift + 1/2) * self.tile_size
+            center_y = tile_y * self.row_height + self.tile_height / 2
+            distance = (rel_x - center_x) ** 2 + (rel_y - center_y) ** 2
+            if nearest is None or distance < nearest_distance:
+                nearest = (tile_x, tile_y)
+                nearest_distance = distance
+
+        if self.mine_field.out_of_bounds(*nearest):
+            return -1, -1
+        return nearest
+
 
 class Button(Interactable):
     # A type of interactable drawn using
     # pygame rectangles & text surfaces
+    __slots__ = (
+        'rect', 'display_color', 'display_text', 'do_mouseover_color', 'default_shape_color',
+        'default_text', 'default_font', 'default_font_size', 'text_surface', 'text_rect',
+        'mouse_buttons', 'default_textfunc', 'default_colorfunc'
+    )
+
     def __init__(self,
                  colormap=None, do_mouseover_color=True,
                  box_text="",
@@ -382,7 +575,7 @@ class Button(Interactable):
         self.default_font_size = font_size      # Default font size if none other specified
 
         # Render initial text objects/details
-        self.text_surface = pygame.font.SysFont(text_font, font_size).render(box_text, True, (0, 0, 0))
+        self.text_surface = render_text(box_text, text_font, font_size)
         self.text_rect = self.text_surface.get_rect(center=self.rect.center)
 
         self.mouse_pos = (-1, -1)
@@ -415,9 +608,14 @@ class Button(Interactable):
         else:
             return self.default_textfunc()
 
-    def change_text(self, new_text="", new_font='Arial', new_font_size=10):
+    def change_text(self, new_text="", new_font=None, new_font_size=None):
         # Change the text of button by redefining default_text, text surface & text object
-        self.text_surface = pygame.font.SysFont(new_font, new_font_size).render(new_text, True, (0, 0, 0))
+        # Font & size default to the ones the button was created with
+        if new_font is None:
+            new_font = self.default_font
+        if new_font_size is None:
+            new_font_size = self.default_font_size
+        self.text_surface = render_text(new_text, new_font, new_font_size)
         self.text_rect = self.text_surface.get_rect(center=self.rect.center)
         self.default_text = new_text
 
@@ -443,9 +641,10 @@ class Button(Interactable):
         # If either changes (text or color) we have to draw both
         # - Redrawing rectangle covers up old text, then we have to
         #   redraw text on top
+        # (a fill rather than pygame.draw.rect: buttons may be drawing into a Renderer.ChangeQueue)
         if do_draw_rect or do_change_text:
             try:
-                pygame.draw.rect(to_screen, color_to_draw, self.rect)
+                to_screen.fill(color_to_draw, self.rect)
             except:
                 print("HERE")
             to_screen.blit(self.text_surface, self.text_rect)
@@ -456,6 +655,8 @@ class Button(Interactable):
 class ObjectButton(Button):
     # Specialized button whose color and text elements
     # are dependent on a linked object's get_color() and get_text() methods
+    __slots__ = ('object',)
+
     def __init__(self, object_link, **kwds):
         self.object = object_link
         super().__init__(**kwds)
@@ -479,6 +680,8 @@ class ObjectButton(Button):
 class GameSettingButton(ObjectButton):
     # ObjectButton that grabs text from the provided game setting type
     # (mine_count, row_count, or column_count) to write as text
+    __slots__ = ('setting_type',)
+
     def __init__(self, setting_type, **kwds):
         self.setting_type = setting_type
         super().__init__(**kwds)
@@ -488,6 +691,8 @@ class GameSettingButton(ObjectButton):
 
 
 class FullScreenButton(ObjectButton):
+    __slots__ = ()
+
     def get_text(self):
         if self.object.settings['fullscreen']:
             return "FULLSCREEN"
@@ -525,12 +730,12 @@ class DigitDisplay:
         if digit_width > 0:
             self.digit_width = digit_width
         else:
-            self.digit_width = list(sprite_list.items())[0][1].get_width()
+            self.digit_width = next(iter(sprite_list.values())).get_width()
 
         if digit_height > 0:
             self.digit_height = digit_height
         else:
-            self.digit_height = list(sprite_list.items())[0][1].get_height()
+            self.digit_height = next(iter(sprite_list.values())).get_height()
 
     def force_draw(self, to_screen, image_key_list):
         # Forcefully update display based on a list of image keys
@@ -538,26 +743,40 @@ class DigitDisplay:
         digits_drawn = 0
         for sprite_key in image_key_list:
             to_screen.blit(
-                pygame.transform.scale(self.sprite_list[sprite_key], (self.digit_width, self.digit_height)),
+                scale_sprite(self.sprite_list[sprite_key], (self.digit_width, self.digit_height)),
                 (self.pos[0] + self.digit_width * digits_drawn, self.pos[1])
             )
             digits_drawn += 1
 
+    def flag_redraw(self):
+        # Draw on the next call to draw() even if the number hasn't changed
+        self.current_number = None
+
+    def prescale(self):
+        # Scales every digit up front (see MineSweeperGrid.prescale)
+        for sprite in self.sprite_list.values():
+            scale_sprite(sprite, (1.05*self.digit_width, self.digit_height))
+
     def draw(self, to_screen, number):
+        # Only blits when the number shown actually changes
+        if number == self.current_number:
+            return
+        self.current_number = number
+
         digits_to_draw = self.get_digits(number)
         num_blanks = self.num_digits - len(digits_to_draw)
 
         digits_drawn = 0
         for nb in range(num_blanks):
             to_screen.blit(
-                pygame.transform.scale(self.sprite_list['blank'], (1.05*self.digit_width, self.digit_height)),
+                scale_sprite(self.sprite_list['blank'], (1.05*self.digit_width, self.digit_height)),
                 (self.pos[0] + self.digit_width * digits_drawn, self.pos[1])
             )
             digits_drawn += 1
 
         for sprite_key in digits_to_draw:
             to_screen.blit(
-                pygame.transform.scale(self.sprite_list[sprite_key], (1.05*self.digit_width, self.digit_height)),
+                scale_sprite(self.sprite_list[sprite_key], (1.05*self.digit_width, self.digit_height)),
                 ((self.pos[0] + self.digit_width * digits_drawn), self.pos[1])
             )
             digits_drawn += 1
@@ -601,3 +820,46 @@ class DigitDisplay:
             num -= to_append * current_factor
         return digits
 
+
+
+class ProfilerOverlay:
+    # Draws a FrameProfiler's rolling phase timings as a text box on top of the screen
+    def __init__(self, profiler, pos_x=0, pos_y=0, font_size=14, refresh_interval=15):
+        self.profiler = profiler
+        self.pos = (pos_x, pos_y)
+        self.font_size = font_size
+        self.refresh_interval = refresh_interval    # Frames between text re-renders
+        self.font = None                            # Loaded on first draw (SysFont lookups are slow)
+        self.line_surfaces = []                     # Rendered lines currently shown
+        self.rect = None                            # Screen area covered by the last draw
+
+    def draw(self, to_screen):
+        if self.font is None:
+            self.font = get_font('Courier', self.font_size)
+
+        # Re-render text only every few frames; blitting the cached lines is cheap
+        if len(self.line_surfaces) == 0 or self.profiler.frame_count % self.refresh_interval == 0:
+            self.line_surfaces = [
+                self.font.render(line, True, (255, 255, 255)) for line in self.profiler.summary_lines()
+            ]
+
+        padding = 4
+        width = max(line.get_width() for line in self.line_surfaces) + 2 * padding
+        height = sum(line.get_height() for line in self.line_surfaces) + 2 * padding
+        if self.rect is not None and (self.rect.width > width or self.rect.height > height):
+            # Box shrank: cover the previous area so no stale text is left behind
+            width = max(width, self.rect.width)
+            height = max(height, self.rect.height)
+        self.rect = pygame.rect.Rect(self.pos[0], self.pos[1], width, height)
+
+        to_screen.fill((0, 0, 0), self.rect)
+        line_y = self.pos[1] + padding
+        for line in self.line_surfaces:
+            to_screen.blit(line, (self.pos[0] + padding, line_y))
+            line_y += line.get_height()
+
+    def erase(self, to_screen, background_color):
+        # Clears the overlay area. Whatever was drawn beneath it must be redrawn by its owner
+        if self.rect is not None:
+            to_screen.fill(background_color, self.rect)
+            self.rect = None
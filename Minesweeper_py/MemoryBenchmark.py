@@ -0,0 +1,127 @@
+import os
+# Interface objects are made off-screen through SDL's dummy video driver: no window is ever opened
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import gc
+import random
+import sys
+import tracemalloc
+
+import pygame
+
+from Benchmark import BenchmarkSuite, add_common_arguments, finish
+from GameVariables import MINE_FIELD_BACKENDS, create_mine_field
+from Interface import Button, ImageInteractable, Interactable, MineSweeperFace, MineSweeperGrid
+
+# Memory benchmarks for the engine & interface objects, measured with tracemalloc
+#   field/100x100       Bytes (and memory blocks) per tile that a whole field keeps alive
+#   reset/100x100       Peak bytes per tile allocated while a populated field is reset
+#   widget/<class>      Bytes (and memory blocks) per instance of each interface class
+# The topology's adjacency table is shared by every field of a size, so it's built beforehand and left out.
+# Results are compared against a baseline by bytes per item (smaller is better).
+#
+# Usage (from the repository root):
+#   python Minesweeper_py/MemoryBenchmark.py --output memory.json
+#   python Minesweeper_py/MemoryBenchmark.py --sizes 100 300 --backends objects bitboard --baseline memory.json
+
+DEFAULT_SIZES = [100]       # Square board dimensions to measure
+RESET_DENSITY = 0.15        # Mine density of the boards that are reset
+WIDGET_COUNT = 1000         # Instances made of each interface class
+SEED = 1234
+
+
+def measure_retained(build, num_items):
+    # Bytes & memory blocks per item that build() leaves allocated (while its result is kept)
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    kept = build()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    # Leave out tracemalloc's own bookkeeping (the first snapshot)
+    ignore_tracemalloc = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    differences = after.filter_traces(ignore_tracemalloc).compare_to(
+        before.filter_traces(ignore_tracemalloc), 'filename'
+    )
+    del kept
+    return {
+        'items': num_items,
+        'bytes_per_item': sum(difference.size_diff for difference in differences) / num_items,
+        'blocks_per_item': sum(difference.count_diff for difference in differences) / num_items
+    }
+
+
+def measure_peak(func, num_items):
+    # Peak bytes per item allocated while func() runs
+    gc.collect()
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        'items': num_items,
+        'bytes_per_item': peak / num_items
+    }
+
+
+def run_field_cases(suite, sizes, backend='objects'):
+    prefix = "" if backend == 'objects' else backend + "/"
+    for size in sizes:
+        label = "{0}x{0}".format(size)
+        num_tiles = size * size
+        create_mine_field(size, size, backend=backend).topology.starts   # Build the shared table first
+
+        if suite.wants(prefix + "field/" + label):
+            suite.record(prefix + "field/" + label, measure_retained(
+                lambda: create_mine_field(size, size, backend=backend), num_tiles
+            ))
+
+        if suite.wants(prefix + "reset/" + label):
+            random.seed(SEED)
+            mine_field = create_mine_field(size, size, backend=backend)
+            mine_field.populate_mines(int(num_tiles * RESET_DENSITY))
+            mine_field.get_square(0, 0)     # Square views are made before the reset (bitboards cache them)
+            suite.record(prefix + "reset/" + label, measure_peak(mine_field.reset, num_tiles))
+
+
+def run_widget_cases(suite):
+    mine_field = create_mine_field(10, 10)
+    sprites = {'DEFAULT': pygame.Surface((16, 16))}
+    widgets = {
+        'Interactable': lambda i: Interactable(pos_x=i, pos_y=0, width=50, height=20),
+        'ImageInteractable': lambda i: ImageInteractable(pos_x=i, pos_y=0, width=50, height=20, sprite_list=sprites),
+        'MineSweeperFace': lambda i: MineSweeperFace(
+            pos_x=i, pos_y=0, width=32, height=32, object_link=mine_field, sprite_list=sprites
+        ),
+        'Button': lambda i: Button(pos_x=i, pos_y=0, width=50, height=20, box_text="BUTTON"),
+        'MineSweeperGrid': lambda i: MineSweeperGrid(i, 0, 10, sprites, mine_field)
+    }
+    for name, make in widgets.items():
+        make(0)     # Anything made once & shared (rendered text, fonts) is made before measuring
+        if suite.wants("widget/" + name):
+            suite.record("widget/" + name, measure_retained(
+                lambda: [make(i) for i in range(WIDGET_COUNT)], WIDGET_COUNT
+            ))
+
+
+def __main__():
+    parser = argparse.ArgumentParser(description="Measure memory used by engine & interface objects")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="Square board sizes to measure (default: {})".format(DEFAULT_SIZES))
+    parser.add_argument("--backends", nargs="+", default=['objects'], choices=sorted(MINE_FIELD_BACKENDS),
+                        help="Engine backends to measure (default: objects)")
+    add_common_arguments(parser, timed=False, optional_memory=False)
+    args = parser.parse_args()
+
+    suite = BenchmarkSuite("memory", case_filter=args.cases)
+    for backend in args.backends:
+        run_field_cases(suite, args.sizes, backend)
+    run_widget_cases(suite)
+    return finish(suite, args)
+
+
+if __name__ == "__main__":
+    sys.exit(__main__())
@@ -0,0 +1,305 @@
+import cProfile
+import io
+import pstats
+import signal
+import time
+from collections import Counter, deque
+
+from Benchmark import summarize
+
+
+class FrameProfiler:
+    # Breaks each frame of a game loop into named phases and keeps rolling timings for them
+    #
+    # Usage inside a loop:
+    #   profiler.start_frame()
+    #   ...handle events...     profiler.mark('events')
+    #   ...draw...              profiler.mark('draw')
+    #   profiler.end_frame()
+    # mark(phase) attributes the time since the previous mark to that phase.
+    # Code that runs inside a phase (e.g. MineField.spread_blanks) can report its own
+    # time with add(); those show up as nested phases and aren't counted twice in the frame total.
+    #
+    # Every method returns immediately while the profiler is disabled,
+    # so the loop can keep its calls in place at near-zero cost.
+    # Enabling takes effect from the next start_frame(), so no partial frame is ever recorded.
+    def __init__(self, window=120, log_interval=60):
+        self.enabled = False        # Master switch: nothing is recorded while False
+        self.show_overlay = False   # Overlay requested (enables profiler)
+        self.do_log = False         # Log output requested (enables profiler)
+        self.window = window                # Number of frames rolling stats are taken over
+        self.log_interval = log_interval    # Frames between log summaries
+
+        self.phases = []            # Phase names, in the order they were first seen
+        self.nested = set()         # Phases reported with add() (timed within another phase)
+        self.history = {}           # Phase name -> deque of the last `window` timings (ms)
+        self.worst = {}             # Phase name -> worst timing (ms) since the profiler was enabled
+
+        self.frame_count = 0        # Frames recorded since the profiler was enabled
+        self.trace_remaining = 0    # Frames left to print individually (see start_trace)
+        self.in_frame = False       # A frame is being recorded (start_frame ran while enabled)
+        self.frame_start = 0.0
+        self.last_mark = 0.0
+        self.current = {}           # Phase timings (seconds) for the frame in progress
+
+    def toggle_overlay(self):
+        self.show_overlay = not self.show_overlay
+        self.update_enabled()
+
+    def toggle_log(self):
+        self.do_log = not self.do_log
+        self.update_enabled()
+
+    def start_trace(self, num_frames):
+        # Print the phase breakdown of each of the next num_frames frames
+        self.trace_remaining = max(0, num_frames)
+        self.update_enabled()
+
+    def update_enabled(self):
+        enabled = self.show_overlay or self.do_log or self.trace_remaining > 0
+        if enabled and not self.enabled:
+            self.clear()
+        self.enabled = enabled
+
+    def clear(self):
+        self.phases = []
+        self.nested = set()
+        self.history = {}
+        self.worst = {}
+        self.frame_count = 0
+
+    def start_frame(self):
+        self.in_frame = self.enabled
+        if not self.in_frame:
+            return
+        self.frame_start = self.last_mark = time.perf_counter()
+        self.current = {}
+
+    def mark(self, phase):
+        # Attribute the time since the previous mark (or frame start) to `phase`
+        if not self.in_frame:
+            return
+        now = time.perf_counter()
+        self.current[phase] = self.current.get(phase, 0.0) + (now - self.last_mark)
+        self.last_mark = now
+
+    def add(self, phase, seconds):
+        # Record time measured by the caller, as a phase nested inside the current one
+        if not self.in_frame:
+            return
+        self.nested.add(phase)
+        self.current[phase] = self.current.get(phase, 0.0) + seconds
+
+    def end_frame(self):
+        if not self.in_frame:
+            return
+        self.in_frame = False
+        self.current['FRAME'] = time.perf_counter() - self.frame_start
+
+        for phase, seconds in self.current.items():
+            if phase not in self.history:
+                self.phases.append(phase)
+                self.history[phase] = deque(maxlen=self.window)
+                self.worst[phase] = 0.0
+            ms = 1000 * seconds
+            self.history[phase].append(ms)
+            if ms > self.worst[phase]:
+                self.worst[phase] = ms
+
+        # Phases that didn't run this frame count as 0ms, so averages stay per-frame
+        for phase in self.phases:
+            if phase not in self.current:
+                self.history[phase].append(0.0)
+
+        self.frame_count += 1
+        if self.do_log and self.frame_count % self.log_interval == 0:
+            self.log_summary()
+
+        if self.trace_remaining > 0:
+            self.log_frame()
+            self.trace_remaining -= 1
+            if self.trace_remaining == 0:
+                self.update_enabled()
+
+    def summary(self):
+        # List of (phase, rolling average ms, rolling worst ms, all-time worst ms, is nested)
+        # The frame total is listed first
+        ordered = ['FRAME'] + [phase for phase in self.phases if phase != 'FRAME']
+        to_return = []
+        for phase in ordered:
+            if phase not in self.history:
+                continue
+            timings = self.history[phase]
+            to_return.append((
+                phase,
+                sum(timings) / len(timings),
+                max(timings),
+                self.worst[phase],
+                phase in self.nested
+            ))
+        return to_return
+
+    def summary_lines(self):
+        lines = ["{:<16}{:>8}{:>8}{:>8}".format("phase (ms)", "avg", "max", "worst")]
+        for phase, average, rolling_worst, worst, nested in self.summary():
+            if nested:
+                phase = "  " + phase
+            lines.append("{:<16}{:>8.2f}{:>8.2f}{:>8.2f}".format(phase, average, rolling_worst, worst))
+        return lines
+
+    def log_summary(self):
+        print("[profiler] frame {} (last {} frames)".format(self.frame_count, min(self.frame_count, self.window)))
+        for line in self.summary_lines():
+            print("[profiler] " + line)
+
+    def log_frame(self):
+        # One line with each phase of the frame that just ended
+        parts = ["FRAME={:.3f}ms".format(1000 * self.current['FRAME'])]
+        for phase in self.phases:
+            if phase in self.current and phase != 'FRAME':
+                parts.append("{}={:.3f}ms".format(phase, 1000 * self.current[phase]))
+        print("[trace] frame {:>5} ".format(self.frame_count) + " ".join(parts))
+
+
+class LatencyRecorder:
+    # Input-to-display latency: the time from a mouse button event arriving to the display flip
+    # that shows the frame it was handled in
+    # Events are stamped as they come in (see GameInstance.wait_for_frame), so time spent waiting
+    # for the frame to start is counted too
+    # The frame is shown by the render stage (see Renderer.py): the game loop hands it the frame's
+    # handled events (take_pending) and the render stage calls frame_shown once they're on screen
+    def __init__(self):
+        self.pending = []           # (kind, arrival time) of events handled in the frame being drawn
+        self.latencies = {}         # kind -> list of latencies (seconds)
+
+    def event_handled(self, kind, arrival):
+        self.pending.append((kind, arrival))
+
+    def take_pending(self):
+        # The events handled this frame, to go along with it to the render stage
+        pending = self.pending
+        self.pending = []
+        return pending
+
+    def frame_shown(self, handled):
+        # Call right after the display flip showing the frame(s) `handled` came with
+        now = time.perf_counter()
+        for kind, arrival in handled:
+            self.latencies.setdefault(kind, []).append(now - arrival)
+
+    def summary(self):
+        # kind -> percentile summary in milliseconds (see Benchmark.summarize), plus 'all' for every event
+        every = [latency for latencies in self.latencies.values() for latency in latencies]
+        to_return = {}
+        for kind, latencies in sorted(self.latencies.items()) + [('all', every)]:
+            if len(latencies) > 0:
+                to_return[kind] = summarize([1000 * latency for latency in latencies])
+                to_return[kind]['count'] = len(latencies)
+        return to_return
+
+    def report(self):
+        summary = self.summary()
+        if len(summary) == 0:
+            print("[latency] no mouse button events")
+            return
+        print("[latency] input event to display flip (ms)")
+        for kind, stats in summary.items():
+            print("[latency] {:<10} p50 {:>7.2f}   p95 {:>7.2f}   p99 {:>7.2f}   max {:>7.2f}   ({} events)".format(
+                kind, stats['p50'], stats['p95'], stats['p99'], stats['max'], stats['count']
+            ))
+
+
+class SamplingProfiler:
+    # Low-overhead statistical profiler
+    # A SIGPROF interval timer interrupts the program every `interval` seconds of CPU time,
+    # and the signal handler records the call stack it interrupted. Nothing runs between samples,
+    # so the cost is independent of how many Python calls the program makes.
+    # Needs signal.setitimer (Unix only); signals are only handled on the main thread.
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.self_samples = Counter()   # Function -> samples where it was the innermost frame
+        self.total_samples = Counter()  # Function -> samples where it was anywhere on the stack
+        self.sample_count = 0
+        self.previous_handler = None
+
+    @staticmethod
+    def is_supported():
+        return hasattr(signal, 'setitimer') and hasattr(signal, 'SIGPROF')
+
+    def start(self):
+        self.previous_handler = signal.signal(signal.SIGPROF, self.take_sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def stop(self):
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        signal.signal(signal.SIGPROF, self.previous_handler or signal.SIG_DFL)
+
+    def take_sample(self, signum, frame):
+        self.sample_count += 1
+        seen = set()
+        innermost = True
+        while frame is not None:
+            code = frame.f_code
+            function = (code.co_filename, code.co_firstlineno, code.co_name)
+            if innermost:
+                self.self_samples[function] += 1
+                innermost = False
+            if function not in seen:
+                # Recursive functions only count once per sample
+                self.total_samples[function] += 1
+                seen.add(function)
+            frame = frame.f_back
+
+    def report_lines(self, limit=40):
+        lines = [
+            "{} samples at {:.1f}ms intervals (~{:.2f}s CPU)".format(
+                self.sample_count, 1000 * self.interval, self.sample_count * self.interval
+            ),
+            "{:>8} {:>8} {:>8} {:>8}  function".format("self", "self%", "total", "total%")
+        ]
+        total = max(1, self.sample_count)
+        for function, count in self.total_samples.most_common(limit):
+            filename, line_number, name = function
+            self_count = self.self_samples.get(function, 0)
+            lines.append("{:>8} {:>7.1f}% {:>8} {:>7.1f}%  {} ({}:{})".format(
+                self_count, 100 * self_count / total, count, 100 * count / total, name, filename, line_number
+            ))
+        return lines
+
+
+def run_profiled(func, path, sampling=False, interval=0.005, limit=40):
+    # Runs func() under a profiler and writes a per-function report when it ends (however it ends)
+    #   cProfile:   raw pstats data to `path`, readable report to `path`.txt
+    #   sampling:   readable report to `path`
+    if sampling and not SamplingProfiler.is_supported():
+        print("Sampling profiler is not supported on this platform; using cProfile")
+        sampling = False
+
+    if sampling:
+        profiler = SamplingProfiler(interval)
+        report_path = path
+        profiler.start()
+    else:
+        profiler = cProfile.Profile()
+        report_path = path + ".txt"
+        profiler.enable()
+
+    try:
+        return func()
+    finally:
+        if sampling:
+            profiler.stop()
+            report = "\n".join(profiler.report_lines(limit)) + "\n"
+        else:
+            profiler.disable()
+            profiler.dump_stats(path)
+            report_stream = io.StringIO()
+            stats = pstats.Stats(profiler, stream=report_stream)
+            stats.sort_stats('cumulative').print_stats(limit)
+            report = report_stream.getvalue()
+            print("Profile data written to {}".format(path))
+
+        with open(report_path, 'w') as report_file:
+            report_file.write(report)
+        print(report)
+        print("Profile report written to {}".format(report_path))
@@ -0,0 +1,114 @@
+import hashlib
+import random
+import secrets
+import time
+
+from GameVariables import MineField
+
+# Race mode: every player gets an identical board, generated from a shared seed string
+#
+# A seed string holds the board settings and a token, e.g. "16x16-40-9f3a61c2"
+# (any token works: "30x16-99-friday" is a valid race too). The token is hashed into the seed,
+# so the same string gives the same mines on any machine and Python version.
+#
+# Race boards start with an opening already dug (the same one for everyone), so the first click
+# is never a guess and first move protection never has to move a mine (which would make boards differ).
+
+
+def make_seed_string(columns, rows, mines, token=None):
+    if token is None:
+        token = secrets.token_hex(4)
+    return "{}x{}-{}-{}".format(columns, rows, mines, token)
+
+
+def parse_seed_string(text):
+    # Returns (columns, rows, mines, seed)
+    try:
+        dimensions, mines, token = text.strip().split("-", 2)
+        columns, rows = dimensions.lower().split("x")
+        return int(columns), int(rows), int(mines), seed_from_token(token)
+    except ValueError:
+        raise ValueError("Seed strings look like COLUMNSxROWS-MINES-TOKEN (e.g. 16x16-40-9f3a61c2), not {!r}".format(text))
+
+
+def seed_from_token(token):
+    # Stable across processes (unlike hash()) and small enough for a signed 64-bit field
+    return int.from_bytes(hashlib.sha256(token.encode()).digest()[:8], 'big') >> 1
+
+
+def create_race_field(columns, rows, mines, seed):
+    # The board every player in a race gets: same mines, same opening dug
+    mine_field = MineField(columns, rows, random.Random(seed))
+    mine_field.populate_mines(mines)
+
+    # Start from a random blank (so the opening spreads), or any safe square if there are no blanks
+    safe_squares = [square for column in mine_field.field for square in column if not square.has_mine]
+    blanks = [square for square in safe_squares if square.neighboring_mines == 0]
+    mine_field.dig(by_square=mine_field.rng.choice(blanks if len(blanks) > 0 else safe_squares))
+
+    # The opening isn't the player's click, and front-ends draw the whole new board anyway
+    mine_field.num_clicks = 0
+    mine_field.take_changes()
+    return mine_field
+
+
+class RacePlayer:
+    def __init__(self, index, name, mine_field):
+        self.index = index              # Position the player joined the race in
+        self.name = name
+        self.mine_field = mine_field
+        self.start_time = time.monotonic()
+        self.finish_time = None         # Set when the player's game is won or lost
+        self.outcome = 0                # Final game state (1 won, -1 lost)
+
+    def elapsed(self):
+        end_time = self.finish_time if self.finish_time is not None else time.monotonic()
+        return end_time - self.start_time
+
+
+class RaceSession:
+    # Players racing on one seed, and the finish-time leaderboard
+    # Each player's time runs from when they joined (so late joiners aren't penalized)
+    # Players who leave stay on the leaderboard, so they still count toward max_players
+    MAX_PLAYERS = 256       # Player numbers are sent in one byte (see Server.py)
+
+    def __init__(self, columns, rows, mines, seed, max_players=MAX_PLAYERS):
+        self.config = (columns, rows, mines, seed)
+        self.max_players = min(max_players, self.MAX_PLAYERS)
+        self.players = []
+
+    def is_full(self):
+        return len(self.players) >= self.max_players
+
+    def add_player(self, name=""):
+        # Returns the new RacePlayer, or None if the race is full
+        if self.is_full():
+            return None
+        player = RacePlayer(len(self.players), name, create_race_field(*self.config))
+        player.mine_field.add_listener(
+            lambda old_state, new_state, player=player: self.player_finished(player, new_state)
+        )
+        self.players.append(player)
+        return player
+
+    def player_finished(self, player, state):
+        if state != 0 and player.finish_time is None:
+            player.finish_time = time.monotonic()
+            player.outcome = state
+
+    def place(self, player):
+        # 1st, 2nd... for winners by time, 0 for anyone who hasn't won
+        if player.outcome != 1:
+            return 0
+        return 1 + sum(1 for other in self.players if other.outcome == 1 and other.elapsed() < player.elapsed())
+
+    def leaderboard(self):
+        # Winners by time, then players still going, then players who lost
+        def rank(player):
+            if player.outcome == 1:
+                return 0, player.elapsed()
+            elif player.outcome == 0:
+                return 1, player.index
+            else:
+                return 2, player.index
+        return sorted(self.players, key=rank)
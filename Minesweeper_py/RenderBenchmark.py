@@ -0,0 +1,417 @@
+import os
+# Render off-screen through SDL's dummy video driver: no window is ever opened
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import random
+import sys
+import time
+import tracemalloc
+
+import pygame
+
+from Assets import AssetBundle
+from Benchmark import BenchmarkSuite, add_common_arguments, finish, parse_board, summarize
+from GameVariables import MineField
+from Interface import Button, DigitDisplay, GameSettingButton, MineSweeperFace, MineSweeperGrid
+from Renderer import RenderStage
+
+# Benchmarks for the Interface layer
+# Scripted mouse input is fed through the same store_inputs / button_logic / draw sequence
+# that run_game uses, against an off-screen surface. For every script this reports
+#   frame time percentiles (p50/p95/p99)
+#   blits per frame
+#   surfaces scaled per frame (pygame.transform.scale) & fonts loaded per frame (pygame.font.SysFont)
+#   Python heap bytes allocated per frame (tracemalloc peak)
+# Counting and allocation tracing are done in separate passes from the timed pass
+#
+# The pacing cases play each board in real time at 60 fps, the way GameInstance runs its loop,
+# with the face clicked every couple of seconds (a new board: a whole-board redraw) on top of play_script:
+#   pacing/direct       drawing straight onto the display, then display.flip (the game loop before Renderer.py)
+#   pacing/serial       through a RenderStage, drawn & shown on the loop's own thread (the game's default)
+#   pacing/threaded     through a RenderStage on its own thread (--render-thread)
+# These report the loop's own time per frame (frame_ms: what holds up the next input) and the time between
+# frames reaching the display (present_interval_ms), with the standard deviation of both as frame time variance
+#
+# Usage (from the repository root):
+#   python Minesweeper_py/RenderBenchmark.py --output render.json
+#   python Minesweeper_py/RenderBenchmark.py --baseline render.json
+
+DEFAULT_BOARDS = [(10, 10, 32), (30, 16, 24), (100, 100, 10)]   # (columns, rows, tile size)
+MENU_BAR_HEIGHT = 75
+FACE_SIZE = MENU_BAR_HEIGHT / 2
+SEED = 1234
+PACING_FPS = 60
+PACING_RESET_INTERVAL = 120     # Frames between face clicks in the pacing cases
+PACING_MODES = ('direct', 'serial', 'threaded')
+
+
+class CountingSurface(pygame.Surface):
+    # Off-screen surface that counts blits made onto it
+    def __init__(self, size):
+        super().__init__(size)
+        self.blit_count = 0
+
+    def blit(self, *args, **kwds):
+        self.blit_count += 1
+        return super().blit(*args, **kwds)
+
+
+class CallCounter:
+    # Counts calls to module-level pygame functions that allocate per frame
+    # (sprite scaling & font loading), by wrapping them for the duration of a pass
+    def __init__(self):
+        self.counts = {}
+        self.originals = {}
+
+    def wrap(self, module, name):
+        original = getattr(module, name)
+        self.originals[(module, name)] = original
+        self.counts[name] = 0
+
+        def counted(*args, **kwds):
+            self.counts[name] += 1
+            return original(*args, **kwds)
+        setattr(module, name, counted)
+
+    def reset(self):
+        for name in self.counts:
+            self.counts[name] = 0
+
+    def __enter__(self):
+        self.wrap(pygame.transform, "scale")
+        self.wrap(pygame.font, "SysFont")
+        return self
+
+    def __exit__(self, *exc_info):
+        for (module, name), original in self.originals.items():
+            setattr(module, name, original)
+        self.originals = {}
+
+
+def load_sprites(bundle, folder):
+    # e.g. 'grid3.png' -> sprites['grid3']
+    # Every sprite is decoded up front, so decoding never lands inside a measured frame
+    return dict(bundle.folder("Sprites/" + folder))
+
+
+class SettingsHolder:
+    # Stands in for GameInstance as the object_link of GameSettingButtons
+    def __init__(self):
+        self.settings = {'mine_count': 15, 'row_count': 10, 'column_count': 10, 'screen_size': 500}
+
+    def adjust_settings(self, setting_type, adjust_amount):
+        self.settings[setting_type] += adjust_amount
+
+
+class GameScreen:
+    # The widgets of run_game's screen (face, grid, two digit counters), built the same way
+    def __init__(self, columns, rows, tile_size, sprites):
+        self.mine_field = MineField(columns, rows)
+        self.mine_field.populate_mines(int(0.15 * columns * rows))
+
+        self.size = (columns * tile_size, rows * tile_size + MENU_BAR_HEIGHT)
+        self.tick_count = 0
+
+        self.face = MineSweeperFace(
+            pos_x=self.size[0] / 2 - FACE_SIZE / 2, pos_y=MENU_BAR_HEIGHT / 2 - FACE_SIZE / 2,
+            width=FACE_SIZE, height=FACE_SIZE,
+            leftclick=self.reset_mines, rightclick=self.commit_mines,
+            object_link=self.mine_field, sprite_list=sprites['Faces']
+        )
+        self.grid = MineSweeperGrid(
+            pos_x=0, pos_y=MENU_BAR_HEIGHT,
+            tile_size=tile_size, sprite_list=sprites['Grid'],
+            object_link=self.mine_field
+        )
+
+        digit_ratio = sprites['Digits']['blank'].get_width() / sprites['Digits']['blank'].get_height()
+        digit_width = digit_ratio * FACE_SIZE
+        self.mine_counter = DigitDisplay(
+            sprite_list=sprites['Digits'], digit_height=FACE_SIZE, digit_width=digit_width, num_digits=3,
+            pos_x=(39/40) * self.size[0] - 3 * digit_width, pos_y=MENU_BAR_HEIGHT / 2 - FACE_SIZE / 2
+        )
+        self.time_counter = DigitDisplay(
+            sprite_list=sprites['Digits'], digit_height=FACE_SIZE, digit_width=digit_width, num_digits=3,
+            pos_x=(1/40) * self.size[0], pos_y=MENU_BAR_HEIGHT / 2 - FACE_SIZE / 2
+        )
+
+    def reset_mines(self):
+        self.mine_field.reset()
+        self.grid.flag_redraw()
+        self.tick_count = 0
+
+    def commit_mines(self):
+        self.mine_field.commit_mines()
+
+    def frame(self, to_screen, mouse_pos, mouse_buttons):
+        # One iteration of run_game's loop body (minus event handling & display.flip)
+        self.face.store_inputs(mouse_pos, mouse_buttons)
+        self.grid.store_inputs(mouse_pos, mouse_buttons)
+
+        self.face.button_logic()
+        self.grid.button_logic()
+        if self.mine_field.game_state() != 0:
+            # Keep the script going past the end of a game
+            self.reset_mines()
+
+        self.face.draw(to_screen)
+        self.grid.draw(to_screen)
+        self.mine_counter.draw(to_screen, self.mine_field.num_mines_left)
+        self.time_counter.draw(to_screen, int(self.tick_count / 60))
+        self.tick_count += 1
+
+    def tile_center(self, tile_x, tile_y):
+        tile_size = self.grid.tile_size
+        return (
+            int(self.grid.pos[0] + (tile_x + 0.5) * tile_size),
+            int(self.grid.pos[1] + (tile_y + 0.5) * tile_size)
+        )
+
+    def face_center(self):
+        return (int(self.face.pos_x + FACE_SIZE / 2), int(self.face.pos_y + FACE_SIZE / 2))
+
+
+class SettingsScreen:
+    # The number panel of run_settings: held +/- buttons changing GameSettingButton text
+    def __init__(self):
+        self.holder = SettingsHolder()
+        self.size = (500, 200)
+        button_width = self.size[0] / 5
+        button_height = self.size[1] / 4
+        adjustment_timer = [(0, 10), (60, 5), (120, 1)]
+
+        self.buttons = []
+        for index, setting_type in enumerate(('mine_count', 'row_count', 'column_count', 'screen_size')):
+            self.buttons.append(Button(
+                pos_x=index * button_width, pos_y=0,
+                width=button_width, height=2 * button_height,
+                box_text="+ -",
+                leftclick=lambda setting_type=setting_type: self.holder.adjust_settings(setting_type, 1),
+                rightclick=lambda setting_type=setting_type: self.holder.adjust_settings(setting_type, -1),
+                repeat_timer=adjustment_timer
+            ))
+            self.buttons.append(GameSettingButton(
+                object_link=self.holder, setting_type=setting_type,
+                pos_x=index * button_width, pos_y=2 * button_height,
+                width=button_width, height=button_height, do_mouseover_color=False
+            ))
+
+    def frame(self, to_screen, mouse_pos, mouse_buttons):
+        for button in self.buttons:
+            button.store_inputs(mouse_pos, mouse_buttons)
+        for button in self.buttons:
+            button.button_logic()
+        for button in self.buttons:
+            button.draw(to_screen)
+
+
+### INPUT SCRIPTS ###
+# Each script returns a list of (mouse_pos, mouse_buttons) tuples, one per frame
+
+RELEASED = (False, False, False)
+LEFT = (True, False, False)
+RIGHT = (False, False, True)
+
+
+def hover_script(screen, num_frames, rng):
+    # Mouse sweeps across the grid row by row, no buttons pressed
+    columns, rows = screen.mine_field.size
+    return [
+        (screen.tile_center(frame % columns, (frame // columns) % rows), RELEASED)
+        for frame in range(num_frames)
+    ]
+
+
+def play_script(screen, num_frames, rng):
+    # Left-click digs and right-click flags on random tiles: press for 2 frames, release for 2
+    columns, rows = screen.mine_field.size
+    script = []
+    while len(script) < num_frames:
+        mouse_pos = screen.tile_center(rng.randrange(columns), rng.randrange(rows))
+        buttons = RIGHT if rng.random() < 0.2 else LEFT
+        script += [(mouse_pos, buttons)] * 2 + [(mouse_pos, RELEASED)] * 2
+    return script[:num_frames]
+
+
+def face_script(screen, num_frames, rng):
+    # Repeatedly press & release the face, resetting the board (a full grid redraw) each time
+    mouse_pos = screen.face_center()
+    script = []
+    while len(script) < num_frames:
+        script += [(mouse_pos, LEFT)] * 5 + [(mouse_pos, RELEASED)] * 5
+    return script[:num_frames]
+
+
+def pacing_script(screen, num_frames, rng):
+    # play_script, with a click on the face every PACING_RESET_INTERVAL frames
+    script = play_script(screen, num_frames, rng)
+    mouse_pos = screen.face_center()
+    for start in range(PACING_RESET_INTERVAL - 10, num_frames - 10, PACING_RESET_INTERVAL):
+        script[start:start + 10] = [(mouse_pos, LEFT)] * 5 + [(mouse_pos, RELEASED)] * 5
+    return script
+
+
+def settings_hold_script(screen, num_frames, rng):
+    # Hold left-click on the 'Mines' +/- button so its number changes on the repeat timer
+    button = screen.buttons[0]
+    mouse_pos = (int(button.pos_x + button.width / 2), int(button.pos_y + button.height / 2))
+    return [(mouse_pos, LEFT)] * num_frames
+
+
+### MEASUREMENT ###
+
+def measure_script(suite, case_name, build_screen, script_func, num_frames, trace_allocations):
+    if not suite.wants(case_name):
+        return
+
+    # Pass 1: frame times
+    screen = build_screen()
+    script = script_func(screen, num_frames, random.Random(SEED))
+    to_screen = pygame.Surface(screen.size)
+    frame_times = []
+    for mouse_pos, mouse_buttons in script:
+        start = time.perf_counter()
+        screen.frame(to_screen, mouse_pos, mouse_buttons)
+        frame_times.append(1000 * (time.perf_counter() - start))
+
+    # Pass 2: blits, scales & font loads per frame
+    random.seed(SEED)
+    screen = build_screen()
+    to_screen = CountingSurface(screen.size)
+    blits = []
+    scales = []
+    font_loads = []
+    with CallCounter() as counter:
+        for mouse_pos, mouse_buttons in script:
+            to_screen.blit_count = 0
+            counter.reset()
+            screen.frame(to_screen, mouse_pos, mouse_buttons)
+            blits.append(to_screen.blit_count)
+            scales.append(counter.counts['scale'])
+            font_loads.append(counter.counts['SysFont'])
+
+    frame_ms = summarize(frame_times)
+    result = {
+        'frames': len(script),
+        'frame_ms': frame_ms,
+        'ops_per_sec': 1000 / frame_ms['p50'] if frame_ms['p50'] > 0 else float('inf'),
+        'blits_per_frame': summarize(blits),
+        'scales_per_frame': summarize(scales),
+        'font_loads_per_frame': summarize(font_loads)
+    }
+
+    # Pass 3: Python heap allocated per frame
+    if trace_allocations:
+        random.seed(SEED)
+        screen = build_screen()
+        to_screen = pygame.Surface(screen.size)
+        allocated = []
+        tracemalloc.start()
+        for mouse_pos, mouse_buttons in script:
+            tracemalloc.reset_peak()
+            start_size = tracemalloc.get_traced_memory()[0]
+            screen.frame(to_screen, mouse_pos, mouse_buttons)
+            allocated.append(tracemalloc.get_traced_memory()[1] - start_size)
+        tracemalloc.stop()
+        result['alloc_bytes_per_frame'] = summarize(allocated)
+
+    suite.record(case_name, result)
+
+
+def measure_pacing(suite, case_name, build_screen, num_frames, mode):
+    if not suite.wants(case_name):
+        return
+
+    screen = build_screen()
+    script = pacing_script(screen, num_frames, random.Random(SEED))
+    display = pygame.display.set_mode(screen.size)
+    renderer = None
+    if mode != 'direct':
+        renderer = RenderStage(threaded=mode == 'threaded', window=num_frames)
+        renderer.set_target(display)
+
+    frame_times = []
+    present_times = []
+    next_frame = time.perf_counter()
+    for mouse_pos, mouse_buttons in script:
+        # Wait for the frame to be due, as GameInstance.wait_for_frame does
+        remaining = next_frame - time.perf_counter()
+        if remaining > 0:
+            time.sleep(remaining)
+        next_frame = max(next_frame + 1 / PACING_FPS, time.perf_counter())
+
+        start = time.perf_counter()
+        if renderer is None:
+            screen.frame(display, mouse_pos, mouse_buttons)
+            pygame.display.flip()
+            present_times.append(time.perf_counter())
+        else:
+            screen.frame(renderer.canvas, mouse_pos, mouse_buttons)
+            renderer.submit()
+        frame_times.append(1000 * (time.perf_counter() - start))
+
+    if renderer is not None:
+        renderer.stop()
+        present_times = list(renderer.present_times)
+
+    frame_ms = summarize(frame_times)
+    suite.record(case_name, {
+        'frames': len(script),
+        'frame_ms': frame_ms,
+        'ops_per_sec': 1000 / frame_ms['p50'] if frame_ms['p50'] > 0 else float('inf'),
+        'presents': len(present_times),
+        'present_interval_ms': summarize([
+            1000 * (later - earlier) for earlier, later in zip(present_times, present_times[1:])
+        ])
+    })
+
+
+def run_suite(suite, boards, num_frames, trace_allocations):
+    pygame.font.init()
+    bundle = AssetBundle()
+    sprites = {folder: load_sprites(bundle, folder) for folder in ('Grid', 'Faces', 'Digits')}
+
+    for columns, rows, tile_size in boards:
+        label = "{}x{}".format(columns, rows)
+
+        def build_screen():
+            random.seed(SEED)
+            return GameScreen(columns, rows, tile_size, sprites)
+
+        for script_name, script_func in (('hover', hover_script), ('play', play_script), ('face', face_script)):
+            measure_script(
+                suite, "{}/{}".format(script_name, label),
+                build_screen, script_func, num_frames, trace_allocations
+            )
+
+    measure_script(
+        suite, "settings_hold", SettingsScreen, settings_hold_script, num_frames, trace_allocations
+    )
+
+    pygame.display.init()
+    for columns, rows, tile_size in boards:
+        def build_screen():
+            random.seed(SEED)
+            return GameScreen(columns, rows, tile_size, sprites)
+
+        for mode in PACING_MODES:
+            measure_pacing(suite, "pacing/{}/{}x{}".format(mode, columns, rows), build_screen, num_frames, mode)
+
+
+def __main__():
+    parser = argparse.ArgumentParser(description="Benchmark Interface rendering off-screen")
+    parser.add_argument("--boards", type=parse_board, nargs="+", default=DEFAULT_BOARDS,
+                        help="Boards as COLUMNSxROWS:TILE_SIZE (default: 10x10:32 30x16:24 100x100:10)")
+    parser.add_argument("--frames", type=int, default=300, help="Frames per input script (default 300)")
+    add_common_arguments(parser, timed=False)
+    args = parser.parse_args()
+
+    suite = BenchmarkSuite("render", case_filter=args.cases)
+    run_suite(suite, args.boards, args.frames, trace_allocations=not args.no_memory)
+    return finish(suite, args)
+
+
+if __name__ == "__main__":
+    sys.exit(__main__())
@@ -0,0 +1,222 @@
+import threading
+import time
+from collections import deque
+
+import pygame
+
+from Benchmark import summarize
+
+# Render stage: composes frames onto the display and shows them, optionally on a thread of its own
+#
+# The game loop (GameInstance.run) handles input, runs the engine and has the scene draw, as before,
+# but the scene draws into a ChangeQueue instead of onto the display: every blit & fill is recorded
+# along with the rectangle of screen it changes. submit() hands the recorded frame to the render stage,
+# which does the actual blits and then shows just the changed rectangles (display.update, or display.flip
+# when most of the screen changed).
+#
+# By default (threaded=False) that happens inside submit(), on the game loop's own thread: SDL expects display
+# calls on the main thread, and some platforms (macOS) require it.
+# With threaded=True (main.py --render-thread) a render thread does it instead, while the game loop is already
+# working on the next frame, so a big flood fill or commit can't delay showing the frame before it,
+# and drawing a whole board doesn't delay handling the next click.
+#
+# The queue is double-buffered: the loop records into one ChangeQueue while the render stage draws another.
+# submit() swaps the finished frame into a third, pending queue, which the render stage takes the moment it's free.
+# If the render stage falls further behind, later frames are added onto the pending one, so it catches up
+# by drawing them all at once: the loop never waits for the render stage.
+#
+# Scenes only ever blit & fill onto the screen they're given, so a ChangeQueue is all they need.
+# What gets recorded is a sprite, a scaled sprite or a piece of text, none of which is ever drawn on once made
+# (see Interface.scale_sprite), so the render stage never reads anything the game loop is changing.
+# The display is only ever created or resized by the game loop, once the render stage has finished everything
+# it was given (see set_target).
+
+
+class ChangeQueue:
+    # Stands in for the display surface while a scene draws: draw calls are recorded rather than done
+    # Holds the calls of one frame (or of several, when the render stage falls behind)
+    # Past MAX_DIRTY_RECTS changed rectangles, the whole display is shown instead & no more rectangles are kept
+    # (a whole-board redraw records thousands of tile blits, so this keeps recording them cheap)
+    # Consecutive blits are kept together as one list of Surface.blits arguments, so the render stage draws
+    # a whole board of tiles with a single call (little Python for it to run while the game loop is busy)
+    __slots__ = ('size', 'calls', 'blits', 'dirty', 'full', 'handled')
+    MAX_DIRTY_RECTS = 100
+
+    def __init__(self, size=(0, 0)):
+        self.size = size            # Size of the display the calls are for
+        self.calls = []             # (unbound pygame.Surface method, arguments) in the order they were made
+        self.blits = None           # Blit sequence of the run of blits being recorded (last in calls), if any
+        self.dirty = []             # Rectangles of the display changed by the calls (clipped to it)
+        self.full = False           # The whole display is to be shown (dirty is then incomplete)
+        self.handled = []           # (kind, arrival) of input events handled in these frames (see LatencyRecorder)
+
+    def get_size(self):
+        return self.size
+
+    def get_rect(self):
+        return pygame.Rect((0, 0), self.size)
+
+    def blit(self, source, dest, area=None, special_flags=0):
+        # Unlike Surface.blit, returns nothing (nothing in the game uses the rectangle)
+        if self.blits is None:
+            self.blits = []
+            self.calls.append((pygame.Surface.blits, (self.blits, False)))
+        self.blits.append((source, dest, area, special_flags))
+        if self.full:
+            return
+        if area is None:
+            width, height = source.get_size()
+        else:
+            width, height = pygame.Rect(area).clip(source.get_rect()).size
+        self.add_dirty(pygame.Rect(dest[0], dest[1], width, height))
+
+    def fill(self, color, rect=None, special_flags=0):
+        self.blits = None
+        self.calls.append((pygame.Surface.fill, (color, rect, special_flags)))
+        if rect is None:
+            self.full = True
+        elif not self.full:
+            self.add_dirty(pygame.Rect(rect))
+
+    def add_dirty(self, rect):
+        if len(self.dirty) < self.MAX_DIRTY_RECTS:
+            self.dirty.append(rect.clip(self.get_rect()))
+        else:
+            self.full = True
+
+    def extend(self, other):
+        # Adds another queue's calls after these ones
+        self.calls.extend(other.calls)
+        self.blits = None
+        self.full = self.full or other.full
+        if not self.full:
+            for rect in other.dirty:
+                self.add_dirty(rect)
+        self.handled.extend(other.handled)
+
+    def clear(self):
+        self.calls.clear()
+        self.blits = None
+        self.dirty.clear()
+        self.full = False
+        self.handled.clear()
+
+
+class RenderStage:
+    def __init__(self, threaded=False, latency=None, window=600):
+        self.threaded = threaded
+        self.latency = latency          # Profiler.LatencyRecorder told when handled input reaches the screen (or None)
+        self.screen = None              # Display surface frames are drawn onto
+
+        self.canvas = ChangeQueue()     # Back buffer: the frame the game loop is drawing
+        self.pending = ChangeQueue()    # Frame(s) submitted & waiting for the render stage
+        self.drawing = ChangeQueue()    # Front buffer: the frame the render stage is drawing
+        self.pending_ready = False      # pending holds a frame
+        self.busy = False               # The render stage is drawing
+
+        self.condition = threading.Condition()
+        self.thread = None              # Started with the first frame submitted
+        self.stopping = False
+        self.error = None               # Exception raised on the render thread, raised again by the game loop
+
+        self.present_times = deque(maxlen=window)   # When each of the last `window` frames was shown (perf_counter)
+
+    def set_target(self, screen):
+        # Draw onto a new display surface
+        # Anything recorded for the old one is dropped (the scene redraws everything on a new display)
+        self.wait_idle()
+        self.screen = screen
+        self.canvas.clear()
+        self.canvas.size = self.pending.size = self.drawing.size = screen.get_size()
+
+    def submit(self, handled=None):
+        # Hands the frame recorded in the canvas over to be drawn & shown
+        # handled: (kind, arrival) of the input events handled this frame, for latency measurement
+        self.raise_error()
+        if handled:
+            self.canvas.handled.extend(handled)
+        if not self.threaded:
+            self.canvas, self.drawing = self.drawing, self.canvas
+            self.draw_frame()
+            return
+
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name="render", daemon=True)
+            self.thread.start()
+        with self.condition:
+            if self.pending_ready:
+                # The render stage hasn't taken the last frame yet: this one goes along with it
+                self.pending.extend(self.canvas)
+                self.canvas.clear()
+            else:
+                self.canvas, self.pending = self.pending, self.canvas
+                self.pending_ready = True
+            self.condition.notify_all()
+
+    def wait_idle(self):
+        # Waits for the render stage to draw every frame submitted (anything recorded since isn't drawn)
+        if self.thread is not None:
+            with self.condition:
+                while self.pending_ready or self.busy:
+                    self.condition.wait()
+        self.raise_error()
+
+    def stop(self):
+        self.wait_idle()
+        if self.thread is not None:
+            with self.condition:
+                self.stopping = True
+                self.condition.notify_all()
+            self.thread.join()
+            self.thread = None
+            self.stopping = False
+
+    def raise_error(self):
+        if self.error is not None:
+            error = self.error
+            self.error = None
+            raise error
+
+    def run(self):
+        # Render thread: draws each frame as it's submitted
+        while True:
+            with self.condition:
+                while not self.pending_ready and not self.stopping:
+                    self.condition.wait()
+                if not self.pending_ready:
+                    return
+                self.pending, self.drawing = self.drawing, self.pending
+                self.pending_ready = False
+                self.busy = True
+            try:
+                self.draw_frame()
+            except Exception as error:
+                self.error = error
+                self.drawing.clear()
+            with self.condition:
+                self.busy = False
+                self.condition.notify_all()
+
+    def draw_frame(self):
+        # Does the front buffer's draw calls on the display, shows the changed part of it & empties the buffer
+        frame = self.drawing
+        screen = self.screen
+        for method, args in frame.calls:
+            method(screen, *args)
+
+        if frame.full:
+            pygame.display.flip()
+        elif len(frame.dirty) > 0:
+            pygame.display.update(frame.dirty)
+        self.present_times.append(time.perf_counter())
+
+        if self.latency is not None and len(frame.handled) > 0:
+            self.latency.frame_shown(frame.handled)
+        frame.clear()
+
+    def pacing(self):
+        # Percentile summary (ms) of the time between frames being shown, or None before two frames have been
+        times = list(self.present_times)
+        if len(times) < 2:
+            return None
+        return summarize([1000 * (later - earlier) for earlier, later in zip(times, times[1:])])
@@ -0,0 +1,1044 @@
+from Interface import (
+    Button, DigitDisplay, FullScreenButton, GameSettingButton, HexMineSweeperGrid, MineSweeperFace, MineSweeperGrid,
+    scale_sprite
+)
+from GameVariables import create_mine_field
+from Client import apply_cells
+from Server import (
+    ERROR, ERROR_BAD_BOARD, ERROR_BAD_OPCODE, ERROR_BAD_SEED, ERROR_FULL, ERROR_RACE_FULL, ERROR_UNKNOWN_GAME,
+    JOINED, PROGRESS, RESULT
+)
+from BoardLibrary import DIFFICULTY_NAMES
+from Race import parse_seed_string
+from Session import TournamentSession
+import math
+import time
+import pygame
+
+
+class Scene:
+    # One screen of the game (start menu, settings, game, ...)
+    # GameInstance keeps a single display alive and runs the current scene once per frame:
+    #   handle_event(ev)        for every pygame event not handled globally
+    #   mouse_event(pos, buttons)   for every mouse button press & release, as soon as it's taken off the queue
+    #   store_inputs(pos, buttons)
+    #   button_logic()
+    #   draw(to_screen)         to_screen records the draw calls for the render stage, so only blit & fill it
+    # Scenes switch with game.change_scene(); the switch happens within the same frame,
+    # and the display is only re-created when the new scene needs a different size.
+    caption = "Minesweeper"
+    background_color = (192, 192, 192)
+
+    def __init__(self, game):
+        self.game = game                # GameInstance running this scene
+        self.buttons = []               # Interactables receiving mouse input & drawn every frame
+        self.do_redraw = True           # Flag indicating the entire scene should be redrawn
+        self.overlay_pos = (0, 0)       # Where the profiler overlay goes on this scene
+
+    def get_display_mode(self):
+        # ((width, height), fullscreen) this scene needs
+        return (300, 300), False
+
+    def enter(self, display_changed):
+        # Called when the scene becomes current
+        self.flag_redraw()
+
+    def exit(self):
+        # Called when another scene replaces this one
+        pass
+
+    def flag_redraw(self):
+        self.do_redraw = True
+
+    def handle_event(self, ev):
+        pass
+
+    def mouse_event(self, mouse_pos, mouse_buttons):
+        # A mouse button went down or up: the buttons see it straight away, at the position it happened,
+        # so a press & release between two frames is never merged into no click at all
+        self.store_inputs(mouse_pos, mouse_buttons)
+        self.click_logic()
+
+    def click_logic(self):
+        # The part of button_logic that reacts to the mouse (scenes with once-a-frame work override this)
+        self.button_logic()
+
+    def store_inputs(self, mouse_pos=(-1, -1), mouse_buttons=(False, False, False)):
+        for button in self.buttons:
+            button.store_inputs(mouse_pos, mouse_buttons)
+
+    def button_logic(self):
+        for button in self.buttons:
+            button.button_logic()
+
+    def draw(self, to_screen):
+        force = self.do_redraw
+        if force:
+            to_screen.fill(self.background_color)
+            self.do_redraw = False
+        for button in self.buttons:
+            button.draw(to_screen, force=force)
+
+
+class StartMenuScene(Scene):
+    caption = "Minesweeper - Menu"
+
+    def __init__(self, game):
+        super().__init__(game)
+        screen_width, screen_height = self.get_display_mode()[0]
+
+        # buttons on main menu
+        self.buttons = [
+            # START BUTTON: Starts game
+            Button(
+                pos_x=0,
+                pos_y=0,
+                height=screen_height/4,
+                width=screen_width/2,
+                colormap=game.get_colormap(0.2),
+                box_text="START",
+                leftclick=lambda: game.change_scene(GameScene(game))
+            ),
+            # DAILY BUTTON: Today's board for the current settings (the same for everyone)
+            Button(
+                pos_x=screen_width/2,
+                pos_y=0,
+                height=screen_height/4,
+                width=screen_width/4,
+                colormap=game.get_colormap(0.2),
+                box_text="DAILY",
+                leftclick=lambda: start_library_game(game, daily=True)
+            ),
+            # HARD BUTTON: A hard expert-sized board from the board library
+            Button(
+                pos_x=3 * screen_width/4,
+                pos_y=0,
+                height=screen_height/4,
+                width=screen_width/4,
+                colormap=game.get_colormap(0.2),
+                box_text="HARD 30x16",
+                leftclick=lambda: start_library_game(game, (30, 16, 99), DIFFICULTY_NAMES.index('hard'))
+            ),
+            # CONFIG BUTTON: Opens config menu
+            Button(
+                pos_x=0, pos_y=screen_height/4,
+                height=screen_height/4,
+                width=screen_width,
+                colormap=game.get_colormap(0.4),
+                box_text="SETTINGS",
+                leftclick=lambda: game.change_scene(SettingsScene(game))
+            ),
+            # STATS BUTTON: Opens statistics for current settings
+            Button(
+                pos_x=0, pos_y=2 * screen_height/4,
+                height=screen_height/4,
+                width=screen_width,
+                colormap=game.get_colormap(0.6),
+                box_text="STATS",
+                leftclick=lambda: game.change_scene(StatsScene(game))
+            ),
+            # EXIT BUTTON: Exits Main Menu
+            Button(
+                pos_x=0,
+                pos_y=3 * screen_height/4,
+                height=screen_height/4,
+                width=screen_width,
+                colormap=game.get_colormap(0.8),
+                box_text='EXIT',
+                leftclick=lambda: game.change_scene(None)
+            )
+        ]
+
+    def handle_event(self, ev):
+        if ev.type == pygame.KEYDOWN and ev.key == pygame.K_ESCAPE:
+            self.game.change_scene(None)
+
+
+class SettingsScene(Scene):
+    caption = "Game Settings"
+
+    def __init__(self, game):
+        super().__init__(game)
+        screen_width, screen_height = self.get_display_mode()[0]
+
+        button_width = screen_width/5
+        button_height = screen_height/4
+
+        col_color = {
+            'MINES': game.get_colormap(0),
+            'NROW': game.get_colormap(0.2),
+            'NCOL': game.get_colormap(0.4),
+            'SCREEN': game.get_colormap(0.6)
+        }
+
+        # y-coordinates for element positioning
+        row_y = {
+            'LABEL': 0,
+            'ADJUST': button_height/2,
+            'NUM': 2 * screen_height/4,
+            'CONFIRM': 3 * screen_height/4
+        }
+        # x-coordinates for element positioning
+        column_x = {
+            'MINES': 0,
+            'NROW': screen_width/5,
+            'NCOL': 2 * screen_width/5,
+            'SCREEN': 3 * screen_width/5,
+            'FULLSCREEN': 4 * screen_width/5
+        }
+        # standard time-sheet for button hold-down (on adjustment buttons)
+        adjustment_timer = [
+            (0, 10),
+            (60, 5),
+            (120, 1)
+        ]
+
+        self.buttons = [
+            ### LABEL ROW ###
+            Button(
+                pos_x=column_x['MINES'], pos_y=row_y['LABEL'],
+                width=button_width, height=(1/2) * button_height,
+                box_text='Mines', colormap=col_color['MINES'],
+                do_mouseover_color=False
+            ),
+            Button(
+                pos_x=column_x['NROW'], pos_y=row_y['LABEL'],
+                width=button_width, height=(1/2) * button_height,
+                box_text='Rows', colormap=col_color['NROW'],
+                do_mouseover_color=False
+            ),
+            Button(
+                pos_x=column_x['NCOL'], pos_y=row_y['LABEL'],
+                width=button_width, height=(1/2) * button_height,
+                box_text='Columns', colormap=col_color['NCOL'],
+                do_mouseover_color=False
+            ),
+            Button(
+                pos_x=column_x['SCREEN'], pos_y=row_y['LABEL'],
+                width=button_width, height=(1/2) * button_height,
+                box_text='Screen Size', colormap=col_color['SCREEN'],
+                do_mouseover_color=False
+            ),
+            ### ADJUSTMENT ROW ###
+            Button(
+                pos_x=column_x['MINES'], pos_y=row_y['ADJUST'],
+                width=button_width, height=(3/2) * button_height,
+                box_text="+ -", colormap=col_color['MINES'],
+                leftclick=lambda: game.adjust_settings('mine_count', 1),
+                rightclick=lambda: game.adjust_settings('mine_count', -1),
+                repeat_timer=adjustment_timer
+            ),
+            Button(
+                pos_x=column_x['NROW'], pos_y=row_y['ADJUST'],
+                width=button_width, height=(3/2) * button_height,
+                box_text="+ -", colormap=col_color['NROW'],
+                leftclick=lambda: game.adjust_settings('row_count', 1),
+                rightclick=lambda: game.adjust_settings('row_count', -1),
+                repeat_timer=adjustment_timer
+            ),
+            Button(
+                pos_x=column_x['NCOL'], pos_y=row_y['ADJUST'],
+                width=button_width, height=(3/2) * button_height,
+                box_text="+ -", colormap=col_color['NCOL'],
+                leftclick=lambda: game.adjust_settings('column_count', 1),
+                rightclick=lambda: game.adjust_settings('column_count', -1),
+                repeat_timer=adjustment_timer
+            ),
+            Button(
+                pos_x=column_x['SCREEN'], pos_y=row_y['ADJUST'],
+                width=button_width, height=(3/2) * button_height,
+                box_text="+ -", colormap=col_color['SCREEN'],
+                leftclick=lambda: game.adjust_settings('screen_size', 10),
+                rightclick=lambda: game.adjust_settings('screen_size', -5),
+                repeat_timer=adjustment_timer
+            ),
+            FullScreenButton(
+                object_link=game,
+                pos_x=column_x['FULLSCREEN'], pos_y=0,
+                width=button_width, height=(3/2) * button_height,
+                leftclick=lambda: game.toggle_fullscreen(),
+                repeat_timer=adjustment_timer
+            ),
+            # TOPOLOGY BUTTON: Cycles through the board topologies
+            Button(
+                pos_x=column_x['FULLSCREEN'], pos_y=(3/2) * button_height,
+                width=button_width, height=(3/2) * button_height,
+                colormap=game.get_colormap(0.8),
+                textfunc=lambda: game.settings['topology'].upper(),
+                leftclick=lambda: game.cycle_topology()
+            ),
+            ### NUMBER DISPLAY ROW ###
+            GameSettingButton(
+                object_link=game, setting_type='mine_count',
+                pos_x=column_x['MINES'], pos_y=row_y['NUM'],
+                colormap=col_color['MINES'], do_mouseover_color=False,
+                width=button_width, height=button_height
+            ),
+            GameSettingButton(
+                object_link=game, setting_type='row_count',
+                pos_x=column_x['NROW'], pos_y=row_y['NUM'],
+                colormap=col_color['NROW'], do_mouseover_color=False,
+                width=button_width, height=button_height
+            ),
+            GameSettingButton(
+                object_link=game, setting_type='column_count',
+                pos_x=column_x['NCOL'], pos_y=row_y['NUM'],
+                colormap=col_color['NCOL'], do_mouseover_color=False,
+                width=button_width, height=button_height
+            ),
+            GameSettingButton(
+                object_link=game, setting_type='screen_size',
+                pos_x=column_x['SCREEN'], pos_y=row_y['NUM'],
+                colormap=col_color['SCREEN'], do_mouseover_color=False,
+                width=button_width, height=button_height
+            ),
+            ### CONFIRM BUTTON ###
+            Button(
+                pos_y=row_y['CONFIRM'], pos_x=0,
+                width=screen_width, height=button_height,
+                colormap=game.get_colormap(0.8),
+                box_text='CONFIRM', leftclick=lambda: game.change_scene(StartMenuScene(game))
+            )
+        ]
+
+    def get_display_mode(self):
+        return (500, 200), False
+
+
+class StatsScene(Scene):
+    caption = "Statistics"
+
+    def __init__(self, game):
+        super().__init__(game)
+        screen_width, screen_height = self.get_display_mode()[0]
+
+        # All figures come from the precomputed aggregates, so this is a
+        # handful of indexed lookups regardless of how many games are stored
+        summary = game.stats_store.get_summary(
+            game.settings['row_count'], game.settings['column_count'], game.settings['mine_count']
+        )
+
+        def format_time(seconds):
+            if seconds is None:
+                return "-"
+            return "{:.1f}s".format(seconds)
+
+        def format_rate(bbbv_rate):
+            if bbbv_rate is None:
+                return "-"
+            return "{:.2f}".format(bbbv_rate)
+
+        if summary['win_rate'] is None:
+            win_rate_text = "-"
+        else:
+            win_rate_text = "{:.1f}%".format(100 * summary['win_rate'])
+
+        stat_rows = [
+            ("Games", str(summary['games'])),
+            ("Win Rate", win_rate_text),
+            ("Best Time", format_time(summary['best_time'])),
+            ("Median Time", format_time(summary['percentiles'][50])),
+            ("90th Pct Time", format_time(summary['percentiles'][90])),
+            ("Best 3BV/s", format_rate(summary['best_bbbv_rate'])),
+            ("Average 3BV/s", format_rate(summary['average_bbbv_rate']))
+        ]
+
+        row_height = screen_height / (len(stat_rows) + 2)
+
+        self.buttons = [
+            # TITLE: Configuration the stats apply to
+            Button(
+                pos_x=0, pos_y=0,
+                width=screen_width, height=row_height,
+                colormap=game.get_colormap(0.2), do_mouseover_color=False,
+                box_text="{} x {}, {} mines".format(
+                    game.settings['row_count'], game.settings['column_count'], game.settings['mine_count']
+                )
+            )
+        ]
+        for row_index, (label, value) in enumerate(stat_rows):
+            self.buttons.append(Button(
+                pos_x=0, pos_y=(row_index + 1) * row_height,
+                width=screen_width/2, height=row_height,
+                colormap=game.get_colormap(0.4), do_mouseover_color=False,
+                box_text=label
+            ))
+            self.buttons.append(Button(
+                pos_x=screen_width/2, pos_y=(row_index + 1) * row_height,
+                width=screen_width/2, height=row_height,
+                colormap=game.get_colormap(0.6), do_mouseover_color=False,
+                box_text=value
+            ))
+        # BACK BUTTON: Returns to main menu
+        self.buttons.append(Button(
+            pos_x=0, pos_y=(len(stat_rows) + 1) * row_height,
+            width=screen_width, height=row_height,
+            colormap=game.get_colormap(0.8),
+            box_text="BACK", leftclick=lambda: game.change_scene(StartMenuScene(game))
+        ))
+
+    def handle_event(self, ev):
+        if ev.type == pygame.KEYDOWN and ev.key == pygame.K_ESCAPE:
+            self.game.change_scene(StartMenuScene(self.game))
+
+
+def start_library_game(game, config=None, bucket=1, daily=False):
+    # Starts a game on a board from the board library: today's board, or a random one from a difficulty bucket
+    # config: (columns, rows, mines), or None for the current settings
+    if config is None:
+        config = (game.settings['column_count'], game.settings['row_count'], game.settings['mine_count'])
+    if daily:
+        board = game.board_library.daily_board(*config, bucket=bucket)
+    else:
+        board = game.board_library.random_board(*config, bucket)
+    if board is None:
+        print("No {} {}x{} boards with {} mines in the board library: generate some with "
+              "python Minesweeper_py/BoardLibrary.py --board {}x{}:{}".format(
+                DIFFICULTY_NAMES[bucket], config[0], config[1], config[2], config[0], config[1], config[2]))
+        return
+
+    game.settings['column_count'], game.settings['row_count'], game.settings['mine_count'] = config
+    game.change_scene(GameScene(game, board))
+
+
+class GameScene(Scene):
+    # The minesweeper board: face & counters in the menu bar, grid underneath
+    # board: a BoardLibrary.LibraryBoard to play, instead of dealing a new one (only the first game uses it)
+    # Flood fills are time-sliced: each frame reveals a few more waves of an opening (a ripple),
+    # and never spends more than REVEAL_BUDGET on it, so input keeps being handled on huge boards
+    REVEAL_BUDGET = 0.005           # Seconds of flood fill per frame
+    REVEAL_BOARD_PER_WAVE = 20      # One more wave per frame for every this many tiles along the board
+
+    def __init__(self, game, board=None):
+        super().__init__(game)
+        self.display_size, self.fullscreen = game.compute_display_settings()
+        display_settings = game.display_settings
+        self.overlay_pos = (0, display_settings['menu_bar_height'])
+
+        if board is None:
+            # Create minefield from game settings
+            # (the bitboard backend only plays square boards, other topologies always use FieldSquares)
+            topology = game.settings['topology']
+            self.mine_field = create_mine_field(
+                game.settings['column_count'], game.settings['row_count'],
+                backend=game.engine if topology == 'square' else 'objects', topology=topology
+            )
+
+            # Add mines to minefield from game settings
+            self.mine_field.populate_mines(game.settings['mine_count'])
+        else:
+            self.mine_field = board.create_field(game.engine)
+        self.mine_field.profiler = game.profiler
+        self.mine_field.time_sliced = True
+        self.reveal_waves = max(1, max(self.mine_field.size) // self.REVEAL_BOARD_PER_WAVE)    # Waves per frame
+
+        # The engine tells us when the game is won or lost (no need to poll it every frame)
+        self.mine_field.add_listener(self.state_changed)
+
+        self.tick_count = 0         # Stores ticks since game start
+        self.game_start = time.perf_counter()
+
+        self.face = MineSweeperFace(
+            # Center in menu bar
+            pos_x=(display_settings['screen_width'] / 2) - (display_settings['face_size'] / 2),
+            pos_y=(display_settings['menu_bar_height'] / 2) - (display_settings['face_size'] / 2),
+            width=display_settings['face_size'], height=display_settings['face_size'],
+            leftclick=self.reset_mines, rightclick=self.commit_mines,
+            object_link=self.mine_field,
+            sprite_list=game.face_sprites
+        )
+        self.buttons = [self.face]
+
+        grid_type = HexMineSweeperGrid if self.mine_field.topology.shape == 'hex' else MineSweeperGrid
+        self.grid = grid_type(
+            pos_x=(display_settings['screen_width']/2) - (self.mine_field.size[0] * display_settings['box_size']/2),
+            pos_y=display_settings['menu_bar_height'],
+            tile_size=display_settings['box_size'],
+            sprite_list=game.grid_sprites,
+            object_link=self.mine_field
+        )
+
+        # Use the blank digit sprite as a template for digit sprite sizes
+        digit_size_ratio = game.digit_sprites['blank'].get_width()/game.digit_sprites['blank'].get_height()
+        d_height = display_settings['face_size']
+        d_width = digit_size_ratio * d_height
+
+        # Create digit-style counters
+        self.mine_counter = DigitDisplay(
+                sprite_list=game.digit_sprites,
+                digit_height=d_height, digit_width=d_width,
+                num_digits=3,
+                pos_x=(39/40) * display_settings['screen_width'] - (3 * d_width),
+                pos_y=(1/2) * display_settings['menu_bar_height'] - (1/2) * d_height
+            )
+        self.time_counter = DigitDisplay(
+                sprite_list=game.digit_sprites,
+                digit_height=d_height, digit_width=d_width,
+                num_digits=3,
+                pos_x=(1/40) * display_settings['screen_width'],
+                pos_y=(1/2) * display_settings['menu_bar_height'] - (1/2) * d_height
+        )
+
+    def get_display_mode(self):
+        return self.display_size, self.fullscreen
+
+    def flag_redraw(self):
+        super().flag_redraw()
+        self.grid.flag_redraw()
+        self.face.display_image = None
+        self.mine_counter.flag_redraw()
+        self.time_counter.flag_redraw()
+
+    def reset_mines(self):
+        # Resets mine field mines AND restarts game
+        self.mine_field.reset(self.game.settings['mine_count'])
+        self.grid.flag_redraw()
+        self.tick_count = 0
+        self.game_start = time.perf_counter()
+        if self.game.current_scene is not self:
+            # Restarting from the game over screen
+            self.game.change_scene(self)
+
+    def commit_mines(self):
+        self.mine_field.commit_mines()
+
+    def leave(self):
+        # Exit to main menu, writing out this session's games
+        self.game.stats_store.flush()
+        self.game.change_scene(StartMenuScene(self.game))
+
+    def state_changed(self, old_state, new_state):
+        # MineField listener: a game that has just been won or lost is finished
+        if new_state != 0 and self.game.current_scene is self and not self.game.scene_change:
+            self.finish_game()
+
+    def finish_game(self):
+        # Record the finished game and move to the game over screen
+        # Only classic square boards are recorded: other topologies' times aren't comparable
+        if self.mine_field.topology.name == 'square':
+            self.record_game()
+        self.game.change_scene(GameOverScene(self.game, self))
+
+    def record_game(self):
+        self.game.stats_store.record_game(
+            rows=self.mine_field.size[1], columns=self.mine_field.size[0],
+            mines=len(self.mine_field.mine_squares) + self.mine_field.num_committed_mines,
+            duration=time.perf_counter() - self.game_start,
+            clicks=self.mine_field.num_clicks, commits=self.mine_field.num_commits,
+            outcome=self.mine_field.game_state(),
+            bbbv=self.mine_field.get_metrics()['3bv']
+        )
+
+    def handle_event(self, ev):
+        if ev.type == pygame.KEYDOWN:
+            if ev.key == pygame.K_ESCAPE:
+                self.leave()
+            elif ev.key == pygame.K_r:
+                self.reset_mines()
+
+    def store_inputs(self, mouse_pos=(-1, -1), mouse_buttons=(False, False, False)):
+        super().store_inputs(mouse_pos, mouse_buttons)
+        self.grid.store_inputs(mouse_pos, mouse_buttons)
+
+    def click_logic(self):
+        self.face.button_logic()
+        self.grid.button_logic()
+
+    def button_logic(self):
+        self.face.button_logic()
+        self.game.profiler.mark('button_logic')
+
+        # Grid clicks are where the engine does its work (dig, spread_blanks, toggle_flag)
+        # then this frame's share of any flood fill
+        self.grid.button_logic()
+        self.mine_field.advance_spread(self.REVEAL_BUDGET, self.reveal_waves)
+        self.game.profiler.mark('engine')
+
+        self.tick_count += 1
+
+    def draw(self, to_screen):
+        if self.do_redraw:
+            # Fill background with grey and draw menu bar texture at top
+            to_screen.fill(self.background_color)
+            to_screen.blit(scale_sprite(
+                self.game.menu_elements['MENU_BAR'],
+                (self.game.display_settings['screen_width'], self.game.display_settings['menu_bar_height'])),
+                (0, 0)
+            )
+            self.do_redraw = False
+
+        self.face.draw(to_screen)
+        self.grid.draw(to_screen)
+
+        # Since there are only two digit-counters, I choose to
+        # manually update them each frame (as opposed to looping through a list of them)
+        self.mine_counter.draw(to_screen, self.mine_field.num_mines_left)
+        self.time_counter.draw(to_screen, int(self.tick_count/60))
+
+
+class GameOverScene(Scene):
+    # Finished board: the grid & timer are frozen, only the face (and keyboard) respond
+    def __init__(self, game, game_scene):
+        super().__init__(game)
+        self.game_scene = game_scene
+        self.buttons = [game_scene.face]
+        self.overlay_pos = game_scene.overlay_pos
+        self.do_redraw = False
+
+    def get_display_mode(self):
+        return self.game_scene.get_display_mode()
+
+    def enter(self, display_changed):
+        # The board is already on screen: only redraw if the display was re-created
+        if display_changed:
+            self.flag_redraw()
+
+    def flag_redraw(self):
+        self.game_scene.flag_redraw()
+
+    def handle_event(self, ev):
+        if ev.type == pygame.KEYDOWN:
+            if ev.key == pygame.K_ESCAPE:
+                self.game_scene.leave()
+            elif ev.key == pygame.K_r:
+                self.game_scene.reset_mines()
+
+    def draw(self, to_screen):
+        self.game_scene.draw(to_screen)
+
+
+class RaceScene(Scene):
+    # Race on a shared seed (see Race.py): your board on the left, the other players' boards beside it,
+    # mirrored from the progress diffs the server sends. Every board only redraws the squares that change,
+    # so watching several large boards costs no more per frame than the moves being made on them.
+    caption = "Minesweeper Race"
+    BOARD_GAP = 10          # Pixels between boards
+    STATUS_HEIGHT = 25      # Leaderboard strip along the bottom
+    ERROR_TEXT = {          # Status shown for each ERROR reply from the server (see Server.py)
+        ERROR_UNKNOWN_GAME: "The race server lost track of this race",
+        ERROR_BAD_OPCODE: "The race server didn't understand this client",
+        ERROR_BAD_BOARD: "Board too large for this server",
+        ERROR_FULL: "The race server is full",
+        ERROR_BAD_SEED: "Invalid race seed",
+        ERROR_RACE_FULL: "This race is full"
+    }
+
+    def __init__(self, game, connection, num_boards=2):
+        super().__init__(game)
+        self.connection = connection    # Client.RaceConnection
+        self.player_index = None        # Our player number (once the server has replied)
+        self.num_boards = max(1, num_boards)
+        columns, rows = connection.config[0], connection.config[1]
+
+        # Size boards as the game screen would, shrunk if needed so every board fits across the screen
+        menu_bar_height = game.display_settings['menu_bar_height']
+        face_size = game.display_settings['face_size']
+        box_size = 0.95 * min(
+            game.settings['screen_size'] / rows,
+            game.settings['screen_size'] / columns
+        )
+        available_width = 0.95 * game.screen_resolution[0] - (self.num_boards - 1) * self.BOARD_GAP
+        box_size = min(box_size, available_width / (self.num_boards * columns))
+        self.board_width = box_size * columns
+        self.display_size = (
+            self.num_boards * self.board_width + (self.num_boards - 1) * self.BOARD_GAP,
+            menu_bar_height + box_size * rows + self.STATUS_HEIGHT
+        )
+        self.menu_bar_height = menu_bar_height
+        self.box_size = box_size
+        self.overlay_pos = (0, menu_bar_height)
+
+        # Our board: an identical copy of everyone else's. Moves are made on it straight away
+        # (no waiting on the network) and forwarded to the server
+        self.mine_field = connection.create_field()
+        self.mine_field.profiler = game.profiler
+        self.mine_field.add_listener(self.state_changed)
+        self.start_time = time.perf_counter()
+        self.finish_time = None
+
+        self.grid = MineSweeperGrid(
+            pos_x=0, pos_y=menu_bar_height,
+            tile_size=box_size,
+            sprite_list=game.grid_sprites,
+            object_link=self.mine_field,
+            move_listener=connection.send_move
+        )
+        self.face = MineSweeperFace(
+            pos_x=self.board_width / 2 - face_size / 2,
+            pos_y=menu_bar_height / 2 - face_size / 2,
+            width=face_size, height=face_size,
+            rightclick=self.commit_mines,
+            object_link=self.mine_field,
+            sprite_list=game.face_sprites
+        )
+
+        digit_size_ratio = game.digit_sprites['blank'].get_width() / game.digit_sprites['blank'].get_height()
+        d_width = digit_size_ratio * face_size
+        self.mine_counter = DigitDisplay(
+            sprite_list=game.digit_sprites,
+            digit_height=face_size, digit_width=d_width,
+            num_digits=3,
+            pos_x=(39/40) * self.board_width - (3 * d_width),
+            pos_y=(1/2) * menu_bar_height - (1/2) * face_size
+        )
+        self.time_counter = DigitDisplay(
+            sprite_list=game.digit_sprites,
+            digit_height=face_size, digit_width=d_width,
+            num_digits=3,
+            pos_x=(1/40) * self.board_width,
+            pos_y=(1/2) * menu_bar_height - (1/2) * face_size
+        )
+
+        self.opponents = {}     # Player number -> MineSweeperGrid mirroring their board (one per free slot)
+        self.results = {}       # Player number -> RESULT reply
+        self.status_text = "Waiting for the server..."
+        self.status = Button(
+            pos_x=0, pos_y=self.display_size[1] - self.STATUS_HEIGHT,
+            width=self.display_size[0], height=self.STATUS_HEIGHT,
+            colormap=game.get_colormap(0.4), do_mouseover_color=False,
+            font_size=14, textfunc=lambda: self.status_text
+        )
+        self.buttons = [self.face]
+
+    def get_display_mode(self):
+        return self.display_size, False
+
+    def flag_redraw(self):
+        super().flag_redraw()
+        self.grid.flag_redraw()
+        for opponent_grid in self.opponents.values():
+            opponent_grid.flag_redraw()
+        self.face.display_image = None
+        self.mine_counter.flag_redraw()
+        self.time_counter.flag_redraw()
+
+    def exit(self):
+        self.connection.close()
+
+    def commit_mines(self):
+        if self.mine_field.game_state() == 0:
+            self.mine_field.commit_mines()
+            self.connection.send_commit()
+
+    def state_changed(self, old_state, new_state):
+        if new_state != 0 and self.finish_time is None:
+            self.finish_time = time.perf_counter()
+
+    def opponent_grid(self, player_index):
+        # The grid mirroring a player's board, made the first time we hear from them
+        # (None once every board slot is taken)
+        if player_index not in self.opponents:
+            slot = len(self.opponents) + 1
+            if slot >= self.num_boards:
+                return None
+            self.opponents[player_index] = MineSweeperGrid(
+                pos_x=slot * (self.board_width + self.BOARD_GAP), pos_y=self.menu_bar_height,
+                tile_size=self.box_size,
+                sprite_list=self.game.grid_sprites,
+                object_link=self.connection.create_field()
+            )
+        return self.opponents[player_index]
+
+    def receive(self):
+        # Applies everything the server has sent since last frame
+        for reply in self.connection.poll():
+            if reply is None:
+                self.status_text = "Connection to the race server lost"
+            elif reply.opcode == ERROR:
+                self.status_text = self.ERROR_TEXT.get(reply.error, "Race server error {}".format(reply.error))
+            elif reply.opcode == JOINED:
+                self.player_index = reply.place
+                self.update_status()
+            elif reply.opcode == PROGRESS and reply.game_id != self.player_index:
+                mirror_grid = self.opponent_grid(reply.game_id)
+                if mirror_grid is not None:
+                    apply_cells(mirror_grid.mine_field, reply.cells)
+                    mirror_grid.mine_field.state = reply.state
+                self.update_status()
+            elif reply.opcode == RESULT:
+                self.results[reply.game_id] = reply
+                self.update_status()
+
+    def update_status(self):
+        # Leaderboard: winners by time, then everyone else
+        def name(player_index):
+            return "You" if player_index == self.player_index else "P{}".format(player_index + 1)
+
+        finished = sorted(self.results.values(), key=lambda result: (result.place == 0, result.seconds))
+        parts = []
+        for result in finished:
+            if result.place > 0:
+                parts.append("{}. {} {:.1f}s".format(result.place, name(result.game_id), result.seconds))
+            else:
+                parts.append("{} lost".format(name(result.game_id)))
+        racing = len(self.opponents) + 1 - len(self.results)
+        if racing > 0:
+            parts.append("{} racing".format(racing))
+        self.status_text = "   ".join(parts)
+
+    def handle_event(self, ev):
+        if ev.type == pygame.KEYDOWN and ev.key == pygame.K_ESCAPE:
+            self.game.change_scene(StartMenuScene(self.game))
+
+    def store_inputs(self, mouse_pos=(-1, -1), mouse_buttons=(False, False, False)):
+        super().store_inputs(mouse_pos, mouse_buttons)
+        self.grid.store_inputs(mouse_pos, mouse_buttons)
+
+    def click_logic(self):
+        self.face.button_logic()
+        if self.mine_field.game_state() == 0:
+            self.grid.button_logic()
+
+    def button_logic(self):
+        self.receive()
+        self.face.button_logic()
+        self.game.profiler.mark('button_logic')
+
+        if self.mine_field.game_state() == 0:
+            self.grid.button_logic()
+        self.game.profiler.mark('engine')
+
+    def draw(self, to_screen):
+        force = self.do_redraw
+        if force:
+            to_screen.fill(self.background_color)
+            to_screen.blit(scale_sprite(
+                self.game.menu_elements['MENU_BAR'],
+                (int(self.display_size[0]), self.menu_bar_height)),
+                (0, 0)
+            )
+            self.do_redraw = False
+
+        self.face.draw(to_screen)
+        self.grid.draw(to_screen)
+        for opponent_grid in self.opponents.values():
+            opponent_grid.draw(to_screen)
+
+        end_time = self.finish_time if self.finish_time is not None else time.perf_counter()
+        self.mine_counter.draw(to_screen, self.mine_field.num_mines_left)
+        self.time_counter.draw(to_screen, int(end_time - self.start_time))
+        self.status.draw(to_screen, force=force)
+
+
+class SessionScene(Scene):
+    # Tournament session (see Session.py): a fixed set of seeded boards, played back to back,
+    # or `tiles` of them at a time tiled on one screen, each replaced by the next board as soon as it's finished
+    # The grids, face & counters are made once for the whole session and re-linked to each new board's engine.
+    # Their sprites come from the shared, pre-scaled sprite cache (Interface.scale_sprite), so moving on to the
+    # next board loads & scales nothing: it's just drawn.
+    # Left-click the face to start the session over (same boards), right-click it to commit every board's flags
+    caption = "Minesweeper Session"
+    BOARD_GAP = 10          # Pixels between boards
+    STATUS_HEIGHT = 25      # Splits strip along the bottom
+
+    def __init__(self, game, session_seed, num_boards=5, tiles=1):
+        super().__init__(game)
+        self.session_seed = session_seed
+        self.num_boards = max(1, num_boards)
+        self.num_tiles = max(1, min(tiles, self.num_boards))
+        columns, rows = parse_seed_string(session_seed)[:2]
+
+        # Tiles in a near-square block, sized as the game screen would size one board (shrunk to fit the monitor)
+        tile_columns = math.ceil(math.sqrt(self.num_tiles))
+        tile_rows = math.ceil(self.num_tiles / tile_columns)
+        menu_bar_height = game.display_settings['menu_bar_height']
+        face_size = game.display_settings['face_size']
+        box_size = 0.95 * min(
+            game.settings['screen_size'] / (tile_rows * rows),
+            game.settings['screen_size'] / (tile_columns * columns)
+        )
+        available_width = 0.95 * game.screen_resolution[0] - (tile_columns - 1) * self.BOARD_GAP
+        available_height = (0.9 * game.screen_resolution[1] - menu_bar_height - self.STATUS_HEIGHT
+                            - (tile_rows - 1) * self.BOARD_GAP)
+        box_size = min(box_size, available_width / (tile_columns * columns), available_height / (tile_rows * rows))
+        board_width = box_size * columns
+        board_height = box_size * rows
+        tiled_width = tile_columns * board_width + (tile_columns - 1) * self.BOARD_GAP
+        screen_width = max(tiled_width, 8 * face_size)     # Room for the counters & face
+        self.display_size = (
+            screen_width,
+            menu_bar_height + tile_rows * board_height + (tile_rows - 1) * self.BOARD_GAP + self.STATUS_HEIGHT
+        )
+        self.menu_bar_height = menu_bar_height
+        self.overlay_pos = (0, menu_bar_height)
+
+        # Deal the first boards (the session deals the rest in the background as they're played)
+        self.session = None
+        self.slots = []             # SessionBoard shown in each tile
+        self.start_session()
+        self.reveal_waves = max(1, max(columns, rows) // GameScene.REVEAL_BOARD_PER_WAVE)
+
+        self.grids = []
+        for index, board in enumerate(self.slots):
+            self.grids.append(MineSweeperGrid(
+                pos_x=(screen_width - tiled_width) / 2 + (index % tile_columns) * (board_width + self.BOARD_GAP),
+                pos_y=menu_bar_height + (index // tile_columns) * (board_height + self.BOARD_GAP),
+                tile_size=box_size,
+                sprite_list=game.grid_sprites,
+                object_link=board.mine_field
+            ))
+
+        self.face = MineSweeperFace(
+            pos_x=screen_width / 2 - face_size / 2,
+            pos_y=menu_bar_height / 2 - face_size / 2,
+            width=face_size, height=face_size,
+            leftclick=self.restart, rightclick=self.commit_mines,
+            object_link=self.slots[0].mine_field,
+            sprite_list=game.face_sprites
+        )
+        self.buttons = [self.face]
+
+        digit_size_ratio = game.digit_sprites['blank'].get_width() / game.digit_sprites['blank'].get_height()
+        d_width = digit_size_ratio * face_size
+        self.mine_counter = DigitDisplay(
+            sprite_list=game.digit_sprites,
+            digit_height=face_size, digit_width=d_width,
+            num_digits=3,
+            pos_x=(39/40) * screen_width - (3 * d_width),
+            pos_y=(1/2) * menu_bar_height - (1/2) * face_size
+        )
+        self.time_counter = DigitDisplay(
+            sprite_list=game.digit_sprites,
+            digit_height=face_size, digit_width=d_width,
+            num_digits=3,
+            pos_x=(1/40) * screen_width,
+            pos_y=(1/2) * menu_bar_height - (1/2) * face_size
+        )
+
+        self.status = Button(
+            pos_x=0, pos_y=self.display_size[1] - self.STATUS_HEIGHT,
+            width=self.display_size[0], height=self.STATUS_HEIGHT,
+            colormap=game.get_colormap(0.4), do_mouseover_color=False,
+            font_size=14, textfunc=self.status_text
+        )
+
+        # Every tile & digit the session can show is scaled now, not when a board first needs it
+        self.grids[0].prescale()
+        self.mine_counter.prescale()
+
+    def start_session(self):
+        if self.session is not None:
+            self.session.close()
+        self.session = TournamentSession(self.session_seed, self.num_boards)
+        self.session.prepare(self.num_tiles + 1)
+        self.slots = []
+        for _ in range(self.num_tiles):
+            self.slots.append(self.link_board(self.session.next_board()))
+
+    def link_board(self, board):
+        board.mine_field.profiler = self.game.profiler
+        board.mine_field.time_sliced = True
+        board.mine_field.add_listener(self.state_changed)
+        return board
+
+    def restart(self):
+        # The same boards again, from the first
+        self.start_session()
+        for grid, board in zip(self.grids, self.slots):
+            grid.set_mine_field(board.mine_field)
+        self.face.mine_field = self.slots[0].mine_field
+        self.face.display_image = None
+
+    def commit_mines(self):
+        for board in self.slots:
+            if board.mine_field.game_state() == 0:
+                board.mine_field.commit_mines()
+
+    def state_changed(self, old_state, new_state):
+        if new_state != 0 and self.session.is_over():
+            print("[session] {}".format(self.session_seed))
+            for line in self.session.split_lines():
+                print("[session] " + line)
+
+    def deal(self):
+        # Swaps each finished board for the next one, straight away
+        for index, board in enumerate(self.slots):
+            if board.outcome == 0:
+                continue
+            next_board = self.session.next_board()
+            if next_board is None:
+                # Every board has been handed out: the finished one stays on screen
+                continue
+            self.slots[index] = self.link_board(next_board)
+            self.grids[index].set_mine_field(next_board.mine_field)
+            if index == 0:
+                self.face.mine_field = next_board.mine_field
+
+    def status_text(self):
+        # Board being played & the last few splits (or the result, once the session is over)
+        if self.session.is_over():
+            return self.session.split_lines()[-1]
+        splits = []
+        for board in self.session.boards:
+            if board.outcome == 1:
+                splits.append("{:.1f}s".format(board.elapsed()))
+            elif board.outcome == -1:
+                splits.append("lost")
+        return "Board {} of {}   {}".format(
+            min(len(self.session.boards), self.num_boards), self.num_boards, "  ".join(splits[-6:])
+        )
+
+    def get_display_mode(self):
+        return self.display_size, False
+
+    def flag_redraw(self):
+        super().flag_redraw()
+        for grid in self.grids:
+            grid.flag_redraw()
+        self.face.display_image = None
+        self.mine_counter.flag_redraw()
+        self.time_counter.flag_redraw()
+
+    def exit(self):
+        self.session.close()
+
+    def handle_event(self, ev):
+        if ev.type == pygame.KEYDOWN:
+            if ev.key == pygame.K_ESCAPE:
+                self.game.change_scene(StartMenuScene(self.game))
+            elif ev.key == pygame.K_r:
+                self.restart()
+
+    def store_inputs(self, mouse_pos=(-1, -1), mouse_buttons=(False, False, False)):
+        super().store_inputs(mouse_pos, mouse_buttons)
+        for grid in self.grids:
+            grid.store_inputs(mouse_pos, mouse_buttons)
+
+    def click_logic(self):
+        self.face.button_logic()
+        for grid in self.grids:
+            if grid.mine_field.game_state() == 0:
+                grid.button_logic()
+        self.deal()
+
+    def button_logic(self):
+        self.face.button_logic()
+        self.game.profiler.mark('button_logic')
+
+        for grid in self.grids:
+            if grid.mine_field.game_state() == 0:
+                grid.button_logic()
+                grid.mine_field.advance_spread(GameScene.REVEAL_BUDGET / len(self.grids), self.reveal_waves)
+        self.deal()
+        self.game.profiler.mark('engine')
+
+    def draw(self, to_screen):
+        force = self.do_redraw
+        if force:
+            to_screen.fill(self.background_color)
+            to_screen.blit(scale_sprite(
+                self.game.menu_elements['MENU_BAR'],
+                (int(self.display_size[0]), self.menu_bar_height)),
+                (0, 0)
+            )
+            self.do_redraw = False
+
+        self.face.draw(to_screen)
+        for grid in self.grids:
+            grid.draw(to_screen)
+
+        self.mine_counter.draw(to_screen, sum(
+            board.mine_field.num_mines_left for board in self.slots if board.outcome == 0
+        ))
+        self.time_counter.draw(to_screen, int(self.session.elapsed()))
+        self.status.draw(to_screen, force=force)
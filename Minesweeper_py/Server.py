@@ -0,0 +1,420 @@
+import argparse
+import asyncio
+import random
+import struct
+import sys
+from collections import OrderedDict
+
+from GameVariables import MineField
+from Race import RaceSession
+
+# Multiplayer game server: hosts many independent MineField games over TCP on one asyncio event loop
+#
+# Every message is a fixed header followed by a payload whose size is fixed by its opcode,
+# all in network byte order. Game ids are chosen by the client and are private to its connection,
+# so a client can start a game and send moves to it without waiting for a reply.
+#
+# Client -> server     header '!BI' (opcode, game id) then
+#   NEW     '!HHIq'     columns, rows, mines, seed (-1 for a random board). Starts (or restarts) the game
+#   DIG     '!HH'       x, y
+#   FLAG    '!HH'       x, y (toggles the flag)
+#   CHORD   '!HH'       x, y
+#   COMMIT              (no payload) commit_mines
+#   END                 (no payload) drops the game (or leaves the race)
+#   JOIN    '!HHIq'     columns, rows, mines, seed. Joins the race on that seed (see Race.py),
+#                       starting one if there isn't one yet. Moves are then sent to the game id as usual
+#
+# Server -> client, one reply per request, in request order
+#   DIFF    '!BIbiI'    opcode, game id, game state, mines left, number of cells
+#           then per cell '!HHb' x, y, value (see cell_value)
+#           only the cells the request changed are sent, taken from the MineField's change set
+#   JOINED  '!BIB'      opcode, game id, player number in the race (reply to JOIN)
+#   ERROR   '!BIB'      opcode, game id, error code
+# and, to players in a race, at any time (in place of the game id, these carry a player number)
+#   PROGRESS            laid out as DIFF: the cells another player's move changed on their board
+#                       (on joining, every other player's board so far is sent this way)
+#   RESULT  '!BIBbd'    opcode, player number, place (0 unless they won), final game state, seconds taken
+#
+# Usage (from the repository root):
+#   python Minesweeper_py/Server.py --port 8765
+
+HOST = "127.0.0.1"
+PORT = 8765
+
+HEADER = struct.Struct('!BI')
+NEW_PAYLOAD = struct.Struct('!HHIq')
+MOVE_PAYLOAD = struct.Struct('!HH')
+DIFF_HEADER = struct.Struct('!BIbiI')
+DIFF_CELL = struct.Struct('!HHb')
+ERROR_MESSAGE = struct.Struct('!BIB')
+JOINED_MESSAGE = struct.Struct('!BIB')
+RESULT_MESSAGE = struct.Struct('!BIBbd')
+
+# Opcodes
+NEW = 1
+DIG = 2
+FLAG = 3
+CHORD = 4
+COMMIT = 5
+END = 6
+JOIN = 7
+DIFF = 0x81
+JOINED = 0x82
+PROGRESS = 0x83
+RESULT = 0x84
+ERROR = 0x8F
+
+PAYLOAD_SIZES = {
+    NEW: NEW_PAYLOAD.size,
+    DIG: MOVE_PAYLOAD.size,
+    FLAG: MOVE_PAYLOAD.size,
+    CHORD: MOVE_PAYLOAD.size,
+    COMMIT: 0,
+    END: 0,
+    JOIN: NEW_PAYLOAD.size
+}
+
+# Error codes
+ERROR_UNKNOWN_GAME = 1      # No game with that id on this connection
+ERROR_BAD_OPCODE = 2        # Unknown opcode (the connection is closed: the rest of the stream can't be framed)
+ERROR_BAD_BOARD = 3         # NEW or JOIN with a board size of 0 or larger than the server allows
+ERROR_FULL = 4              # Server already hosts its maximum number of games
+ERROR_BAD_SEED = 5          # JOIN with a negative seed
+ERROR_RACE_FULL = 6         # JOIN on a race that already has its maximum number of players
+
+# Cell values
+# 0-8 is a revealed number
+UNREVEALED = -1
+MINE = -2               # Revealed on a lost game
+FLAG_CELL = -3
+WRONG_FLAG = -4         # Flag on a safe tile, revealed on a lost game
+MINE_REMOVED = -5       # Committed mine
+MINE_EXPLODED = -6      # The mine that lost the game
+
+
+def cell_value(field_square):
+    # What a client shows for a square (the same cases as MineSweeperGrid.get_image)
+    if field_square.mine_removed:
+        return MINE_REMOVED
+    elif field_square.is_revealed:
+        if field_square.has_mine:
+            return MINE_EXPLODED if field_square.source_explosion else MINE
+        elif field_square.has_flag:
+            return WRONG_FLAG
+        else:
+            return field_square.neighboring_mines
+    elif field_square.has_flag:
+        return FLAG_CELL
+    else:
+        return UNREVEALED
+
+
+def encode_diff(game_id, mine_field, changed, opcode=DIFF):
+    message = bytearray(DIFF_HEADER.pack(
+        opcode, game_id, mine_field.game_state(), mine_field.num_mines_left, len(changed)
+    ))
+    for square in changed:
+        message += DIFF_CELL.pack(square.pos[0], square.pos[1], cell_value(square))
+    return message
+
+
+class GameStore:
+    # Every game hosted by the server, keyed by (connection id, game id)
+    # Only the max_live most recently played games are kept as MineFields; the rest are packed
+    # (MineField.pack, two bytes per square) until their next move. Memory is bounded by
+    # max_live full boards plus max_games packed ones.
+    # Race boards are held by their RaceSession rather than the store, but are reserved here,
+    # so they count toward both limits (they're always full boards: they're never packed)
+    def __init__(self, max_live=4096, max_games=100000):
+        self.max_live = max_live
+        self.max_games = max_games
+        self.live = OrderedDict()   # key -> MineField, least recently used first
+        self.packed = {}            # key -> bytes
+        self.packed_bytes = 0       # Total size of packed games
+        self.num_reserved = 0       # Race boards held outside the store
+        self.num_packs = 0          # Number of times a game has been packed (i.e. evicted)
+        self.peak_games = 0         # Most games hosted at once
+        self.peak_packed_bytes = 0  # Most memory taken by packed games at once
+
+    def __len__(self):
+        return len(self.live) + len(self.packed)
+
+    def is_full(self):
+        return len(self) + self.num_reserved >= self.max_games
+
+    def __contains__(self, key):
+        return key in self.live or key in self.packed
+
+    def new_game(self, key, columns, rows, mines, seed):
+        # Returns the new MineField, or None if the store is full
+        self.remove(key)
+        if self.is_full():
+            return None
+
+        rng = random.Random(seed) if seed >= 0 else None
+        mine_field = MineField(columns, rows, rng)
+        mine_field.populate_mines(mines)
+        self.add_live(key, mine_field)
+        self.peak_games = max(self.peak_games, len(self))
+        return mine_field
+
+    def get(self, key):
+        # Returns the game's MineField (unpacking it if needed), or None if there is no such game
+        mine_field = self.live.get(key)
+        if mine_field is not None:
+            self.live.move_to_end(key)
+            return mine_field
+
+        data = self.packed.pop(key, None)
+        if data is None:
+            return None
+        self.packed_bytes -= len(data)
+        # Packed games don't keep their rng (a random.Random is bigger than most boards),
+        # so a seeded game only stays reproducible until it is first packed
+        mine_field = MineField.unpack(data)
+        self.add_live(key, mine_field)
+        return mine_field
+
+    def reserve(self):
+        # Counts one more race board toward the limits. Returns False if there's no room for it
+        if self.is_full() or self.num_reserved >= self.max_live:
+            return False
+        self.num_reserved += 1
+        self.pack_oldest()
+        return True
+
+    def release(self):
+        self.num_reserved -= 1
+
+    def add_live(self, key, mine_field):
+        self.live[key] = mine_field
+        self.pack_oldest()
+
+    def pack_oldest(self):
+        # Packs the least recently played games until no more than max_live boards are full
+        while len(self.live) > 0 and len(self.live) + self.num_reserved > self.max_live:
+            old_key, old_field = self.live.popitem(last=False)
+            data = old_field.pack()
+            self.packed[old_key] = data
+            self.packed_bytes += len(data)
+            self.peak_packed_bytes = max(self.peak_packed_bytes, self.packed_bytes)
+            self.num_packs += 1
+
+    def remove(self, key):
+        self.live.pop(key, None)
+        data = self.packed.pop(key, None)
+        if data is not None:
+            self.packed_bytes -= len(data)
+
+
+class GameServer:
+    def __init__(self, host=HOST, port=PORT, max_live=4096, max_games=100000, max_side=256, max_race_players=64):
+        self.host = host
+        self.port = port
+        self.max_side = max_side        # Largest number of rows or columns a NEW game may have
+        self.max_race_players = max_race_players    # Most players who can join one race
+        self.store = GameStore(max_live, max_games)
+        self.server = None
+        self.next_connection_id = 0
+        self.num_connections = 0
+        self.num_requests = 0
+
+        self.writers = {}       # connection id -> StreamWriter (for messages to other players in a race)
+        self.races = {}         # (columns, rows, mines, seed) -> RaceSession
+        self.race_members = {}  # (columns, rows, mines, seed) -> {(connection id, game id): RacePlayer}
+        self.race_games = {}    # (connection id, game id) -> (race key, RacePlayer)
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        # With port 0 the OS picks a free port
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self):
+        if self.server is None:
+            await self.start()
+        print("Serving minesweeper games on {}:{}".format(self.host, self.port))
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def handle_connection(self, reader, writer):
+        connection_id = self.next_connection_id
+        self.next_connection_id += 1
+        self.num_connections += 1
+        self.writers[connection_id] = writer
+        game_ids = set()
+
+        try:
+            while True:
+                opcode, game_id = HEADER.unpack(await reader.readexactly(HEADER.size))
+                if opcode not in PAYLOAD_SIZES:
+                    writer.write(ERROR_MESSAGE.pack(ERROR, game_id, ERROR_BAD_OPCODE))
+                    break
+                payload = await reader.readexactly(PAYLOAD_SIZES[opcode]) if PAYLOAD_SIZES[opcode] > 0 else b''
+                self.num_requests += 1
+
+                writer.write(self.handle_request(connection_id, game_ids, opcode, game_id, payload))
+                # Only waits when the client isn't keeping up with replies
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            for game_id in game_ids:
+                self.store.remove((connection_id, game_id))
+                self.leave_race((connection_id, game_id))
+            del self.writers[connection_id]
+            self.num_connections -= 1
+            writer.close()
+
+    def handle_request(self, connection_id, game_ids, opcode, game_id, payload):
+        # Applies one request and returns the reply message
+        key = (connection_id, game_id)
+
+        if opcode == NEW:
+            columns, rows, mines, seed = NEW_PAYLOAD.unpack(payload)
+            if not (0 < columns <= self.max_side and 0 < rows <= self.max_side):
+                return ERROR_MESSAGE.pack(ERROR, game_id, ERROR_BAD_BOARD)
+            self.leave_race(key)
+            mine_field = self.store.new_game(key, columns, rows, mines, seed)
+            if mine_field is None:
+                return ERROR_MESSAGE.pack(ERROR, game_id, ERROR_FULL)
+            game_ids.add(game_id)
+            return encode_diff(game_id, mine_field, ())
+
+        if opcode == JOIN:
+            columns, rows, mines, seed = NEW_PAYLOAD.unpack(payload)
+            if not (0 < columns <= self.max_side and 0 < rows <= self.max_side):
+                return ERROR_MESSAGE.pack(ERROR, game_id, ERROR_BAD_BOARD)
+            if seed < 0:
+                return ERROR_MESSAGE.pack(ERROR, game_id, ERROR_BAD_SEED)
+            self.store.remove(key)
+            self.leave_race(key)
+            game_ids.add(game_id)
+            return self.join_race(key, (columns, rows, mines, seed))
+
+        if opcode == END:
+            self.store.remove(key)
+            self.leave_race(key)
+            game_ids.discard(game_id)
+            return DIFF_HEADER.pack(DIFF, game_id, 0, 0, 0)
+
+        race_key, race_player = self.race_games.get(key, (None, None))
+        if race_player is not None:
+            mine_field = race_player.mine_field
+        else:
+            mine_field = self.store.get(key)
+        if mine_field is None:
+            return ERROR_MESSAGE.pack(ERROR, game_id, ERROR_UNKNOWN_GAME)
+        old_state = mine_field.game_state()
+
+        if old_state == 0:
+            # Finished games don't take moves or commits (the board stays as it ended)
+            if opcode == COMMIT:
+                mine_field.commit_mines()
+            else:
+                pos_x, pos_y = MOVE_PAYLOAD.unpack(payload)
+                if opcode == DIG:
+                    mine_field.dig(pos_x, pos_y)
+                elif opcode == FLAG:
+                    mine_field.toggle_flag(pos_x, pos_y)
+                else:
+                    mine_field.chord(pos_x, pos_y)
+
+        changed = mine_field.take_changes()
+        if race_player is not None:
+            self.send_race_progress(race_key, key, race_player, changed, old_state)
+        return encode_diff(game_id, mine_field, changed)
+
+    def join_race(self, key, race_key):
+        # Adds a player to the race on race_key and returns their JOINED reply,
+        # followed by the boards of everyone already racing (or an ERROR reply if there's no room)
+        race = self.races.get(race_key)
+        if race is not None and race.is_full():
+            return ERROR_MESSAGE.pack(ERROR, key[1], ERROR_RACE_FULL)
+        if not self.store.reserve():
+            return ERROR_MESSAGE.pack(ERROR, key[1], ERROR_FULL)
+        if race is None:
+            race = self.races[race_key] = RaceSession(*race_key, max_players=self.max_race_players)
+            self.race_members[race_key] = {}
+        members = self.race_members[race_key]
+
+        player = race.add_player()
+        reply = bytearray(JOINED_MESSAGE.pack(JOINED, key[1], player.index))
+        for other in race.players:
+            if other is not player:
+                reply += encode_diff(other.index, other.mine_field, full_board(other.mine_field), PROGRESS)
+            if other.finish_time is not None:
+                reply += encode_result(race, other)
+
+        # Everyone else gets the new player's starting board
+        self.broadcast(members, encode_diff(player.index, player.mine_field, full_board(player.mine_field), PROGRESS))
+
+        members[key] = player
+        self.race_games[key] = (race_key, player)
+        return reply
+
+    def leave_race(self, key):
+        # The player's result stays on the race's leaderboard; the race ends once everyone has left
+        race_key, player = self.race_games.pop(key, (None, None))
+        if race_key is None:
+            return
+        self.store.release()
+        members = self.race_members[race_key]
+        del members[key]
+        if len(members) == 0:
+            del self.races[race_key]
+            del self.race_members[race_key]
+
+    def send_race_progress(self, race_key, key, player, changed, old_state):
+        members = self.race_members[race_key]
+        others = {member_key: member for member_key, member in members.items() if member_key != key}
+        if len(changed) > 0:
+            self.broadcast(others, encode_diff(player.index, player.mine_field, changed, PROGRESS))
+        if old_state == 0 and player.mine_field.game_state() != 0:
+            self.broadcast(members, encode_result(self.races[race_key], player))
+
+    def broadcast(self, members, message):
+        for connection_id, game_id in members:
+            writer = self.writers.get(connection_id)
+            if writer is not None:
+                writer.write(message)
+
+
+def full_board(mine_field):
+    # Every square a player can see something on (i.e. the whole board as a change set)
+    return [square for column in mine_field.field for square in column if cell_value(square) != UNREVEALED]
+
+
+def encode_result(race, player):
+    return RESULT_MESSAGE.pack(RESULT, player.index, race.place(player), player.outcome, player.elapsed())
+
+
+def __main__():
+    parser = argparse.ArgumentParser(description="Host minesweeper games over TCP")
+    parser.add_argument("--host", default=HOST, help="Address to listen on (default {})".format(HOST))
+    parser.add_argument("--port", type=int, default=PORT, help="Port to listen on (default {})".format(PORT))
+    parser.add_argument("--max-live", type=int, default=4096,
+                        help="Games kept unpacked in memory (default 4096)")
+    parser.add_argument("--max-games", type=int, default=100000,
+                        help="Most games hosted at once (default 100000)")
+    parser.add_argument("--max-side", type=int, default=256,
+                        help="Largest number of rows or columns for a game (default 256)")
+    parser.add_argument("--max-race-players", type=int, default=64,
+                        help="Most players who can join one race (default 64, at most {})".format(
+                            RaceSession.MAX_PLAYERS))
+    args = parser.parse_args()
+
+    server = GameServer(args.host, args.port, args.max_live, args.max_games, args.max_side, args.max_race_players)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(__main__())
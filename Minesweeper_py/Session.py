@@ -0,0 +1,111 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from Race import create_race_field, parse_seed_string
+
+# Tournament sessions: a fixed set of seeded boards, played back to back (or a few at a time, see Scenes.SessionScene)
+#
+# Every board comes from one session seed string (see Race.py): "9x9-10-friday" deals 9x9-10-friday.1,
+# 9x9-10-friday.2 and so on, so everyone playing the same string plays the same boards in the same order,
+# each with the same opening already dug.
+#
+# While boards are being played, the next one is dealt on a background thread, so moving on is instant.
+# Split times use time.monotonic, which can't jump if the system clock is changed mid-session.
+
+
+def session_seed_strings(session_seed, num_boards):
+    # Seed strings of a session's boards, in the order they're played
+    parse_seed_string(session_seed)     # Raises ValueError for anything that isn't a seed string
+    return ["{}.{}".format(session_seed, number) for number in range(1, num_boards + 1)]
+
+
+class SessionBoard:
+    # One board of a session and its split
+    def __init__(self, number, seed_string, mine_field):
+        self.number = number            # 1 for the first board of the session
+        self.seed_string = seed_string
+        self.mine_field = mine_field
+        self.start_time = time.monotonic()
+        self.finish_time = None         # Set when the board is won or lost
+        self.outcome = 0                # Final game state (1 won, -1 lost)
+
+    def elapsed(self):
+        end_time = self.finish_time if self.finish_time is not None else time.monotonic()
+        return end_time - self.start_time
+
+
+class TournamentSession:
+    def __init__(self, session_seed, num_boards):
+        self.session_seed = session_seed
+        self.seed_strings = session_seed_strings(session_seed, max(1, num_boards))
+        self.boards = []                # SessionBoard of every board started, in order
+        self.start_time = time.monotonic()
+        self.finish_time = None         # Set when the last board is finished
+
+        # One worker: boards are dealt in order, each while the ones before it are being played
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="session")
+        self.prepared = []              # Futures of dealt MineFields not handed out yet, in order
+        self.num_prepared = 0           # Boards dealt (or being dealt) so far
+
+    def prepare(self, count=1):
+        # Starts dealing the next `count` boards in the background
+        for _ in range(count):
+            if self.num_prepared == len(self.seed_strings):
+                return
+            config = parse_seed_string(self.seed_strings[self.num_prepared])
+            self.prepared.append(self.executor.submit(create_race_field, *config))
+            self.num_prepared += 1
+
+    def next_board(self):
+        # Starts the next board (None once every board has been handed out)
+        # Its MineField was dealt in the background: this only waits if boards are finished faster than they're dealt
+        if len(self.prepared) == 0:
+            self.prepare()
+            if len(self.prepared) == 0:
+                return None
+        mine_field = self.prepared.pop(0).result()
+        number = len(self.boards) + 1
+        board = SessionBoard(number, self.seed_strings[number - 1], mine_field)
+        mine_field.add_listener(lambda old_state, new_state, board=board: self.board_finished(board, new_state))
+        self.boards.append(board)
+
+        # Deal the one after it while this one is played
+        self.prepare()
+        return board
+
+    def board_finished(self, board, state):
+        if state != 0 and board.finish_time is None:
+            board.finish_time = time.monotonic()
+            board.outcome = state
+            if self.is_over():
+                self.finish_time = board.finish_time
+
+    def is_over(self):
+        return len(self.boards) == len(self.seed_strings) and all(board.outcome != 0 for board in self.boards)
+
+    def elapsed(self):
+        end_time = self.finish_time if self.finish_time is not None else time.monotonic()
+        return end_time - self.start_time
+
+    def num_won(self):
+        return sum(1 for board in self.boards if board.outcome == 1)
+
+    def split_lines(self):
+        # One line per board started: its number, outcome & split time, then the session total
+        lines = []
+        for board in self.boards:
+            if board.outcome == 1:
+                result = "won"
+            elif board.outcome == -1:
+                result = "lost"
+            else:
+                result = "playing"
+            lines.append("{:>3}. {:<24} {:<8} {:>8.2f}s".format(
+                board.number, board.seed_string, result, board.elapsed()
+            ))
+        lines.append("{} of {} won in {:.2f}s".format(self.num_won(), len(self.seed_strings), self.elapsed()))
+        return lines
+
+    def close(self):
+        # Boards still waiting to be dealt are dropped
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,124 @@
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+from Benchmark import parse_board
+from Difficulty import layout_metrics, random_layout
+
+# Batch simulator: deals many random boards and reports the spread of their difficulty metrics
+# (see Difficulty.py for what each metric means)
+# Boards are dealt in chunks, each from its own seed, across a pool of worker processes.
+# Workers send back a histogram per metric rather than every board's figures,
+# so the cost of collecting results doesn't grow with the number of boards.
+#
+# Usage (from the repository root):
+#   python Minesweeper_py/Simulator.py --board 30x16:99 --boards 1000000
+#   python Minesweeper_py/Simulator.py --board 16x16:40 --boards 100000 --workers 4 --seed 7
+
+METRICS = ['3bv', 'openings', 'isolated_numbers', 'islands', 'guesses']
+DEFAULT_BOARD = (30, 16, 99)    # (columns, rows, mines)
+CHUNK_SIZE = 500                # Boards per task handed to a worker
+
+
+def simulate_chunk(task):
+    # Deals count boards from one chunk's seed and returns {metric: {value: number of boards}}
+    (columns, rows, mines), seed, chunk_index, count = task
+    rng = random.Random("{}-{}".format(seed, chunk_index))
+    histograms = {metric: {} for metric in METRICS}
+
+    for i in range(count):
+        metrics = layout_metrics(columns, rows, random_layout(columns, rows, mines, rng))
+        for metric in METRICS:
+            histogram = histograms[metric]
+            histogram[metrics[metric]] = histogram.get(metrics[metric], 0) + 1
+    return histograms
+
+
+def simulate(board, num_boards, seed=0, num_workers=None, chunk_size=CHUNK_SIZE):
+    # Returns {metric: {value: number of boards}} over num_boards boards
+    if num_workers is None:
+        num_workers = os.cpu_count() or 1
+
+    tasks = []
+    for chunk_index, start in enumerate(range(0, num_boards, chunk_size)):
+        tasks.append((board, seed, chunk_index, min(chunk_size, num_boards - start)))
+
+    totals = {metric: {} for metric in METRICS}
+
+    def merge(histograms):
+        for metric, histogram in histograms.items():
+            total = totals[metric]
+            for value, count in histogram.items():
+                total[value] = total.get(value, 0) + count
+
+    if num_workers <= 1:
+        for task in tasks:
+            merge(simulate_chunk(task))
+    else:
+        with multiprocessing.Pool(num_workers) as pool:
+            for histograms in pool.imap_unordered(simulate_chunk, tasks):
+                merge(histograms)
+    return totals
+
+
+def histogram_summary(histogram):
+    # Mean, percentiles & maximum of a {value: count} histogram
+    total = sum(histogram.values())
+    values = sorted(histogram)
+
+    def percentile(pct):
+        target = pct / 100 * total
+        seen = 0
+        for value in values:
+            seen += histogram[value]
+            if seen >= target:
+                return value
+        return values[-1]
+
+    return {
+        'mean': sum(value * count for value, count in histogram.items()) / total,
+        'p10': percentile(10),
+        'p50': percentile(50),
+        'p90': percentile(90),
+        'max': values[-1]
+    }
+
+
+def print_report(board, num_boards, totals, elapsed):
+    print("{} boards of {}x{} with {} mines in {:.1f}s ({:.0f} boards/s, {:.2f} million boards/hour)".format(
+        num_boards, board[0], board[1], board[2], elapsed,
+        num_boards / elapsed, num_boards / elapsed * 3600 / 1e6
+    ))
+    print("{:<18}{:>10}{:>8}{:>8}{:>8}{:>8}".format("metric", "mean", "p10", "p50", "p90", "max"))
+    for metric in METRICS:
+        summary = histogram_summary(totals[metric])
+        print("{:<18}{:>10.2f}{:>8}{:>8}{:>8}{:>8}".format(
+            metric, summary['mean'], summary['p10'], summary['p50'], summary['p90'], summary['max']
+        ))
+    no_guess = totals['guesses'].get(0, 0)
+    print("Solvable without guessing: {:.1f}%".format(100 * no_guess / num_boards))
+
+
+def __main__():
+    parser = argparse.ArgumentParser(description="Difficulty metrics over many random boards")
+    parser.add_argument("--board", type=parse_board, default=DEFAULT_BOARD,
+                        help="Board as COLUMNSxROWS:MINES (default: 30x16:99)")
+    parser.add_argument("--boards", type=int, default=100000, help="Number of boards to deal (default 100000)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes (default: one per core; 1 runs everything in this process)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the whole run (default 0)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE,
+                        help="Boards per worker task (default {})".format(CHUNK_SIZE))
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    totals = simulate(args.board, args.boards, args.seed, args.workers, max(1, args.chunk_size))
+    print_report(args.board, args.boards, totals, time.perf_counter() - start)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(__main__())
@@ -0,0 +1,145 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from Benchmark import BenchmarkSuite, add_common_arguments, finish
+
+# Startup benchmarks: every run is a fresh Python process, so nothing is already imported or cached
+#   import/engine       Importing GameVariables (the engine alone: pygame should never be imported)
+#   import/interface    Importing Interface (pygame, with no subsystems started)
+#   import/game         Importing GameInstance (every module the game needs)
+#   first_frame         From importing GameInstance to the start menu's first frame on screen
+# Along with the times, each case reports which heavy modules were imported, which pygame subsystems started
+# and how many files were opened or folders listed in Resources/ (just the asset bundle, see Assets.py).
+# The game is drawn through SDL's dummy video driver, so no window is ever opened.
+#
+# Usage (from the repository root):
+#   python Minesweeper_py/StartupBenchmark.py --output startup.json
+#   python Minesweeper_py/StartupBenchmark.py --runs 10 --baseline startup.json
+
+MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+RESOURCE_DIR = os.path.join(MODULE_DIR, "Resources")
+DEFAULT_RUNS = 5
+WATCHED_MODULES = ('pygame', 'matplotlib', 'numpy')
+SUBSYSTEMS = ('display', 'font', 'mixer', 'joystick')
+
+# Run in the child process. Prints one JSON line: the time taken & what was loaded/started
+CHILD_SOURCE = """
+import os, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {module_dir!r})
+resource_opens = []
+
+
+def count_resource_opens(event, args):
+    # Files opened (and folders listed) in Resources/: the game should only open the asset bundle
+    if event in ('open', 'os.listdir', 'os.scandir') and isinstance(args[0], str) and \
+            os.path.abspath(args[0]).startswith({resource_dir!r}):
+        resource_opens.append(args[0])
+
+
+sys.addaudithook(count_resource_opens)
+
+
+def report(finish):
+    import json
+    pygame = sys.modules.get('pygame')
+    started = []
+    if pygame is not None:
+        started = [name for name in {subsystems!r} if getattr(pygame, name).get_init()]
+    print(json.dumps({{
+        'seconds': finish - start,
+        'modules': [name for name in {watched!r} if name in sys.modules],
+        'subsystems': started,
+        'resource_opens': len(resource_opens)
+    }}))
+    sys.stdout.flush()
+
+
+if {case!r} == 'import/engine':
+    import GameVariables
+    report(time.perf_counter())
+elif {case!r} == 'import/interface':
+    import Interface
+    report(time.perf_counter())
+elif {case!r} == 'import/game':
+    import GameInstance
+    report(time.perf_counter())
+else:
+    import GameInstance
+    import pygame
+    flip = pygame.display.flip
+    update = pygame.display.update
+    load_image = pygame.image.load
+
+    def load_image_file(source, *args):
+        # Images loaded straight from a file are opened by SDL, out of sight of the audit hook
+        count_resource_opens('open', (source,))
+        return load_image(source, *args)
+
+    def first_flip(*args):
+        # The render stage shows a frame with either flip or update (see Renderer.py)
+        (update if args else flip)(*args)
+        report(time.perf_counter())
+        os._exit(0)     # Leave straight away: the game would otherwise keep running its main loop
+
+    pygame.display.flip = first_flip
+    pygame.display.update = first_flip
+    pygame.image.load = load_image_file
+    GameInstance.GameInstance()
+"""
+
+CASES = ('import/engine', 'import/interface', 'import/game', 'first_frame')
+
+
+def run_child(case):
+    environment = dict(os.environ, SDL_VIDEODRIVER="dummy", SDL_AUDIODRIVER="dummy",
+                       PYGAME_HIDE_SUPPORT_PROMPT="1")
+    source = CHILD_SOURCE.format(module_dir=MODULE_DIR, resource_dir=RESOURCE_DIR, subsystems=SUBSYSTEMS,
+                                 watched=WATCHED_MODULES, case=case)
+    completed = subprocess.run([sys.executable, "-c", source], env=environment,
+                               capture_output=True, text=True, check=True)
+    # The report is the last line (the game prints a few lines of its own)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def run_startup_case(suite, case, num_runs):
+    if not suite.wants(case):
+        return
+    reports = [run_child(case) for _ in range(num_runs)]
+    times = [report['seconds'] for report in reports]
+    mean_time = sum(times) / len(times)
+    suite.record(case, {
+        'runs': len(times),
+        'ops_per_run': 1,
+        'mean_s': mean_time,
+        'min_s': min(times),
+        'ops_per_sec': 1 / mean_time,
+        'best_ops_per_sec': 1 / min(times),
+        'modules': reports[-1]['modules'],
+        'subsystems': reports[-1]['subsystems'],
+        'resource_opens': reports[-1]['resource_opens']
+    })
+    print("{:<40}   imported: {:<28} pygame subsystems started: {:<20} resource files opened: {}".format(
+        "", ", ".join(reports[-1]['modules']) or "-", ", ".join(reports[-1]['subsystems']) or "-",
+        reports[-1]['resource_opens']
+    ))
+
+
+def __main__():
+    parser = argparse.ArgumentParser(description="Measure import time & time to the first frame")
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS,
+                        help="Fresh processes started per case (default {})".format(DEFAULT_RUNS))
+    add_common_arguments(parser, timed=False, optional_memory=False)
+    args = parser.parse_args()
+
+    suite = BenchmarkSuite("startup", case_filter=args.cases)
+    for case in CASES:
+        run_startup_case(suite, case, max(1, args.runs))
+    return finish(suite, args)
+
+
+if __name__ == "__main__":
+    sys.exit(__main__())
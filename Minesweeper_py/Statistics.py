@@ -0,0 +1,234 @@
+import os
+import sqlite3
+import time
+
+
+def default_stats_path():
+    # Stats live in the user's home directory so they survive reinstalls
+    # and don't depend on where the game was launched from
+    return os.path.join(os.path.expanduser("~"), ".minesweeper_py", "stats.db")
+
+
+class StatsStore:
+    # Local store of finished games, backed by an SQLite database in WAL mode
+    #
+    # Every finished game is appended to the 'games' log, but reads never touch that table:
+    # each flush also folds the new games into two aggregate tables keyed on (rows, columns, mines)
+    #   config_stats    games played, wins, best & total winning time, best & total 3BV/s of wins
+    #   win_times       histogram of winning times in TIME_BUCKET-second buckets
+    # so win rates, best times and percentiles are primary-key lookups no matter how many
+    # games have been recorded.
+    #
+    # Games are buffered in memory and written batch_size at a time, in one transaction
+    TIME_BUCKET = 0.1   # Width (in seconds) of a win_times histogram bucket
+
+    def __init__(self, path=None, batch_size=64):
+        if path is None:
+            path = default_stats_path()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        self.path = path
+        self.batch_size = max(1, batch_size)
+        self.pending = []       # Games recorded but not yet written to disk
+
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.create_tables()
+
+    def create_tables(self):
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS games ("
+                "   id INTEGER PRIMARY KEY,"
+                "   finished_at REAL NOT NULL,"
+                "   rows INTEGER NOT NULL,"
+                "   columns INTEGER NOT NULL,"
+                "   mines INTEGER NOT NULL,"
+                "   duration REAL NOT NULL,"
+                "   clicks INTEGER NOT NULL,"
+                "   commits INTEGER NOT NULL,"
+                "   outcome INTEGER NOT NULL,"
+                "   bbbv INTEGER"
+                ")"
+            )
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS config_stats ("
+                "   rows INTEGER NOT NULL,"
+                "   columns INTEGER NOT NULL,"
+                "   mines INTEGER NOT NULL,"
+                "   games INTEGER NOT NULL,"
+                "   wins INTEGER NOT NULL,"
+                "   total_win_time REAL NOT NULL,"
+                "   best_time REAL,"
+                "   bbbv_wins INTEGER NOT NULL DEFAULT 0,"
+                "   total_bbbv_rate REAL NOT NULL DEFAULT 0,"
+                "   best_bbbv_rate REAL,"
+                "   PRIMARY KEY (rows, columns, mines)"
+                ") WITHOUT ROWID"
+            )
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS win_times ("
+                "   rows INTEGER NOT NULL,"
+                "   columns INTEGER NOT NULL,"
+                "   mines INTEGER NOT NULL,"
+                "   bucket INTEGER NOT NULL,"
+                "   count INTEGER NOT NULL,"
+                "   PRIMARY KEY (rows, columns, mines, bucket)"
+                ") WITHOUT ROWID"
+            )
+
+            # Databases from before 3BV was recorded: add its columns (older games have no 3BV)
+            self.add_missing_columns("games", [("bbbv", "INTEGER")])
+            self.add_missing_columns("config_stats", [
+                ("bbbv_wins", "INTEGER NOT NULL DEFAULT 0"),
+                ("total_bbbv_rate", "REAL NOT NULL DEFAULT 0"),
+                ("best_bbbv_rate", "REAL")
+            ])
+
+    def add_missing_columns(self, table, columns):
+        existing = {row[1] for row in self.connection.execute("PRAGMA table_info({})".format(table))}
+        for name, definition in columns:
+            if name not in existing:
+                self.connection.execute("ALTER TABLE {} ADD COLUMN {} {}".format(table, name, definition))
+
+    def record_game(self, rows, columns, mines, duration, clicks, commits, outcome, bbbv=None):
+        # Buffer one finished game. outcome uses MineField.game_state() codes (1 won, -1 lost)
+        # bbbv: the board's 3BV (MineField.get_metrics), for the 3BV/s efficiency of wins
+        self.pending.append(
+            (time.time(), rows, columns, mines, duration, clicks, commits, outcome, bbbv)
+        )
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        # Write all buffered games and fold them into the aggregate tables in a single transaction
+        if len(self.pending) == 0:
+            return
+
+        # Pre-sum the batch so each aggregate row is only touched once
+        config_updates = {}
+        bucket_updates = {}
+        for finished_at, rows, columns, mines, duration, clicks, commits, outcome, bbbv in self.pending:
+            key = (rows, columns, mines)
+            games, wins, total_win_time, best_time, bbbv_wins, total_bbbv_rate, best_bbbv_rate = \
+                config_updates.get(key, (0, 0, 0.0, None, 0, 0.0, None))
+            games += 1
+            if outcome > 0:
+                wins += 1
+                total_win_time += duration
+                if best_time is None or duration < best_time:
+                    best_time = duration
+
+                if bbbv is not None and duration > 0:
+                    bbbv_rate = bbbv / duration
+                    bbbv_wins += 1
+                    total_bbbv_rate += bbbv_rate
+                    if best_bbbv_rate is None or bbbv_rate > best_bbbv_rate:
+                        best_bbbv_rate = bbbv_rate
+
+                bucket_key = key + (int(duration / self.TIME_BUCKET),)
+                bucket_updates[bucket_key] = bucket_updates.get(bucket_key, 0) + 1
+            config_updates[key] = (games, wins, total_win_time, best_time, bbbv_wins, total_bbbv_rate, best_bbbv_rate)
+
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO games (finished_at, rows, columns, mines, duration, clicks, commits, outcome, bbbv) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                self.pending
+            )
+            self.connection.executemany(
+                "INSERT INTO config_stats (rows, columns, mines, games, wins, total_win_time, best_time, "
+                "   bbbv_wins, total_bbbv_rate, best_bbbv_rate) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (rows, columns, mines) DO UPDATE SET "
+                "   games = games + excluded.games,"
+                "   wins = wins + excluded.wins,"
+                "   total_win_time = total_win_time + excluded.total_win_time,"
+                "   best_time = CASE"
+                "       WHEN best_time IS NULL THEN excluded.best_time"
+                "       WHEN excluded.best_time IS NULL THEN best_time"
+                "       ELSE min(best_time, excluded.best_time)"
+                "   END,"
+                "   bbbv_wins = bbbv_wins + excluded.bbbv_wins,"
+                "   total_bbbv_rate = total_bbbv_rate + excluded.total_bbbv_rate,"
+                "   best_bbbv_rate = CASE"
+                "       WHEN best_bbbv_rate IS NULL THEN excluded.best_bbbv_rate"
+                "       WHEN excluded.best_bbbv_rate IS NULL THEN best_bbbv_rate"
+                "       ELSE max(best_bbbv_rate, excluded.best_bbbv_rate)"
+                "   END",
+                [key + update for key, update in config_updates.items()]
+            )
+            self.connection.executemany(
+                "INSERT INTO win_times (rows, columns, mines, bucket, count) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (rows, columns, mines, bucket) DO UPDATE SET count = count + excluded.count",
+                [key + (count,) for key, count in bucket_updates.items()]
+            )
+        self.pending = []
+
+    def get_summary(self, rows, columns, mines, percentiles=(50, 90)):
+        # Returns a dictionary of aggregate stats for one game configuration
+        # Buffered games are flushed first so the summary is always up to date
+        self.flush()
+
+        row = self.connection.execute(
+            "SELECT games, wins, total_win_time, best_time, bbbv_wins, total_bbbv_rate, best_bbbv_rate "
+            "FROM config_stats WHERE rows = ? AND columns = ? AND mines = ?",
+            (rows, columns, mines)
+        ).fetchone()
+        if row is None:
+            row = (0, 0, 0.0, None, 0, 0.0, None)
+        games, wins, total_win_time, best_time, bbbv_wins, total_bbbv_rate, best_bbbv_rate = row
+
+        return {
+            'games': games,
+            'wins': wins,
+            'win_rate': wins / games if games > 0 else None,
+            'best_time': best_time,
+            'average_time': total_win_time / wins if wins > 0 else None,
+            'best_bbbv_rate': best_bbbv_rate,
+            'average_bbbv_rate': total_bbbv_rate / bbbv_wins if bbbv_wins > 0 else None,
+            'percentiles': self.get_percentiles(rows, columns, mines, percentiles)
+        }
+
+    def get_percentiles(self, rows, columns, mines, percentiles=(50, 90)):
+        # Winning-time percentiles, read off the win_times histogram
+        # Results are accurate to within one TIME_BUCKET (the upper edge of the bucket is reported)
+        histogram = self.connection.execute(
+            "SELECT bucket, count FROM win_times "
+            "WHERE rows = ? AND columns = ? AND mines = ? ORDER BY bucket",
+            (rows, columns, mines)
+        ).fetchall()
+
+        total = sum(count for bucket, count in histogram)
+        to_return = {}
+        for pct in percentiles:
+            if total == 0:
+                to_return[pct] = None
+                continue
+
+            target = pct / 100 * total
+            seen = 0
+            for bucket, count in histogram:
+                seen += count
+                if seen >= target:
+                    break
+            to_return[pct] = round((bucket + 1) * self.TIME_BUCKET, 3)
+        return to_return
+
+    def get_configurations(self, limit=10):
+        # Most-played game configurations as (rows, columns, mines, games, wins) tuples
+        self.flush()
+        return self.connection.execute(
+            "SELECT rows, columns, mines, games, wins FROM config_stats "
+            "ORDER BY games DESC LIMIT ?",
+            (limit,)
+        ).fetchall()
+
+    def close(self):
+        if self.connection is not None:
+            self.flush()
+            self.connection.close()
+            self.connection = None
@@ -0,0 +1,327 @@
+import argparse
+import curses
+import sys
+import time
+
+from Benchmark import parse_board
+from GameVariables import MINE_FIELD_BACKENDS, create_mine_field
+from Topology import TOPOLOGIES
+
+# Terminal front-end: plays on the same engine as the pygame game, inside curses, so it works over SSH
+# on machines that can't open a window (no pygame needed)
+#
+# Only what changed is drawn: after the first frame each frame draws just the squares in the engine's
+# change set (see MineField.take_changes), the cursor & the status line. Boards bigger than the terminal
+# are shown through a viewport that scrolls to follow the cursor. Flood fills run time-sliced
+# (see MineField.advance_spread), so even a huge opening never stops the keyboard from responding.
+#
+# Keys:                                 Mouse:
+#   arrows / hjkl   move the cursor       left click      dig
+#   space / d       dig                   right click     flag
+#   f               flag                  middle click    chord
+#   c               chord
+#   x               commit flagged mines
+#   r               new board
+#   q               quit
+#
+# Usage (from anywhere):
+#   python Minesweeper_py/Terminal.py
+#   python Minesweeper_py/Terminal.py --board 300x200:9000 --engine bitboard
+#   python Minesweeper_py/Terminal.py --board 30x16:99 --topology hex
+
+DEFAULT_BOARD = (30, 16, 99)    # (columns, rows, mines)
+CELL_WIDTH = 2                  # Screen columns per square (hex boards shift odd rows by half of this)
+BOARD_TOP = 1                   # Screen row the board starts on (the status line is above it)
+HELP_LINES = 1                  # Rows kept free below the board for the key help
+INPUT_TIMEOUT = 50              # Milliseconds to wait for a key before drawing the next frame
+REVEAL_BUDGET = 0.02            # Seconds of flood fill per frame
+HELP_TEXT = "arrows/hjkl move  space dig  f flag  c chord  x commit  r new  q quit"
+
+# What each square looks like: (text, color pair)
+COLOR_PAIRS = {
+    1: curses.COLOR_BLUE,
+    2: curses.COLOR_GREEN,
+    3: curses.COLOR_RED,
+    4: curses.COLOR_MAGENTA,
+    5: curses.COLOR_YELLOW,
+    6: curses.COLOR_CYAN,
+    7: curses.COLOR_WHITE,
+    8: curses.COLOR_WHITE
+}
+FLAG_PAIR = 3
+MINE_PAIR = 3
+
+
+def square_look(square):
+    # The terminal's version of MineSweeperGrid.get_image_key
+    if square.mine_removed:
+        return "C", 6
+    if not square.is_revealed:
+        return ("F", FLAG_PAIR) if square.has_flag else ("#", 0)
+    if square.has_mine:
+        return ("@", MINE_PAIR) if square.source_explosion else ("*", 0)
+    if square.has_flag:
+        return "X", MINE_PAIR       # A wrong flag, only shown on game over
+    if square.neighboring_mines == 0:
+        return ".", 0
+    if square.neighboring_mines > 9:
+        return "+", 0               # Custom topologies can have more than 8 neighbors
+    return str(square.neighboring_mines), min(square.neighboring_mines, 8)
+
+
+class TerminalGame:
+    def __init__(self, screen, columns, rows, mines, backend='objects', topology='square'):
+        self.screen = screen
+        self.num_mines = mines
+        # The bitboard backend only plays square boards, other topologies always use FieldSquares (as GameScene)
+        self.mine_field = create_mine_field(
+            columns, rows, backend=backend if topology == 'square' else 'objects', topology=topology
+        )
+        self.mine_field.time_sliced = True
+        self.mine_field.populate_mines(mines)
+        self.row_shift = self.mine_field.topology.shape == 'hex'    # Odd rows sit half a square right
+
+        self.cursor = (0, 0)            # Square the keyboard acts on
+        self.view = (0, 0)              # Top-left square shown in the viewport
+        self.view_size = (0, 0)         # Squares that fit on screen (columns, rows)
+        self.full_redraw = True         # Flag indicating the whole screen should be redrawn
+        self.drawn_cursor = None        # Where the cursor was drawn last frame
+        self.status_text = None         # Status line drawn last frame
+
+        self.start_time = None          # When the first square was dug (perf_counter)
+        self.finish_time = None
+
+        self.setup_screen()
+
+    def setup_screen(self):
+        curses.curs_set(0)
+        self.screen.keypad(True)
+        self.screen.timeout(INPUT_TIMEOUT)
+        curses.mousemask(curses.BUTTON1_CLICKED | curses.BUTTON2_CLICKED | curses.BUTTON3_CLICKED)
+        curses.mouseinterval(0)
+        if curses.has_colors():
+            curses.start_color()
+            curses.use_default_colors()
+            for pair, color in COLOR_PAIRS.items():
+                curses.init_pair(pair, color, -1)
+
+    ### VIEWPORT ###
+
+    def fit_view(self):
+        # Work out how many squares fit on screen & scroll so the cursor is on it
+        # Returns True if the viewport moved (so everything on the board has to be redrawn)
+        screen_rows, screen_columns = self.screen.getmaxyx()
+        view_size = (
+            max(1, min(self.mine_field.size[0], (screen_columns - self.row_shift) // CELL_WIDTH)),
+            max(1, min(self.mine_field.size[1], screen_rows - BOARD_TOP - HELP_LINES))
+        )
+        view_x, view_y = self.view
+        cursor_x, cursor_y = self.cursor
+        view_x = min(max(view_x, cursor_x - view_size[0] + 1), cursor_x, self.mine_field.size[0] - view_size[0])
+        view_y = min(max(view_y, cursor_y - view_size[1] + 1), cursor_y, self.mine_field.size[1] - view_size[1])
+
+        moved = (view_x, view_y) != self.view or view_size != self.view_size
+        self.view = (max(0, view_x), max(0, view_y))
+        self.view_size = view_size
+        return moved
+
+    def in_view(self, pos_x, pos_y):
+        return (0 <= pos_x - self.view[0] < self.view_size[0]) and (0 <= pos_y - self.view[1] < self.view_size[1])
+
+    def screen_position(self, pos_x, pos_y):
+        # Screen (row, column) of a square in the viewport
+        return (
+            BOARD_TOP + pos_y - self.view[1],
+            (pos_x - self.view[0]) * CELL_WIDTH + (self.row_shift and pos_y % 2)
+        )
+
+    def square_at(self, screen_row, screen_column):
+        # Square under a screen position (for mouse clicks), or None
+        pos_y = self.view[1] + screen_row - BOARD_TOP
+        if not 0 <= pos_y - self.view[1] < self.view_size[1]:
+            return None
+        pos_x = self.view[0] + (screen_column - (self.row_shift and pos_y % 2)) // CELL_WIDTH
+        if not self.in_view(pos_x, pos_y):
+            return None
+        return pos_x, pos_y
+
+    ### DRAWING ###
+
+    def draw(self):
+        if self.fit_view():
+            self.full_redraw = True
+
+        if self.full_redraw:
+            self.screen.erase()
+            self.mine_field.take_changes()      # Everything is drawn anyway
+            for pos_y in range(self.view[1], self.view[1] + self.view_size[1]):
+                for pos_x in range(self.view[0], self.view[0] + self.view_size[0]):
+                    self.draw_square(pos_x, pos_y)
+            self.put_text(self.screen.getmaxyx()[0] - 1, 0, HELP_TEXT, curses.A_DIM)
+            self.drawn_cursor = None
+            self.status_text = None
+            self.full_redraw = False
+        else:
+            # Just the squares that changed (if they're on screen)
+            for square in self.mine_field.take_changes():
+                if self.in_view(*square.pos):
+                    self.draw_square(*square.pos)
+
+        # Move the cursor: redraw the square it left & the square it's on
+        if self.drawn_cursor != self.cursor:
+            if self.drawn_cursor is not None and self.in_view(*self.drawn_cursor):
+                self.draw_square(*self.drawn_cursor)
+            self.draw_square(*self.cursor)
+            self.drawn_cursor = self.cursor
+
+        status_text = self.get_status_text()
+        if status_text != self.status_text:
+            self.screen.move(0, 0)
+            self.screen.clrtoeol()
+            self.put_text(0, 0, status_text, curses.A_BOLD)
+            self.status_text = status_text
+
+        self.screen.refresh()
+
+    def draw_square(self, pos_x, pos_y):
+        text, pair = square_look(self.mine_field.get_square(pos_x, pos_y))
+        attributes = curses.color_pair(pair) if pair and curses.has_colors() else 0
+        if (pos_x, pos_y) == self.cursor:
+            attributes |= curses.A_REVERSE
+        screen_row, screen_column = self.screen_position(pos_x, pos_y)
+        self.put_text(screen_row, screen_column, text, attributes)
+
+    def put_text(self, screen_row, screen_column, text, attributes=0):
+        # Writes text, cut short at the edge of the screen (curses raises on writing past the last column)
+        screen_rows, screen_columns = self.screen.getmaxyx()
+        if 0 <= screen_row < screen_rows and screen_column < screen_columns:
+            text = text[:screen_columns - screen_column - (screen_row == screen_rows - 1)]
+            if len(text) > 0:
+                self.screen.addstr(screen_row, screen_column, text, attributes)
+
+    def get_status_text(self):
+        state = self.mine_field.state
+        if self.start_time is None:
+            seconds = 0
+        else:
+            seconds = int((self.finish_time if self.finish_time is not None else time.perf_counter()) - self.start_time)
+
+        if state == 1:
+            result = "CLEARED"
+        elif state == -1:
+            result = "BOOM"
+        else:
+            result = "playing"
+        return "Mines {:>4}   Time {:>4}   {}x{} {}   ({}, {})   {}".format(
+            self.mine_field.num_mines_left,
+            seconds, self.mine_field.size[0], self.mine_field.size[1], self.mine_field.topology.name,
+            self.cursor[0], self.cursor[1], result
+        )
+
+    ### INPUT ###
+
+    def handle_key(self, key):
+        # Returns False to quit
+        if key in (ord('q'), ord('Q')):
+            return False
+        moves = {
+            curses.KEY_LEFT: (-1, 0), ord('h'): (-1, 0),
+            curses.KEY_RIGHT: (1, 0), ord('l'): (1, 0),
+            curses.KEY_UP: (0, -1), ord('k'): (0, -1),
+            curses.KEY_DOWN: (0, 1), ord('j'): (0, 1)
+        }
+        if key in moves:
+            self.cursor = (
+                min(max(self.cursor[0] + moves[key][0], 0), self.mine_field.size[0] - 1),
+                min(max(self.cursor[1] + moves[key][1], 0), self.mine_field.size[1] - 1)
+            )
+        elif key in (ord(' '), ord('d')):
+            self.dig(*self.cursor)
+        elif key == ord('f'):
+            self.flag(*self.cursor)
+        elif key == ord('c'):
+            self.chord(*self.cursor)
+        elif key == ord('x'):
+            if self.mine_field.state == 0:
+                self.mine_field.commit_mines()
+                self.check_finished()
+        elif key == ord('r'):
+            self.new_board()
+        elif key == curses.KEY_MOUSE:
+            self.handle_mouse()
+        elif key == curses.KEY_RESIZE:
+            self.full_redraw = True
+        return True
+
+    def handle_mouse(self):
+        try:
+            _, screen_column, screen_row, _, button_state = curses.getmouse()
+        except curses.error:
+            return
+        position = self.square_at(screen_row, screen_column)
+        if position is None:
+            return
+        self.cursor = position
+        if button_state & curses.BUTTON1_CLICKED:
+            self.dig(*position)
+        elif button_state & curses.BUTTON3_CLICKED:
+            self.flag(*position)
+        elif button_state & curses.BUTTON2_CLICKED:
+            self.chord(*position)
+
+    ### GAME ###
+
+    def dig(self, pos_x, pos_y):
+        if self.mine_field.state != 0:
+            return
+        if self.start_time is None:
+            self.start_time = time.perf_counter()
+        self.mine_field.dig(pos_x, pos_y)
+        self.check_finished()
+
+    def flag(self, pos_x, pos_y):
+        if self.mine_field.state == 0:
+            self.mine_field.toggle_flag(pos_x, pos_y)
+
+    def chord(self, pos_x, pos_y):
+        self.mine_field.chord(pos_x, pos_y)
+        self.check_finished()
+
+    def check_finished(self):
+        if self.mine_field.state != 0 and self.finish_time is None:
+            self.finish_time = time.perf_counter()
+
+    def new_board(self):
+        self.mine_field.reset(self.num_mines)
+        self.start_time = None
+        self.finish_time = None
+        self.full_redraw = True
+
+    def run(self):
+        while True:
+            self.mine_field.advance_spread(REVEAL_BUDGET)
+            self.check_finished()
+            self.draw()
+            key = self.screen.getch()
+            if key != -1 and not self.handle_key(key):
+                return
+
+
+def __main__():
+    parser = argparse.ArgumentParser(description="Play minesweeper in the terminal")
+    parser.add_argument("--board", type=parse_board, default=DEFAULT_BOARD,
+                        help="Board as COLUMNSxROWS:MINES (default: 30x16:99)")
+    parser.add_argument("--engine", choices=sorted(MINE_FIELD_BACKENDS), default='objects',
+                        help="Engine backend (default: objects; non-square topologies always use objects)")
+    parser.add_argument("--topology", choices=list(TOPOLOGIES), default='square',
+                        help="Board topology (default: square)")
+    args = parser.parse_args()
+
+    columns, rows, mines = args.board
+    mines = max(1, min(mines, columns * rows - 1))
+    curses.wrapper(lambda screen: TerminalGame(screen, columns, rows, mines, args.engine, args.topology).run())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(__main__())
@@ -0,0 +1,142 @@
+from array import array
+import functools
+
+# Board topologies: which tiles count as neighbors of which
+#   square      The classic board: the eight surrounding tiles
+#   torus       Like square, but the edges wrap around (no corner or edge tiles)
+#   hex         Hexagonal tiles: odd rows are shifted half a tile right, each tile has six neighbors
+#   custom      Any list of (dx, dy) offsets, e.g. knight's moves (see CustomTopology)
+#
+# Tiles are numbered column by column, like MineField.field: index = x * height + y
+# Each topology works out its whole adjacency table once, as two flat arrays (compressed sparse rows):
+#   neighbors[starts[index]:starts[index + 1]]    indices of the tiles next to tile index
+# so finding a tile's neighbors is a single slice, with no bounds checks or wrap-around arithmetic,
+# and every topology costs the same to play on as the classic board.
+# Tables only depend on the topology & size, so get_topology makes one per size and fields share it.
+
+SQUARE_OFFSETS = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+
+# Hex neighbors of tiles in even & odd rows (odd rows sit half a tile further right)
+HEX_OFFSETS_EVEN_ROW = ((-1, -1), (0, -1), (-1, 0), (1, 0), (-1, 1), (0, 1))
+HEX_OFFSETS_ODD_ROW = ((0, -1), (1, -1), (-1, 0), (1, 0), (0, 1), (1, 1))
+
+
+class Topology:
+    # The classic square board
+    # Subclasses change neighbor_offsets (and wraps), the table is built the same way for all of them
+    name = 'square'
+    shape = 'square'    # How front-ends should draw a tile (square or hex)
+    wraps = False       # Whether neighbors off one edge come back on the opposite edge
+    reach = 1           # Furthest any offset goes (tiles at least this far from every edge need no checks)
+
+    def __init__(self, width, height):
+        self.size = (width, height)
+
+    def __getattr__(self, name):
+        # The table is built the first time it's used (a backend may never need it, e.g. bitboards)
+        # Afterwards starts & neighbors are plain attributes, so reading them costs nothing extra
+        if name in ('starts', 'neighbors'):
+            self.build()
+            return self.__dict__[name]
+        raise AttributeError(name)
+
+    def build(self):
+        width, height = self.size
+        starts = array('i', [0])    # Where each tile's neighbors start in neighbors (one extra at the end)
+        neighbors = array('i')      # Every tile's neighbor indices, tile after tile
+        deltas = {}                 # offsets -> index differences, for tiles away from the edges
+
+        for x in range(width):
+            interior_x = self.reach <= x < width - self.reach
+            for y in range(height):
+                offsets = self.neighbor_offsets(x, y)
+                if interior_x and self.reach <= y < height - self.reach:
+                    if offsets not in deltas:
+                        deltas[offsets] = [delta_x * height + delta_y for delta_x, delta_y in offsets
+                                           if delta_x != 0 or delta_y != 0]
+                    index = x * height + y
+                    neighbors.extend([index + delta for delta in deltas[offsets]])
+                else:
+                    neighbors.extend(self.find_neighbors(x, y, offsets))
+                starts.append(len(neighbors))
+
+        self.starts = starts
+        self.neighbors = neighbors
+
+    def neighbor_offsets(self, pos_x, pos_y):
+        return SQUARE_OFFSETS
+
+    def find_neighbors(self, pos_x, pos_y, offsets):
+        # Neighbor indices of a tile near an edge, while the table is being built
+        width, height = self.size
+        index = pos_x * height + pos_y
+        found = {}  # Used as an ordered set: on small tori several offsets can wrap onto the same tile
+        for delta_x, delta_y in offsets:
+            neighbor_x = pos_x + delta_x
+            neighbor_y = pos_y + delta_y
+            if self.wraps:
+                neighbor_x %= width
+                neighbor_y %= height
+            elif not (0 <= neighbor_x < width and 0 <= neighbor_y < height):
+                continue
+            neighbor = neighbor_x * height + neighbor_y
+            if neighbor != index:
+                found[neighbor] = True
+        return found.keys()
+
+    def neighbor_indices(self, index):
+        return self.neighbors[self.starts[index]:self.starts[index + 1]]
+
+
+class TorusTopology(Topology):
+    name = 'torus'
+    wraps = True
+
+
+class HexTopology(Topology):
+    name = 'hex'
+    shape = 'hex'
+
+    def neighbor_offsets(self, pos_x, pos_y):
+        return HEX_OFFSETS_ODD_ROW if pos_y % 2 else HEX_OFFSETS_EVEN_ROW
+
+
+class CustomTopology(Topology):
+    # User-defined neighborhood: offsets is a list of (dx, dy) pairs, applied to every tile
+    # e.g. CustomTopology(16, 16, [(1, 2), (2, 1), (-1, 2), ...]) for knight's-move minesweeper
+    name = 'custom'
+
+    def __init__(self, width, height, offsets, wraps=False):
+        super().__init__(width, height)
+        self.offsets = tuple(dict.fromkeys((int(delta_x), int(delta_y)) for delta_x, delta_y in offsets))
+        self.wraps = wraps
+        self.reach = max((max(abs(delta_x), abs(delta_y)) for delta_x, delta_y in self.offsets), default=0)
+
+    def neighbor_offsets(self, pos_x, pos_y):
+        return self.offsets
+
+
+TOPOLOGIES = {
+    'square': Topology,
+    'torus': TorusTopology,
+    'hex': HexTopology
+}
+
+
+@functools.lru_cache(maxsize=32)
+def build_topology(name, width, height):
+    return TOPOLOGIES[name](width, height)
+
+
+def get_topology(topology, width, height):
+    # The Topology for a field: topology can be a name from TOPOLOGIES, a Topology, or None (square)
+    # Named topologies are made once per size and shared (tables & all)
+    if topology is None:
+        topology = 'square'
+    if isinstance(topology, Topology):
+        if topology.size != (width, height):
+            raise ValueError("{} topology is {}x{}, not {}x{}".format(topology.name, *topology.size, width, height))
+        return topology
+    if topology not in TOPOLOGIES:
+        raise ValueError("Unknown topology {!r} (expected one of {})".format(topology, ", ".join(TOPOLOGIES)))
+    return build_topology(topology, width, height)
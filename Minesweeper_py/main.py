@@ -1,8 +1,115 @@
-from GameInstance import *
+from GameInstance import GameInstance
+from Profiler import run_profiled
+from GameVariables import MINE_FIELD_BACKENDS
+from Topology import TOPOLOGIES
+from Race import make_seed_string, parse_seed_string
+from Client import RaceConnection
+import argparse
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Minesweeper")
+    parser.add_argument(
+        "--profile", metavar="PATH",
+        help="Profile the whole session and write a per-function report on exit "
+             "(cProfile: pstats data to PATH, readable report to PATH.txt)"
+    )
+    parser.add_argument(
+        "--sampling", action="store_true",
+        help="With --profile: use the low-overhead sampling profiler instead of cProfile "
+             "(readable report written to PATH)"
+    )
+    parser.add_argument(
+        "--sample-interval", type=float, default=5.0, metavar="MS",
+        help="With --sampling: milliseconds of CPU time between samples (default 5)"
+    )
+    parser.add_argument(
+        "--trace-frames", type=int, default=0, metavar="N",
+        help="Print the phase-by-phase timing of the first N game frames"
+    )
+    parser.add_argument(
+        "--measure-latency", action="store_true",
+        help="Time every mouse press & release from arriving to the frame showing it on screen, "
+             "and print the percentiles on exit"
+    )
+    parser.add_argument(
+        "--render-thread", action="store_true",
+        help="Draw & flip each frame on a separate render thread instead of the game loop's own thread "
+             "(not for platforms whose video driver only allows display calls from the main thread, e.g. macOS)"
+    )
+    parser.add_argument(
+        "--engine", choices=sorted(MINE_FIELD_BACKENDS), default='objects',
+        help="Engine backend for the board: a FieldSquare object per tile (objects, the default) "
+             "or whole-board bitboards (bitboard)"
+    )
+    parser.add_argument(
+        "--topology", choices=list(TOPOLOGIES), default='square',
+        help="Board topology to start with: the classic board (square), wrap-around edges (torus) "
+             "or hexagonal tiles (hex). Can also be changed in the settings"
+    )
+    parser.add_argument(
+        "--race", metavar="SEED",
+        help="Race on the board given by a seed string like 16x16-40-9f3a61c2 "
+             "(\"new\" makes one up, to share with the other players)"
+    )
+    parser.add_argument(
+        "--connect", default="127.0.0.1:8765", metavar="HOST:PORT",
+        help="With --race: the game server to race through (default 127.0.0.1:8765)"
+    )
+    parser.add_argument(
+        "--race-boards", type=int, default=2, metavar="N",
+        help="With --race: boards to show side by side, your own included (default 2)"
+    )
+    parser.add_argument(
+        "--session", metavar="SEED",
+        help="Play a tournament session: a fixed run of boards dealt from a seed string like 9x9-10-friday, "
+             "with split times (\"new\" makes one up)"
+    )
+    parser.add_argument(
+        "--session-boards", type=int, default=5, metavar="N",
+        help="With --session: boards in the session (default 5)"
+    )
+    parser.add_argument(
+        "--tiles", type=int, default=1, metavar="N",
+        help="With --session: boards to play at once, tiled on one screen (default 1)"
+    )
+    return parser.parse_args(argv)
+
+
+def connect_race(args):
+    seed_string = args.race
+    if seed_string == "new":
+        seed_string = make_seed_string(16, 16, 40)
+    print("Race seed: {}".format(seed_string))
+
+    host, port = args.connect.rsplit(":", 1)
+    return RaceConnection(host, int(port), seed_string), args.race_boards
+
+
+def prepare_session(args):
+    seed_string = args.session
+    if seed_string == "new":
+        seed_string = make_seed_string(9, 9, 10)
+    parse_seed_string(seed_string)      # Raises ValueError before any window is opened
+    print("Session seed: {}".format(seed_string))
+    return seed_string, args.session_boards, args.tiles
 
 
 def __main__():
-    new_game = GameInstance()
+    args = parse_arguments()
+
+    race = connect_race(args) if args.race is not None else None
+    session = prepare_session(args) if args.session is not None else None
+
+    def start_game():
+        return GameInstance(trace_frames=args.trace_frames, race=race, engine=args.engine,
+                            topology=args.topology, measure_latency=args.measure_latency,
+                            render_thread=args.render_thread, session=session)
+
+    if args.profile is None:
+        start_game()
+    else:
+        run_profiled(start_game, args.profile, sampling=args.sampling, interval=args.sample_interval / 1000)
 
 
 if __name__ == "__main__":